@@ -0,0 +1,108 @@
+# NumPy arrays as Kol values (tree.KolArray), numpy is an optional dependency:
+#     i = arrays.add_builtins(interp.add_builtins(Interpreter(...)))
+#     i.assign('price', arrays.array([10, 20, 30]))
+#
+# add_builtins rebinds the operator builtins to versions working element-wise,
+# with numpy broadcasting, when either side is an array, the scalar ones run
+# otherwise. It is opt-in so interpreters that never see an array keep the
+# plain scalar operators on their fast path. Arithmetic follows the scalar
+# builtins (div truncates towards zero and fails on zero) and comparisons give
+# arrays of 0/1.
+#
+# An if on an array is a masked select: both arms are evaluated once and each
+# row takes the value of the arm its condition picks, 1 being true like the
+# scalar if. Rows have to get a value, so such an if needs an else arm.
+# Engines do the same for inlined ifs (tree.Cond) through select().
+
+from kol import interpast as tree
+
+try:    import numpy as np
+except ImportError: np = None
+
+def require():
+    if np is None:
+        from pprint import pprint
+        pprint(['InterpError: kol.arrays needs numpy, which is not installed']) # TODO: throw resumable exception ?
+        exit(1)
+
+def array(values) -> tree.KolArray:
+    require()
+    return tree.KolArray(np.asarray(values))
+
+def unbox(v):
+    if type(v) in (tree.KolArray, tree.KolInt, tree.KolFloat): return v.value
+    from pprint import pprint
+    pprint(['InterpError: not a number or an array', v]) # TODO: throw resumable exception ?
+    exit(1)
+
+def div(lhs, rhs):
+    with np.errstate(divide = 'raise', invalid = 'raise'): return np.trunc(lhs / rhs).astype(np.int64) # Like int(lhs / rhs).
+
+array_ops = {
+    'minus': lambda lhs, rhs: lhs - rhs,
+    'plus':  lambda lhs, rhs: lhs + rhs,
+    'mul':   lambda lhs, rhs: lhs * rhs,
+    'div':   div,
+    'eq':    lambda lhs, rhs: (lhs == rhs).astype(np.int64),
+    'ne':    lambda lhs, rhs: (lhs != rhs).astype(np.int64),
+    'gt':    lambda lhs, rhs: (lhs >  rhs).astype(np.int64),
+    'gte':   lambda lhs, rhs: (lhs >= rhs).astype(np.int64),
+    'lt':    lambda lhs, rhs: (lhs <  rhs).astype(np.int64),
+    'lte':   lambda lhs, rhs: (lhs <= rhs).astype(np.int64),
+}
+
+def broadcasting(op, array_op):
+    "op when both sides are scalars, array_op on the unboxed values otherwise."
+    def prim(lhs, rhs, KolArray = tree.KolArray):
+        if type(lhs) is KolArray or type(rhs) is KolArray: return tree.KolArray(array_op(unbox(lhs), unbox(rhs)))
+        return op(lhs, rhs)
+    prim.array_op = array_op # See broadcasts.
+    return prim
+
+def broadcasts(i, name: str) -> bool:
+    "Whether the builtin operator name of i works on arrays."
+    return name in i.primitives and hasattr(i.primitives[name][1], 'array_op')
+
+def select(mask: tree.KolArray, true, false) -> tree.KolArray:
+    if type(false) is tree.KolNil:
+        from pprint import pprint
+        pprint(['InterpError: an if on an array needs an else arm', mask]) # TODO: throw resumable exception ?
+        exit(1)
+    return tree.KolArray(np.where(mask.value == 1, unbox(true), unbox(false)))
+
+def if_builtin(i, ps):
+    if type(ps[0]) is tree.KolArray: return select(ps[0], i.eval_ast(tree.KolFnCall(ps[1], [])), tree.KolNil())
+    return i.eval_ast(tree.KolFnCall(ps[1], []) if ps[0].value == 1 else tree.KolNil())
+
+def ifelse_builtin(i, ps):
+    if type(ps[0]) is tree.KolArray: return select(ps[0], i.eval_ast(tree.KolFnCall(ps[1], [])), i.eval_ast(tree.KolFnCall(ps[2], [])))
+    return i.eval_ast(tree.KolFnCall(ps[1 if ps[0].value == 1 else 2], []))
+
+def add_builtins(i):
+    require()
+    from kol import interp
+
+    i.builtins['kol.internal.if']     = tree.KolFn([], if_builtin,     origin = tree.builtin_origin('kol.internal.if'))
+    i.builtins['kol.internal.ifelse'] = tree.KolFn([], ifelse_builtin, origin = tree.builtin_origin('kol.internal.ifelse'))
+    i.assign('kol.internal.if',     i.builtins['kol.internal.if'])
+    i.assign('kol.internal.ifelse', i.builtins['kol.internal.ifelse'])
+    i.assign('arange', tree.KolFn(['n'], lambda i, _: tree.KolArray(np.arange(unbox(i.lookup('n'))))))
+    i.assign('sum',    tree.KolFn(['a'], lambda i, _: tree.KolInt(int(np.sum(unbox(i.lookup('a')))))))
+
+    for name, op in interp.operator_builtins.items():
+        prim = broadcasting(op, array_ops[name])
+        fn = tree.KolFn(['lhs', 'rhs'], lambda i, _, prim = prim: prim(i.lookup('lhs'), i.lookup('rhs')), origin = tree.builtin_origin(name))
+        i.primitives[name] = fn, prim
+        i.builtins[name] = fn
+        i.assign(name, fn)
+    return i
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol.bench import make
+
+    i = add_builtins(make())
+
+    with open(argv[1]) as f:
+        ret, rem = i.eval_str(f.read())
+        print(ret)
@@ -3,66 +3,105 @@ from kol import lexer as kollex
 from kol import cst as kolcst
 
 from dataclasses import dataclass, field
-from typing import List, Any
+from typing import List, Dict, Any
+import contextvars
 
-@dataclass
-class StmtSeq:
-    first: Any
-    rest:  'StmtSeq' | Any
+@dataclass(slots = True)
+class StmtSeq: # Two or more, a single statement is just itself.
+    stmts: List[Any]
 
-@dataclass
+@dataclass(slots = True)
 class BinopNode:
     lhs: Any # ExprNode
     op: kollex.Glyph # | Operator.Operator
     rhs: Any
 
-@dataclass
+@dataclass(slots = True)
 class UnopNode:
     op: kollex.Glyph # | Operator.Operator
     expr: Any # ExprNode
 
-@dataclass
+@dataclass(slots = True)
 class IdentNode:
     ident: kollex.Text | str
 
-@dataclass
+@dataclass(slots = True)
 class FnDef:
     body: None | StmtSeq = None
     params: List[str] = field(default_factory = lambda: [])
+    pos: Any = None # (line, column) it starts at, see kol.lexer.
 
-@dataclass
+@dataclass(slots = True)
 class FnCall:
     fn: str | FnDef
     args: List[Any] = field(default_factory = lambda: [])
 
-@dataclass
+@dataclass(slots = True)
 class If:
     cond: Any
     true: FnDef
     false: FnDef | None
 
+# What fold made of original, which holds while the builtins in names are
+# bound to the stock ones, kol.ast2interpast checks that when it runs.
+@dataclass(slots = True)
+class Folded:
+    value: Any
+    names: frozenset
+    original: Any
+
+# Repeats (kol.cst.Repeat) are flat, their items are every other field when
+# they have a separator.
 def parse_stmts_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if   branch == 'simple-last': return parse(cst.stmt)
-    elif branch == 'last':        return parse(cst.stmt)
-    elif branch == 'last2':       return parse(cst.stmt)
-    elif branch == 'empty':       return None
-    elif branch == 'multiple':    return StmtSeq(parse(cst.stmt), parse(cst.stmts))
+    if branch != 'list': print('BRANCH NOT FOUND(kol.ast.parse_stmts_rule)', branch)
+    stmts = [parse(s) for s in cst._fields[::2]]
+    return stmts[0] if len(stmts) == 1 else StmtSeq(stmts)
+
+def position(cst: kolcst.UnwindableMatch):
+    "Where the first token of cst is."
+    while type(cst) is kolcst.UnwindableMatch:
+        if not cst._fields: return None
+        cst = cst._fields[0]
+    return getattr(cst, 'pos', None)
 
 def parse_stmt_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if   branch == 'block':       return FnCall(FnDef(parse(cst.fnblock)))
-    elif branch == 'empty-block': return FnCall(FnDef())
+    if   branch == 'block':       return FnCall(FnDef(parse(cst.fnblock), pos = position(cst)))
+    elif branch == 'empty-block': return FnCall(FnDef(pos = position(cst)))
     elif branch == 'expr-stmt':   return parse(cst.expr)
     else: print('BRANCH NOT FOUND(kol.ast.parse_stmt_rule)', branch)
 
+# How chains of binary operators become trees:
+#   'pratt'         resolves precedence and associativity right away, while converting the cst.
+#   'shunting-yard' keeps them as right leaning chains of BinopNode and sorts them out in base_rewrite.
+binop_engine = 'pratt'
+
+def binop_chain(operands: List[Any], glyphs: List[kollex.Glyph]):
+    "operands[0] glyphs[0] operands[1] ... operands[-1] as a tree, see binop_engine."
+    if binop_engine == 'pratt': return resolve_binops(operands, glyphs)
+
+    node = operands[-1]
+    for lhs, op in zip(reversed(operands[:-1]), reversed(glyphs)): node = BinopNode(lhs, op, node)
+    return node
+
+def parse_binop_chain(cst: kolcst.UnwindableMatch, operands: List[Any] = None, glyphs: List[kollex.Glyph] = None):
+    "Like parse(cst) for an expr, but also prepends operands/glyphs to it."
+    operands, glyphs = operands or [], glyphs or []
+    while cst._type == 'expr:binop':
+        operands.append(parse(cst.partial.lhs))
+        glyphs.append(cst.partial.binop.op)
+        cst = cst.rhs
+    operands.append(parse(cst))
+    return binop_chain(operands, glyphs)
+
 def parse_expr_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if   branch == 'binop':       return BinopNode( parse(cst.partial.lhs), cst.partial.binop.op, parse(cst.rhs) )
+    if   branch == 'binop':       return parse_binop_chain(cst)
     elif branch == 'simple-expr': return parse(cst.expr)
     else: print('BRANCH NOT FOUND(kol.ast.parse_expr_node)', branch)
 
 def parse_expr2_rule(cst: kolcst.UnwindableMatch, branch: str):
     if   branch == 'unop':               return UnopNode(cst.unop.op, parse(cst.expr))
-    elif branch == 'fncall-noargs':      return FnCall(cst.ident.ident.text)
-    elif branch == 'fncall':             return FnCall(cst.ident.ident.text, parse(cst.fncallargs))
+    elif branch == 'fncall-noargs':      return FnCall(parse(cst.ident).ident)
+    elif branch == 'fncall':             return FnCall(parse(cst.ident).ident, parse(cst.fncallargs))
     elif branch == 'anon-fncall':        return FnCall('kol.internal.identity', parse(cst.fncallargs))
     elif branch == 'anon-fncall-noargs': return FnCall('kol.internal.identity')
     elif branch == 'fndef':              return parse(cst.fndef)
@@ -75,20 +114,22 @@ def parse_ident_rule(cst: kolcst.UnwindableMatch, branch: str):
     elif branch == 'multiple': return IdentNode(cst._ident.ident.text.strip() + ' ' + parse(cst.ident).ident)
 
 def parse_fncallargs_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if   branch == 'single':   return [parse(cst.expr)]
-    elif branch == 'multiple': return [parse(cst.first)] + parse(cst.rest)
+    if branch != 'list': print('BRANCH NOT FOUND(kol.ast.parse_fncallargs_rule)', branch)
+    return [parse(a) for a in cst._fields[::2]]
 
 def parse_fndef_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if   branch == 'with-args':    return FnDef(parse(cst.stmts), parse(cst.fncallargs))
-    elif branch == 'without-args': return FnDef(parse(cst.stmts))
-    elif branch == 'minimal':      return FnDef(parse(cst.stmts))
+    if   branch == 'with-args':    return FnDef(parse(cst.stmts), parse(cst.fncallargs), position(cst))
+    elif branch == 'without-args': return FnDef(parse(cst.stmts), pos = position(cst))
+    elif branch == 'minimal':      return FnDef(parse(cst.stmts), pos = position(cst))
     else: print('BRANCH NOT FOUND(kol.ast.parse_fndef_rule)', branch)
 
 def parse_binopleftpartials_rule(cst: kolcst.UnwindableMatch, branch: str):
-    if branch == 'single': return parse(cst.first.lhs), cst.first.binop.op
-    else:
-        subexpr, remaining_left_op = parse(cst.rest)
-        return BinopNode(parse(cst.first.lhs), cst.first.binop.op, subexpr), remaining_left_op
+    operands, glyphs = [parse(cst.first.lhs)], [cst.first.binop.op]
+    while branch == 'multiple':
+        cst, branch = cst.rest, cst.rest._type.split(':')[1]
+        operands.append(parse(cst.first.lhs))
+        glyphs.append(cst.first.binop.op)
+    return binop_chain(operands, glyphs[:-1]), glyphs[-1]
 
 
 def parse_ifexpr_rule(cst: kolcst.UnwindableMatch, branch: str):
@@ -96,38 +137,35 @@ def parse_ifexpr_rule(cst: kolcst.UnwindableMatch, branch: str):
         print('BRANCH NOT FOUND(kol.ast.parse_ifexpr_rule)', branch)
         exit(1)
 
-    ret, root, cst, varname = If(None, None, None), cst, cst.arms, 'it'
+    ret, root, varname = If(None, None, None), cst, 'it'
     curr = ret
 
     if branch in ['lpartial-named', 'rpartial-named']: varname = parse(root.varname).ident
     if branch in ['lpartial-named', 'lpartial']: rootexpr, remaining_left_op = parse(root.binopleftpartials)
 
     if branch in ['lpartial', 'rpartial', 'lpartial-named', 'rpartial-named']: # Create a scope for the partial expression so it's only evaluated once.
-        ret = FnCall(FnDef(StmtSeq(BinopNode(
+        ret = FnCall(FnDef(StmtSeq([binop_chain([
             IdentNode(varname),
-            kollex.Glyph('='),
             FnCall(
                 'kol.internal.identity', # Make the precedence unambigous in case it's a custom operator and the user forgot to assign precedence.
                 [ parse(root.expr) if branch not in ['lpartial', 'lpartial-named'] else rootexpr ]
             )
-        ), ret)))
+        ], [kollex.Glyph('=')]), ret]), pos = position(root)))
 
-    while cst != None:
-        arm, _, armbranch = cst.arm, *cst.arm._type.split(':')
+    for arm in root.arms._fields:
+        armbranch = arm._type.split(':')[1]
 
         if armbranch == 'ellipsis':
-            curr.false = FnDef(parse(arm.stmts))
+            curr.false = FnDef(parse(arm.stmts), pos = position(arm))
             return ret # NOTE: This discards the rest of the tree if it exists.
         elif armbranch in ['expr', 'lp-expr', 'rpartial']:
             if curr.cond is not None:
-                curr.false = FnDef(If(None, None, None))
+                curr.false = FnDef(If(None, None, None), pos = position(arm))
                 curr       = curr.false.body
             if   armbranch == 'expr':     curr.cond = parse(arm.expr)
-            elif armbranch == 'lp-expr':  curr.cond = BinopNode(IdentNode(varname), remaining_left_op, parse(arm.expr))
-            elif armbranch == 'rpartial': curr.cond = BinopNode(IdentNode(varname), arm.binoprightpartial.binop.op, parse(arm.binoprightpartial.rhs))
-            curr.true = FnDef(parse(arm.stmts))
-
-        cst = cst.rest if cst._type.split(':')[1] == 'multiple' else None
+            elif armbranch == 'lp-expr':  curr.cond = parse_binop_chain(arm.expr, [IdentNode(varname)], [remaining_left_op])
+            elif armbranch == 'rpartial': curr.cond = parse_binop_chain(arm.binoprightpartial.rhs, [IdentNode(varname)], [arm.binoprightpartial.binop.op])
+            curr.true = FnDef(parse(arm.stmts), pos = position(arm))
     return ret
 
 parsemap = {
@@ -161,11 +199,51 @@ def shunting_yard_handle_same_precedence(op, stack, opstack):
 
     return stack, opstack
 
+infix_by_symbol = {o.symbol: o for o in reversed(ops.infix_operators)} # The first operator with a symbol wins, like find_operator.
+
+def resolve_binops(operands: List[Any], glyphs: List[kollex.Glyph]):
+    # Operator precedence parsing straight into BinopNodes. The operators are compared
+    # exactly like binop_shunting_yard does, but reductions build the node right away
+    # instead of going through a postfix list and another tree.
+    nodes, opstack, compares = [operands[0]], [], 0
+
+    def reduce():
+        rhs = nodes.pop()
+        nodes.append(BinopNode(nodes.pop(), opstack.pop(), rhs))
+
+    for glyph, operand in zip(glyphs, operands[1:]):
+        op = infix_by_symbol[glyph.text]
+        while len(opstack):
+            compares += 1
+            prec = op.precedence_to(opstack[-1])
+            if   prec == ops.Precedence.Lower:  reduce()
+            elif prec == ops.Precedence.Higher: break
+            elif prec == ops.Precedence.NoPrecedence:
+                print('ERROR: No precedence specified', op, opstack[-1])
+                exit(1) # TODO: throw descriptive exception instead.
+            elif op.assoc == ops.Associativity.Right: break
+            elif op.assoc == ops.Associativity.Left:  reduce()
+            elif op.assoc == ops.Associativity.NonAssoc:
+                print('ERROR: Non-associative operator!', op)
+                exit(1) # TODO: throw descriptive exception instead.
+
+        opstack.append(op)
+        nodes.append(operand)
+
+    while len(opstack): reduce()
+
+    stats = counting.get()
+    if stats is not None and glyphs:
+        stats.count('binop:compare', compares)
+        stats.count('binop:push', len(glyphs))
+        stats.count('binop:reduce', len(glyphs)) # Every operator makes one node.
+    return nodes[0]
+
 def binop_shunting_yard(_ast: BinopNode):
     # Basically we serialize the tree again and use shunting-yard to convert the
     # expression into postfix notation.
     # From there, a simple algorithm can be used to make that into a tree again.
-    stack, opstack = [], []
+    stack, opstack, compares, pushes = [], [], 0, 0
 
     curr = _ast
     while type(curr) == BinopNode:
@@ -173,6 +251,7 @@ def binop_shunting_yard(_ast: BinopNode):
 
         op = ops.find_operator(curr.op.text, ops.infix_operators)[0]
         while len(opstack):
+            compares += 1
             prec = op.precedence_to(opstack[-1])
             if prec == ops.Precedence.Lower: stack.append(opstack.pop())
             elif prec == ops.Precedence.Higher: break
@@ -182,6 +261,7 @@ def binop_shunting_yard(_ast: BinopNode):
             elif prec == ops.Precedence.Equal: stack, opstack = shunting_yard_handle_same_precedence(op, stack, opstack)
 
         opstack.append(op)
+        pushes += 1
 
         curr = curr.rhs
 
@@ -194,32 +274,179 @@ def binop_shunting_yard(_ast: BinopNode):
         if type(curr) is ops.Operator: curr = BinopNode(nodes.pop(-2), curr, nodes.pop())
         nodes.append(curr)
 
+    stats = counting.get()
+    if stats is not None:
+        stats.count('binop:compare', compares)
+        stats.count('binop:push', pushes)
+        stats.count('binop:reduce', pushes)
     return nodes[0] # The root node.
 
-def base_rewrite(_ast):
+def base_rewrite(_ast, stats = None): # Keeps no stats.
     if _ast is None: return None # Silently error. TODO: is this the correct approach ?
 
     # Simplify some structures, sort out operator precedence.
     t = type(_ast)
 
-    if   t is BinopNode:    return binop_shunting_yard(_ast)
+    if   t is BinopNode:    return binop_shunting_yard(_ast) if type(_ast.op) is kollex.Glyph else BinopNode( base_rewrite(_ast.lhs), _ast.op, base_rewrite(_ast.rhs) )
     elif t is UnopNode:     return UnopNode( ops.find_operator(_ast.op.text, ops.prefix_operators)[0], base_rewrite(_ast.expr) )
     elif t is IdentNode:    return IdentNode( _ast.ident.strip() )
-    elif t is StmtSeq:      return StmtSeq( base_rewrite(_ast.first), base_rewrite(_ast.rest) )
+    elif t is StmtSeq:      return StmtSeq( [base_rewrite(s) for s in _ast.stmts] )
     elif t is FnCall:       return FnCall( base_rewrite(_ast.fn) if type(_ast.fn) is not str else _ast.fn, [base_rewrite(a) for a in _ast.args] )
-    elif t is FnDef:        return FnDef( base_rewrite(_ast.body), _ast.params )
+    elif t is FnDef:        return FnDef( base_rewrite(_ast.body), _ast.params, _ast.pos )
     elif t is If:           return If( base_rewrite(_ast.cond), base_rewrite(_ast.true), base_rewrite(_ast.false) )
     else: print('Error(base_rewrite): Unrecognized ast', t, _ast)
 
-rewrites = [base_rewrite]
+# Constant folding, on the output of base_rewrite.
+#
+# Operators on integer literals become a literal, an If whose condition folds
+# is replaced by a call of the arm it picks (what kol.internal.if(else) would
+# do) and kol.internal.identity around a literal, what parenthesis and partial
+# ifs produce, is dropped. This assumes the names involved are
+# bound to the kol.interp builtins. Names the program itself rebinds (assigns
+# or uses as parameters) are left alone, and so are the ones an interpreter
+# already bound to something else (see folding and Interpreter.rebound). Any
+# other could still be rebound before the folded code runs, by a call of a
+# function fold can't see into or by a later program, so each fold is a Folded
+# with the names it assumed and the code it replaced, run when they aren't.
+
+fold_ops = {
+    'minus': lambda lhs, rhs: lhs - rhs,
+    'plus':  lambda lhs, rhs: lhs + rhs,
+    'mul':   lambda lhs, rhs: lhs * rhs,
+    'div':   lambda lhs, rhs: int(lhs / rhs) if rhs != 0 else None, # Truncates like the builtin, division by zero is left for runtime.
+    'eq':    lambda lhs, rhs: 1 if lhs == rhs else 0,
+    'ne':    lambda lhs, rhs: 1 if lhs != rhs else 0,
+    'gt':    lambda lhs, rhs: 1 if lhs >  rhs else 0,
+    'gte':   lambda lhs, rhs: 1 if lhs >= rhs else 0,
+    'lt':    lambda lhs, rhs: 1 if lhs <  rhs else 0,
+    'lte':   lambda lhs, rhs: 1 if lhs <= rhs else 0,
+}
+
+@dataclass
+class RewriteStats:
+    nodes:  Dict[str, List[int]] = field(default_factory = lambda: {}) # Rewrite -> node count before and after it.
+    events: Dict[str, int]       = field(default_factory = lambda: {}) # What the rewrites did, eg. 'fold:binop' -> times.
+
+    def count(self, event: str, n: int = 1): self.events[event] = self.events.get(event, 0) + n
+
+    def run(self, rewrite, ast):
+        before = count_nodes(ast)
+        ast = rewrite(ast, self)
+        self.nodes[rewrite.__name__] = [before, count_nodes(ast)]
+        return ast
+
+# The RewriteStats of the parse_and_rewrite running, if it keeps any, for the
+# operator precedence passes, they run deep in parse and base_rewrite.
+counting: contextvars.ContextVar[RewriteStats | None] = contextvars.ContextVar('kol.ast.counting', default = None)
+
+def count_nodes(_ast) -> int:
+    t = type(_ast)
+    if   t is BinopNode: return 1 + count_nodes(_ast.lhs) + count_nodes(_ast.rhs)
+    elif t is UnopNode:  return 1 + count_nodes(_ast.expr)
+    elif t is StmtSeq:   return sum(count_nodes(s) for s in _ast.stmts)
+    elif t is FnCall:    return 1 + (count_nodes(_ast.fn) if type(_ast.fn) is not str else 0) + sum(count_nodes(a) for a in _ast.args)
+    elif t is FnDef:     return 1 + count_nodes(_ast.body)
+    elif t is If:        return 1 + count_nodes(_ast.cond) + count_nodes(_ast.true) + count_nodes(_ast.false)
+    elif t is IdentNode: return 1
+    elif t is Folded:    return 1 + count_nodes(_ast.value) + count_nodes(_ast.original)
+    return 0 # None.
+
+def bound_names(_ast, names: set):
+    t = type(_ast)
+    if   t is BinopNode:
+        if _ast.op.name == 'ass': names.add(_ast.lhs.ident)
+        bound_names(_ast.lhs, names), bound_names(_ast.rhs, names)
+    elif t is UnopNode: bound_names(_ast.expr, names)
+    elif t is StmtSeq:
+        for s in _ast.stmts: bound_names(s, names)
+    elif t is FnCall:
+        if type(_ast.fn) is not str: bound_names(_ast.fn, names)
+        for a in _ast.args: bound_names(a, names)
+    elif t is FnDef:
+        names.update(p.ident for p in _ast.params)
+        bound_names(_ast.body, names)
+    elif t is If: bound_names(_ast.cond, names), bound_names(_ast.true, names), bound_names(_ast.false, names)
+    elif t is Folded: bound_names(_ast.original, names)
+    return names
+
+def int_literal(_ast):
+    if type(_ast) is not IdentNode: return None
+    try:    return int(_ast.ident) # Same test as kol.ast2interpast.convert_identnode.
+    except: return None
+
+def unfolded(_ast):
+    "(value, names, original) of a Folded, anything else is its own value."
+    if type(_ast) is Folded: return _ast.value, _ast.names, _ast.original
+    return _ast, frozenset(), _ast
+
+# Folds of folds are merged, so a whole constant expression has one Folded.
+def fold(_ast, rebound: set, stats: RewriteStats | None):
+    t = type(_ast)
 
-def parse_and_rewrite(cstnode: kolcst.UnwindableMatch, parsemap = parsemap, rewrites = rewrites):
-    ast = parse(cstnode)
-    for r in rewrites: ast = r(ast)
+    if t is BinopNode:
+        lhs, rhs = fold(_ast.lhs, rebound, stats), fold(_ast.rhs, rebound, stats)
+        (lv, ln, lo), (rv, rn, ro) = unfolded(lhs), unfolded(rhs)
+        l, r = int_literal(lv), int_literal(rv)
+        if _ast.op.name in fold_ops and _ast.op.name not in rebound and l is not None and r is not None:
+            v = fold_ops[_ast.op.name](l, r)
+            if v is not None:
+                if stats is not None: stats.count('fold:binop')
+                return Folded(IdentNode(str(v)), ln | rn | {_ast.op.name}, BinopNode(lo, _ast.op, ro))
+        return BinopNode(lhs, _ast.op, rhs)
+    elif t is UnopNode: # kol.ast2interpast turns these into minus(0, expr).
+        expr = fold(_ast.expr, rebound, stats)
+        v, names, original = unfolded(expr)
+        if int_literal(v) is not None and 'minus' not in rebound:
+            if stats is not None: stats.count('fold:unop')
+            return Folded(IdentNode(str(0 - int_literal(v))), names | {'minus'}, UnopNode(_ast.op, original))
+        return UnopNode(_ast.op, expr)
+    elif t is StmtSeq: return StmtSeq([fold(s, rebound, stats) for s in _ast.stmts])
+    elif t is FnCall:
+        args = [fold(a, rebound, stats) for a in _ast.args]
+        v, names, original = unfolded(args[0]) if len(args) == 1 else (None, None, None)
+        if _ast.fn == 'kol.internal.identity' and int_literal(v) is not None and _ast.fn not in rebound: # Guarding any other would copy it.
+            if stats is not None: stats.count('fold:identity')
+            return Folded(v, names | {_ast.fn}, FnCall(_ast.fn, [original]))
+        return FnCall(fold(_ast.fn, rebound, stats) if type(_ast.fn) is not str else _ast.fn, args)
+    elif t is FnDef: return FnDef(fold(_ast.body, rebound, stats), _ast.params, _ast.pos)
+    elif t is If:
+        cond, true, false = fold(_ast.cond, rebound, stats), fold(_ast.true, rebound, stats), fold(_ast.false, rebound, stats)
+        (cv, names, original), builtin = unfolded(cond), 'kol.internal.if' if false is None else 'kol.internal.ifelse'
+        c = int_literal(cv)
+        if c is None or builtin in rebound: return If(cond, true, false)
+        if stats is not None: stats.count('fold:if')
+        return Folded(FnCall(true if c == 1 else false if false is not None else FnDef()), names | {builtin}, If(original, true, false))
+    return _ast # IdentNode or None.
+
+def fold_rewrite(_ast, stats: RewriteStats | None = None): return fold(_ast, bound_names(_ast, set()), stats)
+
+rewrites = [base_rewrite, fold_rewrite]
+
+def folding(rebound: set, rewrites = rewrites) -> List:
+    "rewrites with fold_rewrite also leaving the names in rebound be, eg. Interpreter.rebound()."
+    if not rebound: return rewrites
+    def fold_rebound(_ast, stats: RewriteStats | None = None): return fold(_ast, bound_names(_ast, set()) | rebound, stats)
+    return [fold_rebound if r is fold_rewrite else r for r in rewrites]
+
+# Rewrites are called as r(ast), or r(ast, stats) when collecting RewriteStats.
+def parse_and_rewrite(cstnode: kolcst.UnwindableMatch, parsemap = parsemap, rewrites = rewrites, stats: RewriteStats | None = None):
+    if stats is None:
+        ast = parse(cstnode)
+        for r in rewrites: ast = r(ast)
+        return ast
+
+    token = counting.set(stats)
+    try:
+        ast = parse(cstnode)
+        stats.nodes['parse'] = [0, count_nodes(ast)]
+        for r in rewrites: ast = stats.run(r, ast)
+    finally: counting.reset(token)
     return ast
 
 if __name__ == "__main__":
     from pprint import pprint
     from sys import argv
 
-    with open(argv[1]) as f: pprint( parse_and_rewrite( kolcst.parse( f.read() )[0] ), indent=4, width=100 )
\ No newline at end of file
+    stats = RewriteStats() if '--stats' in argv else None
+    with open(argv[1]) as f: pprint( parse_and_rewrite( kolcst.parse( f.read() )[0], stats = stats ), indent=4, width=100 )
+    if stats is not None: pprint(stats)
\ No newline at end of file
@@ -1,29 +1,34 @@
 from kol import interpast as tree, ast
 
-def convert_stmtseq(_ast, convertmap): # Serialize the statements into a list.
-    stmts = []
-    while type(_ast) is ast.StmtSeq:
-        stmts.append( convert(_ast.first, convertmap) )
-        _ast = _ast.rest
-    stmts.append( convert(_ast, convertmap) )
-    return stmts
+# Operators become tree.PrimOp, evaluated directly while their name is still
+# bound to the builtin, instead of a plain call of the function they name.
+primitive_ops = True
+
+def operator_call(name: str, params):
+    return tree.PrimOp(name, params) if primitive_ops else tree.KolFnCall(name, params)
+
+def convert_stmtseq(_ast, convertmap): return [convert(s, convertmap) for s in _ast.stmts]
 
 def convert_binopnode(_ast, convertmap):
     if _ast.op.name == 'ass': return tree.Assign(_ast.lhs.ident, convert(_ast.rhs, convertmap)) # Hardcoded for now
-    else: return tree.KolFnCall(_ast.op.name, [convert(_ast.lhs, convertmap), convert(_ast.rhs, convertmap)])
+    else: return operator_call(_ast.op.name, [convert(_ast.lhs, convertmap), convert(_ast.rhs, convertmap)])
 
 def convert_identnode(_ast, convertmap):
     try: return tree.KolInt(int(_ast.ident))
     except: return tree.Lookup(_ast.ident)
 
 def convert_unopnode(_ast, convertmap):
-    return tree.KolFnCall('minus', [tree.KolInt(0), convert(_ast.expr)]) # hardcoded to - for now.
+    return operator_call('minus', [tree.KolInt(0), convert(_ast.expr)]) # hardcoded to - for now.
 def convert_fncall(_ast, convertmap):
     return tree.KolFnCall(_ast.fn if type(_ast.fn) is str else convert(_ast.fn, convertmap), [convert(a, convertmap) for a in _ast.args])
 def convert_fndef(_ast, convertmap):
-    b = _ast.body if _ast.body is not None else []
-    b = convert(b) # May be StmtSeq or just a single statement, thats why we force in into a list below.
-    return tree.KolFn([a.ident.text for a in _ast.params], b if type(b) is list else [b])
+    b = convert(_ast.body, convertmap) if _ast.body is not None else []  # May be StmtSeq or just a single statement, thats why we force in into a list below.
+    return tree.KolFn([a.ident for a in _ast.params], b if type(b) is list else [b], _ast.pos)
+# Checked where it runs, the names could have been rebound by then.
+def convert_folded(_ast, convertmap):
+    value, original = convert(_ast.value, convertmap), convert(_ast.original, convertmap)
+    for name in sorted(_ast.names): value = tree.Cond(tree.BoundTo(name, tree.builtin_origin(name)), value, original)
+    return value
 def convert_if(_ast, convertmap):
     if _ast.false is None: return tree.KolFnCall('kol.internal.if',     [convert(_ast.cond, convertmap), convert(_ast.true, convertmap)])
     else:                  return tree.KolFnCall('kol.internal.ifelse', [convert(_ast.cond, convertmap), convert(_ast.true, convertmap), convert(_ast.false, convertmap)])
@@ -36,6 +41,7 @@ convertmap = {
     ast.FnCall: convert_fncall,
     ast.FnDef: convert_fndef,
     ast.If: convert_if,
+    ast.Folded: convert_folded,
 }
 
 def convert(_ast, convertmap = convertmap): return convertmap[type(_ast)](_ast, convertmap)
@@ -0,0 +1,108 @@
+# One program over many rows of inputs:
+#     b = batch.Batch(i, 'price * qty - ((price * qty) / 10)')
+#     b.run({'price': [12, 30], 'qty': [5, 150]}) # [54, 4050]
+#
+# The text is parsed, converted and run through the tree passes once. Rows are
+# evaluated in order in the global scope of the interpreter: every input is
+# assigned, as a KolInt or KolFloat, then the program runs and its value is
+# the row's result (unboxed, KolNil is None).
+#
+# When i has the kol.arrays operators the program can also run once on whole
+# columns, as long as that can't differ from running it per row: it may only
+# use literals, names, assignments, the builtin operators and ifs with an
+# else arm, no calls (a recursion ending on a row's value would never end with
+# the arms of an if both evaluated). Both arms run on every row, so they may
+# not assign, and neither may the program read a name it assigns before
+# assigning it, per row that is the value the row before left. A division by
+# zero in any row sends the whole batch to the row by row loop, where it fails
+# like it would per call. Columns use numpy's fixed width integers, unlike
+# KolInt.
+
+from kol import arrays, inline, interpast as tree
+
+from typing import List, Dict, Set, Any, Sequence
+
+def box(v):
+    if isinstance(v, float) or (arrays.np is not None and isinstance(v, arrays.np.floating)): return tree.KolFloat(float(v))
+    return tree.KolInt(int(v))
+
+def unbox(v):
+    if type(v) in (tree.KolInt, tree.KolFloat): return v.value
+    if type(v) is tree.KolNil: return None
+    return v
+
+# What a program may be made of to run on columns.
+vector_nodes = (tree.KolInt, tree.KolFloat, tree.Lookup, tree.SlotLookup, tree.Assign, tree.SlotAssign, tree.PrimOp, tree.Block, tree.Cond, tree.BoundTo, list)
+
+def vectorisable(program, i) -> bool:
+    if arrays.np is None or not program: return False
+    rebound = {a.name for a in inline.walk(program) if type(a) in (tree.Assign, tree.SlotAssign)}
+    parens  = 'kol.internal.identity' not in rebound | i.rebound() # Calls of it just give their argument.
+    for a in inline.walk(program):
+        t = type(a)
+        if t is tree.KolFnCall and a.fn == 'kol.internal.identity' and len(a.params) == 1 and parens: continue
+        if t not in vector_nodes: return False
+        if t is tree.PrimOp and (a.name in rebound or not arrays.broadcasts(i, a.name)): return False
+        if t is tree.Cond and a.false is None: return False
+        if t is tree.Cond and any(type(b) in (tree.Assign, tree.SlotAssign) for b in inline.walk([a.true, a.false])): return False # Both run.
+        if t is tree.Block and not a.body: return False # Evaluates to KolNil.
+    return not carried(program, {a.name for a in inline.walk(program) if type(a) is tree.Assign}, set())
+
+def carried(_ast, assigns: Set[str], done: Set[str]) -> bool:
+    "Whether _ast reads one of assigns (global names) before assigning it, done are the ones it assigned so far."
+    t = type(_ast)
+    if   t is tree.Lookup:     return _ast.name in assigns and _ast.name not in done
+    elif t is tree.Assign:
+        if carried(_ast.value, assigns, done): return True
+        done.add(_ast.name)
+    elif t is tree.SlotAssign: return carried(_ast.value, assigns, done)
+    elif t in (tree.PrimOp, tree.KolFnCall): return carried(_ast.params, assigns, done)
+    elif t is tree.Block:      return carried(_ast.args, assigns, done) or carried(_ast.body, assigns, done)
+    elif t is tree.Cond:       return carried([_ast.cond, _ast.true, _ast.false], assigns, done)
+    elif t is list:            return any(carried(a, assigns, done) for a in _ast)
+    return False
+
+class Batch:
+    def __init__(self, i, text: str, cstrule: str = 'stmts', vectorise: bool = True):
+        self.i = i
+        self.program, remaining = i.compile_str(text, cstrule)
+        if type(remaining.peek()) is not StopIteration: raise ValueError(f'kol.batch: program does not parse from {remaining.peek().text!r} at {remaining.peek().pos}')
+        self.vectorise = vectorise and vectorisable(self.program, i)
+
+    def run(self, columns: Dict[str, Sequence]) -> List[Any]:
+        rows = {len(c) for c in columns.values()}
+        if len(rows) > 1: raise ValueError(f'kol.batch: columns have different lengths {sorted(rows)}')
+        rows = rows.pop() if rows else 1
+
+        if self.vectorise:
+            try:
+                with arrays.np.errstate(divide = 'raise', invalid = 'raise'): return self.run_columns(columns, rows)
+            except FloatingPointError: pass # Some row divides by zero.
+        return self.run_rows(columns, rows)
+
+    def run_columns(self, columns: Dict[str, Sequence], rows: int) -> List[Any]:
+        for name, c in columns.items(): self.i.assign(name, tree.KolArray(arrays.np.asarray(c)))
+        ret = self.i.eval_ast(self.program)
+        if type(ret) is tree.KolArray: return arrays.np.broadcast_to(ret.value, (rows,)).tolist()
+        return [unbox(ret)] * rows # Doesn't depend on the inputs.
+
+    def run_rows(self, columns: Dict[str, Sequence], rows: int) -> List[Any]:
+        i, program, names, ret = self.i, self.program, list(columns), []
+        for row in zip(*columns.values()) if columns else [()] * rows:
+            for name, v in zip(names, row): i.assign(name, box(v))
+            ret.append(unbox(i.eval_ast(program)))
+        return ret
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol.bench import make
+    import csv
+
+    # python -m kol.batch program.kol inputs.csv, prints a result per row.
+    i = make()
+    if arrays.np is not None: arrays.add_builtins(i)
+
+    with open(argv[1]) as f: b = Batch(i, f.read())
+    with open(argv[2]) as f: rows = list(csv.DictReader(f))
+    columns = {k: [float(r[k]) if '.' in r[k] else int(r[k]) for r in rows] for k in (rows[0] if rows else [])}
+    for v in b.run(columns): print(v)
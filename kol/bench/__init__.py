@@ -0,0 +1,47 @@
+# What the benchmarks, and the python -m kol.<module> demos, share: an
+# interpreter with the builtins and the default pipeline, programs converted
+# without one, and timing.
+
+from kol import ast, ast2interpast, closures, cst, interp, operators, vm
+
+from time import perf_counter
+from typing import Any, Callable, Tuple
+import sys
+
+engines = {
+    'eval_ast': interp.Interpreter,
+    'vm':       vm.VM,
+    'closures': closures.ClosureInterpreter,
+}
+
+def make(cls = interp.Interpreter, **settings):
+    "An interpreter of class cls with the builtins, settings (tree_passes, cst_rules, ...) replace the defaults."
+    return interp.add_builtins(cls(**{
+        'operators':      operators.operators,
+        'cst_rules':      cst.default_rules,
+        'ast_parsemap':   ast.parsemap,
+        'ast_convertmap': ast2interpast.convertmap,
+        **settings,
+    }))
+
+def program(text: str, passes = (), rewrites = ast.rewrites, stats: ast.RewriteStats | None = None):
+    "Interpast of text (packrat parsed) after rewrites and then passes, like compile_str without an interpreter."
+    ret = ast2interpast.convert(ast.parse_and_rewrite(cst.parse(text, packrat = True)[0], rewrites = rewrites, stats = stats))
+    for p in passes: ret = p(ret)
+    return ret
+
+def timed(f: Callable, *args) -> Tuple[float, Any]:
+    "(seconds, what f returned) of one call."
+    start = perf_counter()
+    ret = f(*args)
+    return perf_counter() - start, ret
+
+def time_eval(i, program, repeats: int) -> Tuple[float, Any]:
+    "(seconds per run, value) of i.eval_ast(program) run repeats times."
+    start = perf_counter()
+    for _ in range(repeats): ret = i.eval_ast(program)
+    return (perf_counter() - start) / repeats, ret
+
+def arg(index: int, default: int) -> int:
+    "sys.argv[index] as an int, default without it."
+    return int(sys.argv[index]) if len(sys.argv) > index else default
@@ -0,0 +1,36 @@
+# kol.bench.closures' formula over a column of rows, evaluated once per row on
+# scalars against once on whole kol.arrays columns.
+#
+# Usage: python -m kol.bench.arrays [rows]
+
+from kol import arrays, inline, interpast as tree, resolve
+from kol.bench import arg, engines, make, program, timed
+from kol.bench.closures import formula
+
+def per_row(i, p, price, qty):
+    ret = []
+    for pr, q in zip(price, qty):
+        i.assign('price', tree.KolInt(int(pr)))
+        i.assign('qty', tree.KolInt(int(q)))
+        ret.append(i.eval_ast(p).value)
+    return ret
+
+def columns(i, p, price, qty):
+    i.assign('price', tree.KolArray(price))
+    i.assign('qty', tree.KolArray(qty))
+    return list(i.eval_ast(p).value)
+
+if __name__ == "__main__":
+    arrays.require()
+    rows  = arg(1, 20000)
+    rng   = arrays.np.random.default_rng(0)
+    price = rng.integers(1, 100, rows)
+    qty   = rng.integers(0, 200, rows)
+
+    print(f'{rows} rows')
+    p = program(formula, [inline.inline, resolve.resolve])
+    for name, cls in engines.items():
+        t_rows, r_rows = timed(per_row, make(cls), p, price, qty)
+        t_cols, r_cols = timed(columns, arrays.add_builtins(make(cls)), p, price, qty)
+        assert r_rows == r_cols, name
+        print(f"    {name:<10} {t_rows:>8.4f} -> {t_cols:.4f} ({t_rows / t_cols:.0f}x)")
@@ -0,0 +1,47 @@
+# Rows per second of kol.batch.Batch against calling Interpreter.eval_str per
+# row, on kol.bench.closures' formula.
+#
+# Usage: python -m kol.bench.batch [rows]
+
+from kol import arrays, batch, interpast as tree
+from kol.bench import arg, engines, make, timed
+from kol.bench.closures import formula
+
+import random
+
+def per_call(i, columns):
+    ret = []
+    for price, qty in zip(columns['price'], columns['qty']):
+        i.assign('price', tree.KolInt(price))
+        i.assign('qty', tree.KolInt(qty))
+        ret.append(i.eval_str(formula)[0].value)
+    return ret
+
+def rate(f, rows: int):
+    seconds, ret = timed(f)
+    return rows / seconds, ret
+
+if __name__ == "__main__":
+    rows    = arg(1, 50000)
+    random.seed(0)
+    columns = {'price': [random.randint(1, 100) for _ in range(rows)], 'qty': [random.randint(0, 200) for _ in range(rows)]}
+    few     = {k: v[:rows // 100] for k, v in columns.items()} # eval_str is too slow for all of them.
+
+    paths = ['eval_str', 'rows'] + (['columns'] if arrays.np is not None else [])
+    print(f"{rows} rows, rows/s\n{'engine':<10} " + ' '.join(f'{p:>12}' for p in paths))
+    for name, cls in engines.items():
+        i = make(cls)
+        if arrays.np is not None: arrays.add_builtins(i)
+
+        r_call, ret_call = rate(lambda: per_call(i, few), len(few['qty']))
+        loop = batch.Batch(i, formula, vectorise = False) # Parsed once, not timed.
+        r_rows, ret_rows = rate(lambda: loop.run(columns), rows)
+        rates = [r_call, r_rows]
+        assert ret_rows[:len(ret_call)] == ret_call, name
+        if arrays.np is not None:
+            b = batch.Batch(i, formula)
+            assert b.vectorise, name
+            r_cols, ret_cols = rate(lambda: b.run(columns), rows)
+            assert ret_cols == ret_rows, name
+            rates.append(r_cols)
+        print(f'{name:<10} ' + ' '.join(f'{r:>12.0f}' for r in rates))
@@ -0,0 +1,40 @@
+# The three engines on the kol.bench.vm workloads and on a hot formula.
+#
+# Usage: python -m kol.bench.closures [repeats]
+
+from kol import inline, interpast as tree, resolve
+from kol.bench import arg, engines, make, program, time_eval, timed
+from kol.bench.vm import workloads
+
+formula = 'price * qty - ((price * qty) / 10) + (if qty > 100 => { 0 - 5 } ... => { 0 } end)'
+
+def time_formula(cls, n: int):
+    i, p = make(cls), program(formula, [inline.inline, resolve.resolve])
+    i.assign('price', tree.KolInt(12))
+    elapsed = 0
+    for q in range(n):
+        i.assign('qty', tree.KolInt(q))
+        seconds, ret = timed(i.eval_ast, p)
+        elapsed += seconds
+    return elapsed / n, ret
+
+if __name__ == "__main__":
+    repeats = arg(1, 20)
+
+    print(f"{'workload':<12} " + ' '.join(f'{e:>10}' for e in engines))
+    for name, text in workloads.items():
+        p, times, rets = program(text, [inline.inline, resolve.resolve]), [], []
+        for cls in engines.values():
+            t, ret = time_eval(make(cls), p, repeats)
+            times.append(t)
+            rets.append(ret)
+        assert all(r == rets[0] for r in rets), (name, rets)
+        print(f'{name:<12} ' + ' '.join(f'{t:>10.4f}' for t in times))
+
+    times, rets = [], []
+    for cls in engines.values():
+        t, ret = time_formula(cls, 1000 * repeats)
+        times.append(t)
+        rets.append(ret)
+    assert all(r == rets[0] for r in rets), ('formula', rets)
+    print(f"{'formula':<12} " + ' '.join(f'{t * 1e6:>8.2f}us' for t in times))
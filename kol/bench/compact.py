@@ -0,0 +1,93 @@
+# Memory per node at every stage of the pipeline (lexemes, cst matches, ast
+# and interpast nodes, what each holds on to, measured with tracemalloc) and
+# Kol values made per operator evaluated, on every engine.
+#
+# Usage: python -m kol.bench.compact [n]
+
+from kol import ast, ast2interpast, cst, inline, interpast as tree, lexer as lex
+from kol.bench import arg, engines, make, time_eval
+from kol.bench.generators import recursion, statements, wide_arithmetic
+
+from dataclasses import fields
+import tracemalloc
+
+def retained(f, *args):
+    "(what f returned, bytes it still holds on to)."
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ret = f(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ret, after - before
+
+def cst_nodes(m) -> int:
+    if type(m) is not cst.UnwindableMatch: return 0
+    return 1 + sum(cst_nodes(f) for f in m._fields)
+
+ast_types = (ast.StmtSeq, ast.BinopNode, ast.UnopNode, ast.IdentNode, ast.FnDef, ast.FnCall, ast.If, ast.Folded)
+
+def ast_nodes(a) -> int: # Statements are a linked list, too deep to recurse.
+    count, todo = 0, [a]
+    while todo:
+        a = todo.pop()
+        if type(a) is list: todo.extend(a)
+        elif type(a) in ast_types:
+            count += 1
+            todo.extend(getattr(a, f.name) for f in fields(a))
+    return count
+
+def per_node(text: str):
+    lexemes, lex_bytes = retained(lambda: list(lex.lex(text)))
+    _cst, cst_bytes    = retained(lambda: cst.parse_tokens(lexemes, cst.default_rules, packrat = True)[0])
+    _ast, ast_bytes    = retained(ast.parse_and_rewrite, _cst)
+    _tree, tree_bytes  = retained(ast2interpast.convert, _ast)
+    return [
+        ('lexemes',   len(lexemes),       lex_bytes),
+        ('cst',       cst_nodes(_cst),    cst_bytes),
+        ('ast',       ast_nodes(_ast),    ast_bytes),
+        ('interpast', inline.size(_tree), tree_bytes),
+    ]
+
+def values_made(f, *args) -> int:
+    "How many Kol values (KolInt, KolFloat) f makes."
+    types, made = (tree.KolInt, tree.KolFloat), [0]
+    inits = [t.__init__ for t in types] # Their own, made by dataclass. A __new__ can't be put back.
+    def counting(init):
+        def __init__(self, *args, **kwargs):
+            made[0] += 1
+            init(self, *args, **kwargs)
+        return __init__
+    for t, init in zip(types, inits): t.__init__ = counting(init)
+    try: f(*args)
+    finally:
+        for t, init in zip(types, inits): t.__init__ = init
+    return made[0]
+
+def compiled(cls, text: str):
+    i = make(cls)
+    program, _ = i.compile_str(text)
+    i.eval_ast(program) # Compiles, for the engines that do.
+    return i, program
+
+def per_operation(cls, text: str, repeats: int = 5):
+    i, program = compiled(cls, text)
+    ops = sum(1 for a in inline.walk(program) if type(a) is tree.PrimOp) # Straight line, each runs once.
+    return ops, time_eval(i, program, repeats)[0]
+
+if __name__ == "__main__":
+    n = arg(1, 200)
+
+    text = statements(n) + ';\n' + recursion(4)
+    print(f"{'stage':<10} {'nodes':>8} {'bytes':>10} {'bytes/node':>11}")
+    for name, nodes, size in per_node(text):
+        print(f'{name:<10} {nodes:>8} {size:>10} {size / nodes:>11.1f}')
+
+    print()
+    text = wide_arithmetic(n) + ';\n' + statements(n)
+    timings = {name: per_operation(cls, text) for name, cls in engines.items()}
+    print(f"{'engine':<10} {'ops':>8} {'values':>8} {'values/op':>10} {'ns/op':>8}")
+    for name, cls in engines.items():
+        ops, seconds = timings[name]
+        i, program = compiled(cls, text)
+        made = values_made(i.eval_ast, program)
+        print(f'{name:<10} {ops:>8} {made:>8} {made / ops:>10.2f} {seconds / ops * 1e9:>8.0f}')
@@ -0,0 +1,32 @@
+# What kol.ast.fold_rewrite takes off generated scripts.
+#
+# Usage: python -m kol.bench.fold [repeats]
+
+from kol import ast, interp, resolve, vm
+from kol.bench import arg, make, program, time_eval
+
+from pprint import pprint
+
+def constants(n: int) -> str:
+    return 'x = 1;\n' + ''.join(f'x = x + (60 * 60) * 24 - (7 / 2) + (-{i} - 1);\n' for i in range(n))
+def branches(n: int) -> str:
+    return 'debug = 0;\nx = 0;\n' + ''.join(f'x = x + (if 0 == 1 => {{ debug }} 2 > 1 => {{ {i} }} ... => {{ 0 - 1 }} end);\n' for i in range(n))
+
+workloads = {
+    'constants': constants(150),
+    'branches':  branches(150),
+}
+
+if __name__ == "__main__":
+    repeats = arg(1, 20)
+
+    for name, text in workloads.items():
+        stats = ast.RewriteStats()
+        plain, folded = program(text, [resolve.resolve], [ast.base_rewrite]), program(text, [resolve.resolve], ast.rewrites, stats)
+        print(name)
+        pprint(stats)
+        for engine, cls in (('eval_ast', interp.Interpreter), ('vm', vm.VM)):
+            t_plain,  r_plain  = time_eval(make(cls), plain, repeats)
+            t_folded, r_folded = time_eval(make(cls), folded, repeats)
+            assert r_plain == r_folded, (name, engine, r_plain, r_folded)
+            print(f"    {engine:<10} {t_plain:>8.4f} -> {t_folded:.4f} ({t_plain / t_folded:.1f}x)")
@@ -0,0 +1,66 @@
+# Synthetic Kol programs that grow with n, for kol.bench.suite. Every one of
+# them evaluates to an integer on every engine.
+#
+# Assignment binds tighter than any other operator and mul/div have no
+# precedence between them, so right hand sides and products are parenthesized.
+
+from typing import Callable, Dict
+
+def statements(n: int) -> str:
+    "A long list of statements."
+    return 'x = 0;\n' + ''.join(f'x = (x + {k % 7} - {k % 3});\n' for k in range(n)) + 'x'
+
+def deep_arithmetic(n: int) -> str:
+    "One expression nested n parentheses deep."
+    expr = '1'
+    for k in range(n): expr = f'({k % 9} - {expr})' if k % 3 else f'(({k % 5} * 2) + {expr})'
+    return expr
+
+def wide_arithmetic(n: int) -> str:
+    "One flat chain of n operators."
+    return '0' + ''.join((f' + ({k % 5} * 3)' if k % 3 == 0 else f' - {k % 7}' if k % 2 else f' + {k % 11}') for k in range(n))
+
+def right_partials(n: int) -> str:
+    "Right partial ifs, if v => name ... < a => { ... } end, nested n deep."
+    body = 'v0'
+    for k in range(n):
+        body = f'if v => v{k} ... < 5 => {{ {k} }} == 5 => {{ {body} }} ... => {{ 0 - {k} }} end'
+    return f'v = 5;\n{body}'
+
+def left_partials(n: int) -> str:
+    "Left partial ifs, if a < ... v => { ... } end, nested n deep."
+    body = '1'
+    for k in range(n):
+        body = f'if {k % 5} < ... v => {{ {body} }} ... => {{ {k} }} end'
+    return f'v = 5;\n{body}'
+
+def recursion(n: int) -> str:
+    "n recursive functions, each also calling the one before it."
+    defs = ['f0 = [n] { if n < 1 => { 0 } ... => { f0(n - 1) + 1 } end };\n']
+    for k in range(1, n): defs.append(f'f{k} = [n] {{ if n < 1 => {{ {k} }} ... => {{ f{k}(n - 1) + f{k - 1}(1) }} end }};\n')
+    return ''.join(defs) + f'f{n - 1}(4)'
+
+adjectives = ['total', 'unit', 'net', 'gross', 'base', 'final', 'daily', 'max']
+nouns      = ['price', 'count', 'weight', 'margin', 'rate', 'offset', 'limit', 'share']
+
+def multiword(n: int) -> str:
+    "Multi-word identifiers, each defined from the one before it."
+    names = [f'{adjectives[k % len(adjectives)]} {nouns[(k // len(adjectives)) % len(nouns)]} {"item " * (k // 64)}'.strip() for k in range(n)]
+    # Parenthesized, kol.lexer joins the words of a trailing identifier wrongly.
+    return f'{names[0]} = 1;\n' + ''.join(f'{b} = ({a} + {k % 4});\n' for k, (a, b) in enumerate(zip(names, names[1:]))) + f'({names[-1]})'
+
+generators: Dict[str, Callable[[int], str]] = {
+    'statements':      statements,
+    'deep_arithmetic': deep_arithmetic,
+    'wide_arithmetic': wide_arithmetic,
+    'right_partials':  right_partials,
+    'left_partials':   left_partials,
+    'recursion':       recursion,
+    'multiword':       multiword,
+}
+
+if __name__ == "__main__":
+    from sys import argv
+
+    # python -m kol.bench.generators name n, prints the program.
+    print(generators[argv[1]](int(argv[2])))
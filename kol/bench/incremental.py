@@ -0,0 +1,45 @@
+# Parsing a buffer again after every keystroke: cst.parse and i.compile_str of
+# the whole text against kol.incremental, for edits at random places of a
+# long generated script (typing a digit, a newline, deleting a character).
+#
+# Usage: python -m kol.bench.incremental [n] [edits]
+
+from kol import cst, incremental, interp
+from kol.bench import arg, make, timed
+from kol.bench.generators import statements
+
+import random
+
+def edits(text: str, n: int, seed: int = 0):
+    "(offset, removed, inserted) keystrokes, each applied to the text the ones before left."
+    rand = random.Random(seed)
+    for _ in range(n):
+        offset = rand.randrange(len(text))
+        edit = rand.choice([(offset, 0, str(rand.randrange(10))), (offset, 0, '\n'), (offset, 1, '')])
+        text = text[:edit[0]] + edit[2] + text[edit[0] + edit[1]:]
+        yield edit
+
+if __name__ == "__main__":
+    n, count = arg(1, 500), arg(2, 20)
+
+    i, text = make(interp.Interpreter), statements(n)
+    doc = incremental.Document(text)
+    doc.program(i)
+
+    full = {'parse': 0.0, 'compile': 0.0}
+    incr = {'parse': 0.0, 'compile': 0.0}
+    reused = relexed = 0
+    for offset, removed, inserted in edits(text, count):
+        text = text[:offset] + inserted + text[offset + removed:]
+        full['parse']   += timed(cst.parse, text)[0]
+        full['compile'] += timed(i.compile_str, text)[0]
+
+        edited, change = timed(doc.edit, offset, removed, inserted)
+        incr['parse']   += edited
+        incr['compile'] += edited + timed(doc.program, i)[0] # compile_str parses too.
+        reused, relexed = reused + len(doc.statements) - change.added, relexed + change.relexed
+
+    print(f'{n} statements, {count} edits, {reused / count:.0f} statements reused and {relexed / count:.1f} tokens lexed per edit')
+    print(f"{'stage':<10} {'full':>10} {'incremental':>12} {'speedup':>8}")
+    for stage in full:
+        print(f'{stage:<10} {full[stage] / count * 1e3:>8.1f}ms {incr[stage] / count * 1e3:>10.2f}ms {full[stage] / incr[stage]:>7.0f}x')
@@ -0,0 +1,30 @@
+# Nested conditional logic with and without kol.inline.
+#
+# Usage: python -m kol.bench.inline [repeats]
+
+from kol import inline, interp, resolve, vm
+from kol.bench import arg, make, program, time_eval
+
+def conditionals(n: int) -> str:
+    return (
+        'clamp = [v; lo; hi] { if v < lo => { lo } v > hi => { hi } ... => { v } end };\n'
+        'sign = [v] { if v < 0 => { 0 - 1 } v == 0 => { 0 } ... => { 1 } end };\n'
+        'bucket = [v] { if clamp(v; 0; 100) => c ... < 10 => { 1 } < 50 => { if sign(v - 25) == 1 => { 3 } ... => { 2 } end } ... => { 4 } end };\n'
+        'x = 0;\n'
+    ) + ''.join(f'x = x + bucket({(i * 37) % 140 - 20}) + sign({i % 7 - 3});\n' for i in range(n))
+
+workloads = {
+    'conditionals': conditionals(150),
+}
+
+if __name__ == "__main__":
+    repeats = arg(1, 20)
+
+    print(f"{'workload':<14} {'engine':<10} {'calls':>10} {'inlined':>10} {'speedup':>8}")
+    for name, text in workloads.items():
+        calls, inlined = program(text, [resolve.resolve]), program(text, [inline.inline, resolve.resolve])
+        for engine, cls in (('eval_ast', interp.Interpreter), ('vm', vm.VM)):
+            t_calls,   r_calls   = time_eval(make(cls), calls, repeats)
+            t_inlined, r_inlined = time_eval(make(cls), inlined, repeats)
+            assert r_calls == r_inlined, (name, engine, r_calls, r_inlined)
+            print(f"{name:<14} {engine:<10} {t_calls:>10.4f} {t_inlined:>10.4f} {t_calls / t_inlined:>7.1f}x")
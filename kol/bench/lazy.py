@@ -0,0 +1,27 @@
+# Eager against call-by-need (kol.lazy) evaluation, with an expensive argument
+# the callee rarely uses and with arguments that are always used.
+#
+# Usage: python -m kol.bench.lazy [n]
+
+from kol import inline, interp, lazy, resolve
+from kol.bench import arg, make, program, timed
+
+fib = 'fib = [n] { if n < 2 => { n } ... => { fib(n - 1) + fib(n - 2) } end };\n'
+
+def rarely_used(n: int) -> str: # fib(12) is needed once out of n calls.
+    return fib + 'pick = [c; a; b] { if c == 1 => { a } ... => { b } end };\n' + \
+        f'run = [n; acc] {{ if n < 1 => {{ acc }} ... => {{ run(n - 1; acc + pick(n == 1; fib(12); n)) }} end }};\nrun({n}; 0)'
+
+def always_used(n: int) -> str: return fib + f'fib({n // 2})'
+
+if __name__ == "__main__":
+    n = arg(1, 30)
+
+    print(f"{'program':<12} {'passes':<16} {'eager':>10} {'lazy':>10} {'speedup':>8}")
+    for name, text in [('rarely used', rarely_used(n)), ('always used', always_used(n))]:
+        for passes_name, passes in [('inline, resolve', [inline.inline, resolve.resolve]), ('resolve', [resolve.resolve])]:
+            p = program(text, passes + [lazy.mark]) # Eager evaluation ignores what it marks.
+            eager, ret = timed(make(interp.Interpreter).eval_ast, p)
+            called, lret = timed(lazy.enable(make(interp.Interpreter)).eval_ast, p)
+            assert ret == lret, (ret, lret)
+            print(f'{name:<12} {passes_name:<16} {eager * 1e3:>8.1f}ms {called * 1e3:>8.1f}ms {eager / called:>7.2f}x')
@@ -0,0 +1,26 @@
+# Doubly recursive functions with and without kol.memo, on every engine, plus
+# how a cache too small for the calls (evictions) does.
+#
+# Usage: python -m kol.bench.memo [n]
+
+from kol import inline, memo, resolve
+from kol.bench import arg, engines, make, program, timed
+
+def fib(n: int) -> str: return f'fib = [n] {{ if n < 2 => {{ n }} ... => {{ fib(n - 1) + fib(n - 2) }} end }};\nfib({n})'
+
+def paths(n: int) -> str: # Grid walks, two arguments.
+    return f'paths = [x; y] {{ if x < 1 => {{ 1 }} y < 1 => {{ 1 }} ... => {{ paths(x - 1; y) + paths(x; y - 1) }} end }};\npaths({n // 2}; {n // 2})'
+
+def run(cls, p): return timed(make(cls).eval_ast, p)
+
+if __name__ == "__main__":
+    n = arg(1, 20)
+
+    print(f"{'program':<10} {'engine':<10} {'plain':>10} {'memo':>10} {'memo 8':>10} {'speedup':>8}")
+    for name, text in [('fib', fib(n)), ('paths', paths(n))]:
+        for engine, cls in engines.items():
+            plain, ret = run(cls, program(text, [inline.inline, resolve.resolve]))
+            memoized, mret = run(cls, program(text, [inline.inline, resolve.resolve, memo.memoize]))
+            small, sret = run(cls, program(text, [inline.inline, resolve.resolve, lambda p: memo.memoize(p, 8)]))
+            assert ret == mret == sret, (ret, mret, sret)
+            print(f'{name:<10} {engine:<10} {plain * 1e3:>8.1f}ms {memoized * 1e3:>8.1f}ms {small * 1e3:>8.1f}ms {plain / memoized:>7.0f}x')
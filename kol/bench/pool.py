@@ -0,0 +1,30 @@
+# Scripts per second of kol.pool.Pool with more and more processes, against
+# evaluating them one after the other in this process.
+#
+# Usage: python -m kol.bench.pool [jobs]
+
+from kol import pool
+from kol.bench import arg, timed
+from kol.bench.vm import calls, recursion
+
+from typing import List
+import os
+
+def jobs(n: int) -> List[str]: return [recursion(10 + k % 4) if k % 2 else calls(10 + k % 5) for k in range(n)]
+
+if __name__ == "__main__":
+    n = arg(1, 200)
+    texts = jobs(n)
+
+    t_serial, serial = timed(lambda: [pool.make_interpreter().eval_str(t)[0] for t in texts])
+    print(f"{n} scripts, {os.cpu_count()} cpus, scripts/s")
+    print(f"    {'serial':<12} {n / t_serial:>8.1f}")
+
+    processes = 1
+    while processes <= (os.cpu_count() or 1):
+        with pool.Pool(processes) as p:
+            p.eval_strs(texts[:processes]) # Workers started.
+            elapsed, ret = timed(p.eval_strs, texts)
+        assert ret == serial, processes
+        print(f"    {f'{processes} processes':<12} {n / elapsed:>8.1f} ({t_serial / elapsed:.1f}x)")
+        processes *= 2
@@ -0,0 +1,31 @@
+# Branch attempts avoided by FIRST set prediction in kol.cst.
+#
+# Usage: python -m kol.bench.prediction [files...] (defaults to examples/*.kol)
+
+from kol import cst
+
+from glob import glob
+
+def attempts(text: str, predict: bool, packrat = False) -> cst.PredictionStats:
+    stats = cst.PredictionStats()
+    cst.parse(text, predict = predict, packrat = packrat, stats = stats)
+    return stats
+
+def compare(paths, packrat = False):
+    for path in paths:
+        with open(path) as f: text = f.read()
+        without, predicted = attempts(text, False, packrat), attempts(text, True, packrat)
+        yield path, without.total_attempted(), predicted.total_attempted(), predicted.total_skipped()
+
+if __name__ == "__main__":
+    from sys import argv
+
+    paths   = [a for a in argv[1:] if not a.startswith('--')] or sorted(glob('examples/*.kol'))
+    packrat = '--packrat' in argv
+
+    print(f"{'file':<24} {'without':>10} {'with':>10} {'skipped':>10} {'avoided':>10}")
+    total_without, total_with = 0, 0
+    for path, without, predicted, skipped in compare(paths, packrat):
+        total_without, total_with = total_without + without, total_with + predicted
+        print(f"{path:<24} {without:>10} {predicted:>10} {skipped:>10} {without - predicted:>10}")
+    print(f"{'total':<24} {total_without:>10} {total_with:>10} {'':>10} {total_without - total_with:>10}")
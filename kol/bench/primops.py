@@ -0,0 +1,24 @@
+# Operators as plain calls of their builtin against tree.PrimOp.
+#
+# Usage: python -m kol.bench.primops [repeats]
+
+from kol import ast2interpast, interp, resolve, vm
+from kol.bench import arg, make, program, time_eval
+from kol.bench.vm import workloads
+
+def converted(text: str, primitive_ops: bool):
+    ast2interpast.primitive_ops = primitive_ops
+    try:     return program(text, [resolve.resolve])
+    finally: ast2interpast.primitive_ops = True
+
+if __name__ == "__main__":
+    repeats = arg(1, 20)
+
+    print(f"{'workload':<12} {'engine':<12} {'calls':>10} {'primops':>10} {'speedup':>8}")
+    for name, text in workloads.items():
+        calls, primops = converted(text, False), converted(text, True)
+        for engine, cls in (('eval_ast', interp.Interpreter), ('vm', vm.VM)):
+            t_calls,   r_calls   = time_eval(make(cls), calls, repeats)
+            t_primops, r_primops = time_eval(make(cls), primops, repeats)
+            assert r_calls == r_primops, (name, engine, r_calls, r_primops)
+            print(f"{name:<12} {engine:<12} {t_calls:>10.4f} {t_primops:>10.4f} {t_calls / t_primops:>7.1f}x")
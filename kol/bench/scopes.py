@@ -0,0 +1,39 @@
+# Cost of reading variables at increasing call depth.
+#
+# down recurses depth times and then runs leaf, which reads its parameter
+# (resolved to its scope by kol.resolve) and a global (always dynamic) reads
+# times each. Interpreter scans every scope for the global, VM probes one dict.
+#
+# Usage: python -m kol.bench.scopes [repeats]
+
+from kol import interp, resolve, vm
+from kol.bench import arg, make, program, time_eval
+import sys
+
+def reading(depth: int, reads: int = 100) -> str:
+    return (
+        'g = 1;\n'
+        f'leaf = [a] {{ {" + ".join(["a"] * reads)} + {" + ".join(["g"] * reads)} }};\n'
+        'down = [n] { if n > 0 => { down(n - 1) } ... => { leaf(1) } end };\n'
+        f'down({depth})'
+    )
+
+engines = {
+    'dynamic':  (interp.Interpreter, False),
+    'resolved': (interp.Interpreter, True),
+    'vm':       (vm.VM, True),
+}
+
+if __name__ == "__main__":
+    repeats = arg(1, 10)
+    sys.setrecursionlimit(100000)
+
+    print(f"{'depth':>6} " + ' '.join(f'{e:>10}' for e in engines))
+    for depth in (1, 50, 100, 200):
+        base, times, rets = program(reading(depth)), [], []
+        for cls, resolved in engines.values():
+            t, ret = time_eval(make(cls), resolve.resolve(base) if resolved else base, repeats)
+            times.append(t)
+            rets.append(ret)
+        assert all(r == rets[0] for r in rets), (depth, rets)
+        print(f'{depth:>6} ' + ' '.join(f'{t:>10.4f}' for t in times))
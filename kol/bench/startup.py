@@ -0,0 +1,50 @@
+# Time to a runnable program for a couple hundred generated .kol files, with no
+# cache, a cold kol.progcache.ProgramCache (empty, every file is stored) and
+# a warm one (every file is loaded).
+#
+# Usage: python -m kol.bench.startup [files]
+
+from kol import interp, progcache, vm
+from kol.bench import arg, make, timed
+from kol.bench.fold import branches, constants
+from kol.bench.vm import arithmetic, calls, recursion
+
+import os, tempfile
+
+def generate(directory: str, n: int):
+    kinds = [arithmetic, calls, constants, branches]
+    for k in range(n):
+        with open(os.path.join(directory, f'gen_{k}.kol'), 'w') as f:
+            f.write(kinds[k % len(kinds)](5 + k % 5) + f'\nseed = {k};\n' + recursion(5 + k % 3))
+
+def cached(cache: progcache.ProgramCache):
+    i = make(interp.Interpreter)
+    i.program_cache = cache
+    return i
+
+def compile_all(i, paths):
+    programs = []
+    for p in paths:
+        with open(p) as f: programs.append(i.compile_str(f.read())[0])
+    return programs
+
+if __name__ == "__main__":
+    n = arg(1, 200)
+
+    with tempfile.TemporaryDirectory() as d:
+        generate(d, n)
+        paths = sorted(os.path.join(d, p) for p in os.listdir(d))
+        cache = progcache.ProgramCache(os.path.join(d, 'programs'), max_entries = n)
+
+        t_none, plain = timed(compile_all, make(interp.Interpreter), paths)
+        t_cold, _     = timed(compile_all, cached(cache), paths)
+        t_warm, warm  = timed(compile_all, cached(cache), paths)
+        assert plain == warm
+
+        # Results are the same either way.
+        for p, w in list(zip(plain, warm))[:20]: assert make(vm.VM).eval_ast(p) == make(vm.VM).eval_ast(w)
+
+        print(f"{n} files")
+        print(f"    no cache   {t_none:>8.4f}")
+        print(f"    cold cache {t_cold:>8.4f}")
+        print(f"    warm cache {t_warm:>8.4f} ({t_none / t_warm:.1f}x)")
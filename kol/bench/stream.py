@@ -0,0 +1,34 @@
+# Whole text (eval_str) against statement by statement (eval_stream) on a long
+# generated script: time to the first value, total time and peak memory.
+#
+# Usage: python -m kol.bench.stream [n]
+
+from kol import interp
+from kol.bench import arg, make
+from kol.bench.generators import statements
+
+from time import perf_counter
+import io, tracemalloc
+
+def measure(f):
+    "(seconds to the first value, seconds, peak bytes) of f, a generator."
+    tracemalloc.start()
+    start, first = perf_counter(), None
+    for _ in f():
+        if first is None: first = perf_counter() - start
+    total = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak
+
+def whole(text: str): yield make(interp.Interpreter).eval_str(text)[0]
+
+def streamed(text: str): return make(interp.Interpreter).eval_stream(io.StringIO(text))
+
+if __name__ == "__main__":
+    n = arg(1, 500)
+
+    print(f"{'mode':<8} {'first':>10} {'total':>10} {'peak':>10}")
+    for name, f in [('whole', whole), ('stream', streamed)]:
+        first, total, peak = measure(lambda: f(statements(n)))
+        print(f'{name:<8} {first * 1e3:>8.1f}ms {total * 1e3:>8.1f}ms {peak / 1024:>8.0f}KB')
@@ -0,0 +1,111 @@
+# Every stage of the pipeline (see kol.metrics) timed on the kol.bench.generators
+# workloads across input sizes, best of a few runs, written out as JSON. Given
+# an earlier run to compare with, stages that got slower by more than the
+# threshold are flagged and the exit status is 1.
+#
+# Usage: python -m kol.bench.suite [options]
+#   --only name,name    workloads to run, all of them by default,
+#   --sizes n,n         sizes for every workload, default_sizes otherwise,
+#   --repeats n         runs per program, the fastest one of each stage counts (3),
+#   --engine name       a kol.pool engine evaluating the programs (eval_ast),
+#   --compiled-grammar  parse with kol.cstgen instead of the cst rules,
+#   --out path          where the results go (stdout),
+#   --compare path      results to compare with,
+#   --threshold x       slowdown flagged, as a fraction (0.25),
+#   --min-ms x          differences smaller than this are noise (0.05).
+
+from kol import metrics, pool
+from kol.bench.generators import generators
+
+from typing import Dict, List, Any
+import json, platform
+
+version = 1 # Bump whenever the results change shape.
+
+# The cst rules backtrack a lot on nested code, parsing gets ~5x slower per level there.
+default_sizes = {
+    'statements':      [8, 32, 128],
+    'deep_arithmetic': [1, 2, 3, 4],
+    'wide_arithmetic': [8, 32, 128],
+    'right_partials':  [1, 2, 3],
+    'left_partials':   [1, 2, 3],
+    'recursion':       [1, 2, 4],
+    'multiword':       [8, 32, 128],
+}
+
+def run_one(text: str, repeats: int, engine: str, compiled_grammar: bool) -> Dict[str, Any]:
+    best, counts, value = {}, {}, None
+    for _ in range(repeats):
+        ret, _, m = metrics.measure(pool.make_interpreter(engine, compiled_grammar), text) # Fresh, programs assign globals.
+        for s in m.stages:
+            best[s.name]   = min(best.get(s.name, s.seconds), s.seconds)
+            counts[s.name] = s.counts
+        value = repr(ret)
+    return {'stages': best, 'counts': counts, 'value': value}
+
+def run(workloads: List[str], sizes: List[int] | None, repeats: int, engine: str, compiled_grammar: bool, log = None) -> Dict[str, Any]:
+    results = {}
+    for name in workloads:
+        results[name] = {}
+        for n in sizes or default_sizes[name]:
+            results[name][str(n)] = run_one(generators[name](n), repeats, engine, compiled_grammar)
+            if log is not None: log(f'{name} {n}: ' + ', '.join(f'{k} {v * 1e3:.3f}ms' for k, v in results[name][str(n)]['stages'].items()))
+    return {
+        'suite': 'kol.bench.suite', 'version': version, 'python': platform.python_version(),
+        'engine': engine, 'compiled_grammar': compiled_grammar, 'repeats': repeats,
+        'results': results,
+    }
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float, min_seconds: float):
+    "(report lines, regressions) for the stages both runs timed."
+    lines, regressions = [], []
+    for key in ('version', 'engine', 'compiled_grammar'):
+        if old.get(key) != new.get(key): lines.append(f'warning: {key} differs, {old.get(key)!r} then {new.get(key)!r}')
+
+    lines.append(f"{'workload':<16} {'size':>5} {'stage':<10} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for name, sizes in new['results'].items():
+        for n, run in sizes.items():
+            if n not in old['results'].get(name, {}): continue
+            before = old['results'][name][n]
+            if before['value'] != run['value']: lines.append(f'warning: {name} {n} evaluated to {run["value"]}, was {before["value"]}')
+            for stage, t in run['stages'].items():
+                if stage not in before['stages']: continue
+                t0 = before['stages'][stage]
+                ratio = t / t0 if t0 else float('inf')
+                slower = ratio > 1 + threshold and t - t0 > min_seconds
+                if slower: regressions.append((name, int(n), stage, t0, t))
+                lines.append(f'{name:<16} {n:>5} {stage:<10} {t0 * 1e3:>10.3f} {t * 1e3:>10.3f} {ratio:>7.2f}' + ('  REGRESSION' if slower else ''))
+    return lines, regressions
+
+if __name__ == "__main__":
+    from sys import argv, stderr
+
+    def option(name: str, default = None):
+        return argv[argv.index(name) + 1] if name in argv else default
+
+    workloads = option('--only').split(',') if '--only' in argv else list(generators)
+    for name in workloads:
+        if name not in generators:
+            print(f'kol.bench.suite: unknown workload {name!r}, expected one of {list(generators)}', file = stderr)
+            exit(1)
+
+    results = run(
+        workloads,
+        [int(n) for n in option('--sizes').split(',')] if '--sizes' in argv else None,
+        int(option('--repeats', 3)),
+        option('--engine', 'eval_ast'),
+        '--compiled-grammar' in argv,
+        log = lambda line: print(line, file = stderr, flush = True),
+    )
+
+    out = json.dumps(results, indent = 2)
+    if '--out' in argv:
+        with open(option('--out'), 'w') as f: f.write(out + '\n')
+    else: print(out)
+
+    if '--compare' in argv:
+        with open(option('--compare')) as f: old = json.load(f)
+        lines, regressions = compare(old, results, float(option('--threshold', 0.25)), float(option('--min-ms', 0.05)) / 1e3)
+        print('\n'.join(lines), file = stderr)
+        print(f'{len(regressions)} regression(s)', file = stderr)
+        if regressions: exit(1)
@@ -0,0 +1,37 @@
+# Loops written as recursion, VM with and without tail calls.
+#
+# Usage: python -m kol.bench.tailcalls [max_n]
+
+from kol import inline, interp, resolve, vm
+from kol.bench import arg, make, program, timed
+
+import tracemalloc
+
+def loop(n: int) -> str: return f'loop = [n; acc] {{ if n == 0 => {{ acc }} ... => {{ loop(n - 1; acc + n) }} end }};\nloop({n}; 0)'
+
+def measure(i, program):
+    tracemalloc.start()
+    try:                   elapsed, ret = timed(i.eval_ast, program)
+    except RecursionError: elapsed, ret = None, None
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, ret
+
+if __name__ == "__main__":
+    max_n = arg(1, 100000)
+
+    engines = {
+        'eval_ast':    lambda: make(interp.Interpreter),
+        'vm':          lambda: make(vm.VM, tail_calls = False),
+        'vm tailcall': lambda: make(vm.VM),
+    }
+
+    print(f"{'n':>8} " + ' '.join(f'{e:>24}' for e in engines))
+    n = 1000
+    while n <= max_n:
+        p, cells = program(loop(n), [inline.inline, resolve.resolve]), []
+        for make_engine in engines.values():
+            elapsed, peak, ret = measure(make_engine(), p)
+            cells.append('RecursionError' if ret is None else f'{elapsed:.3f}s {peak / 2**20:.1f}MiB')
+        print(f'{n:>8} ' + ' '.join(f'{c:>24}' for c in cells))
+        n *= 10
@@ -0,0 +1,40 @@
+# Size-scaling benchmark for kol.tokenizer.
+#
+# Usage: python -m kol.bench.tokenizer [max_kib] [--backtracking] [--nested]
+#
+# --nested uses deeply nested parentheses, where every glyph run used to be
+# rescanned once per glyph in it.
+
+from kol import tokenizer as tok
+from kol.bench import timed
+
+sample = """fn with args = [a; b; c] { a + b + c }; // comment
+x = -a + -n * (3/2) + 4 - 6 + fn with args(1; 2; 4);
+if x * 2 == ... 2 => { 3 } ... > 4 => { 0 } ... => { -1 } end;
+"""
+
+def program(size: int) -> str: return sample * (size // len(sample) + 1)
+def nested(size: int) -> str:  return '(' * (size // 2) + 'a' + ')' * (size // 2)
+
+def time_tokenize(text: str, tokenize = tok.tokenize) -> float:
+    return timed(lambda: sum(1 for _ in tokenize(text)))[0]
+
+def scaling(sizes, tokenize = tok.tokenize, program = program):
+    for size in sizes:
+        text = program(size)
+        t = time_tokenize(text, tokenize)
+        yield len(text), t, t / len(text) * 1e9
+
+if __name__ == "__main__":
+    from sys import argv
+
+    args      = [a for a in argv[1:] if not a.startswith('--')]
+    max_kib   = int(args[0]) if len(args) else 512
+    tokenize  = tok.tokenize_backtracking if '--backtracking' in argv else tok.tokenize
+    workload  = nested if '--nested' in argv else program
+
+    sizes, size = [], 4 * 1024
+    while size <= max_kib * 1024: sizes.append(size); size *= 2
+
+    print(f"{'bytes':>10} {'seconds':>10} {'ns/byte':>10}")
+    for n, t, per in scaling(sizes, tokenize, workload): print(f"{n:>10} {t:>10.4f} {per:>10.1f}")
@@ -0,0 +1,29 @@
+# Interpreter.eval_ast against kol.vm.VM on call and arithmetic heavy scripts.
+#
+# Usage: python -m kol.bench.vm [repeats]
+
+from kol import interp, vm
+from kol.bench import arg, make, program, time_eval
+
+def arithmetic(n: int) -> str: return 'x = 1;\n' + ''.join(f'x = x * 3 - (x / 2) + {i} - (x - 1) * 2;\n' for i in range(n))
+def calls(n: int) -> str:
+    return 'f = [a; b] { a * b - a };\ng = [a] { f(a; 2) - f(a; 1) };\nx = 0;\n' + ''.join(f'x = g(x) + g({i});\n' for i in range(n))
+def recursion(n: int) -> str:
+    return f'fib = [n] {{ if n < 2 => {{ n }} ... => {{ fib(n - 1) + fib(n - 2) }} end }};\nfib({n})'
+
+workloads = {
+    'arithmetic': arithmetic(150),
+    'calls':      calls(150),
+    'recursion':  recursion(14),
+}
+
+if __name__ == "__main__":
+    repeats = arg(1, 20)
+
+    print(f"{'workload':<12} {'eval_ast':>10} {'vm':>10} {'speedup':>8}")
+    for name, text in workloads.items():
+        p = program(text)
+        t_tree, r_tree = time_eval(make(interp.Interpreter), p, repeats)
+        t_vm,   r_vm   = time_eval(make(vm.VM), p, repeats)
+        assert r_tree == r_vm, (name, r_tree, r_vm)
+        print(f"{name:<12} {t_tree:>10.4f} {t_vm:>10.4f} {t_tree / t_vm:>7.1f}x")
@@ -0,0 +1,212 @@
+# Closure compiler for kol.interpast.
+#
+# Every node becomes a Python function of no arguments with everything it
+# needs (child closures, names, constants, the interpreter's bindings) bound
+# when it is made, so evaluating a tree is a chain of plain calls with no
+# per node dispatch. Scoping is the shallow binding of kol.vm.VM and builtins
+# keep their contract, they get (interpreter, args) and lookup their params
+# by name. Unlike the VM, Kol calls recurse on the Python stack.
+#
+# Closures depend on the interpreter they read bindings from, so each
+# ClosureInterpreter compiles and caches its own, per function body and per
+# program (statement list) evaluated, for the max_closures run last.
+#
+# Operator trees whose leaves are numbers and lookups run unboxed, on raw
+# Python numbers (interp.raw_operators), and only the value of the whole tree
+# is a Kol value: a + b * c makes one instead of two. Lookups can't rebind an
+# operator, so checking that every operator in the tree is still its builtin
+# once, before running it, is the same as checking each one after its
+# operands. When one isn't, the tree runs boxed like any other.
+
+from kol import interpast as tree, arrays, interp, vm
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List
+
+def compile_const(_ast, i):
+    return lambda: _ast
+
+def compile_lookup(_ast, i):
+    name, bindings = _ast.name, i.bindings
+    def lookup():
+        if name in bindings: return bindings[name][-1]
+        return i.lookup_error(name)
+    return lookup
+
+def compile_assign(_ast, i):
+    name, value, bindings, bound = _ast.name, compile_node(_ast.value, i), i.bindings, i.bound
+    def assign():
+        v = value()
+        if name in bindings: bindings[name][-1] = v
+        else:
+            bindings[name] = [v]
+            bound[-1].append(name)
+        return v
+    return assign
+
+unboxed = True # Whether operator trees run unboxed.
+
+def fusable(_ast, i) -> bool:
+    t = type(_ast)
+    if t in (tree.KolInt, tree.KolFloat, tree.Lookup, tree.SlotLookup): return True
+    if t is not tree.PrimOp or _ast.name not in interp.raw_operators: return False
+    return i.primitives.get(_ast.name, (None, None))[1] is interp.operator_builtins[_ast.name] and all(fusable(p, i) for p in _ast.params)
+
+def compile_raw(_ast, i):
+    "Closure giving the raw number a fusable _ast evaluates to."
+    t = type(_ast)
+    if t is tree.KolInt or t is tree.KolFloat:
+        v = _ast.value
+        return lambda: v
+    if t is tree.PrimOp:
+        op, (lhs, rhs) = interp.raw_operators[_ast.name], [compile_raw(p, i) for p in _ast.params]
+        return lambda: op(lhs(), rhs())
+    lookup = compile_lookup(_ast, i)
+    return lambda: lookup().value
+
+def compile_unboxed(_ast, i):
+    bindings, boxed = i.bindings, []
+    checks = [(name, i.primitives[name][0]) for name in sorted({a.name for a in walk_ops(_ast)})]
+    raw, KolInt = compile_raw(_ast, i), tree.KolInt
+    if _ast.name in ('minus', 'plus', 'mul', 'div'): box = KolInt
+    else:                                            box = (interp.false, interp.true).__getitem__ # Comparisons, 0 or 1.
+    def unboxed_():
+        for name, fn in checks:
+            if name not in bindings or bindings[name][-1] is not fn:
+                if not boxed: boxed.append(compile_boxed_prim_op(_ast, i))
+                return boxed[0]()
+        return box(raw())
+    return unboxed_
+
+def walk_ops(_ast):
+    if type(_ast) is tree.PrimOp:
+        yield _ast
+        for p in _ast.params: yield from walk_ops(p)
+
+def compile_prim_op(_ast, i):
+    if unboxed and any(type(p) is tree.PrimOp for p in _ast.params) and fusable(_ast, i): return compile_unboxed(_ast, i)
+    return compile_boxed_prim_op(_ast, i)
+
+def compile_boxed_prim_op(_ast, i):
+    name, bindings = _ast.name, i.bindings
+    fn, op = i.primitives.get(name, (None, None)) # Checked on every run, builtins added later just miss the fast path.
+    lhs, rhs = [compile_node(p, i) for p in _ast.params] # Operators are binary.
+    def prim_op():
+        if name not in bindings: return i.lookup_error(name)
+        f = bindings[name][-1] # Before the operands, like a call.
+        l, r = lhs(), rhs()
+        if f is fn: return op(l, r)
+        return i.call(f, [l, r]) # Rebound.
+    return prim_op
+
+def compile_fn_call(_ast, i):
+    if   type(_ast.fn) is str:        fn = compile_lookup(tree.Lookup(_ast.fn), i)
+    elif type(_ast.fn) is tree.KolFn: fn = compile_const(_ast.fn, i)
+    else:
+        from pprint import pprint
+        pprint(['InterpError: ast.fn is not a recognized (callable or resolvable) type', _ast])
+        exit(1)
+
+    args, call = [compile_node(p, i) for p in _ast.params], i.call
+    if len(args) == 0: return lambda: call(fn(), [])
+    if len(args) == 1:
+        a0, = args
+        return lambda: call(fn(), [a0()])
+    if len(args) == 2:
+        a0, a1 = args
+        return lambda: call(fn(), [a0(), a1()])
+    return lambda: call(fn(), [a() for a in args])
+
+def compile_stmts(_ast, i):
+    stmts = [compile_node(a, i) for a in _ast]
+    if len(stmts) == 0: return compile_const(tree.KolNil(), i)
+    if len(stmts) == 1: return stmts[0]
+    init, last = stmts[:-1], stmts[-1]
+    def seq():
+        for s in init: s()
+        return last()
+    return seq
+
+def compile_block(_ast, i):
+    body = compile_stmts(_ast.body, i)
+    if not _ast.scoped: return body
+    params, args, push_scope, pop_scope = _ast.params, [compile_node(a, i) for a in _ast.args], i.push_scope, i.pop_scope
+    def block():
+        push_scope(params, [a() for a in args])
+        ret = body()
+        pop_scope()
+        return ret
+    return block
+
+def compile_cond(_ast, i):
+    cond, true = compile_node(_ast.cond, i), compile_node(_ast.true, i)
+    false = compile_node(_ast.false, i) if _ast.false is not None else compile_const(tree.KolNil(), i)
+    def cond_():
+        c = cond()
+        if type(c) is tree.KolArray: return arrays.select(c, true(), false())
+        return true() if c.value == 1 else false() # Like kol.internal.if(else).
+    return cond_
+
+def compile_bound_to(_ast, i):
+    name, origin, bindings, KolFn = _ast.name, _ast.origin, i.bindings, tree.KolFn
+    def bound_to():
+        fn = bindings[name][-1] if name in bindings else None
+        return interp.true if type(fn) is KolFn and fn.origin is origin else interp.false
+    return bound_to
+
+compilemap = {
+    tree.KolNil:     compile_const,
+    tree.KolInt:     compile_const,
+    tree.KolFloat:   compile_const,
+    tree.KolArray:   compile_const,
+    tree.KolFn:      compile_const,
+    tree.Lookup:     compile_lookup,
+    tree.Assign:     compile_assign,
+    tree.SlotLookup: compile_lookup,
+    tree.SlotAssign: compile_assign,
+    tree.KolFnCall:  compile_fn_call,
+    tree.PrimOp:     compile_prim_op,
+    tree.Block:      compile_block,
+    tree.Cond:       compile_cond,
+    tree.BoundTo:    compile_bound_to,
+    list:            compile_stmts,
+}
+
+def compile_node(_ast, i, compilemap = compilemap): return compilemap[type(_ast)](_ast, i)
+
+max_closures = 1024
+
+@dataclass
+class ClosureInterpreter(vm.VM):
+    # id(statements) -> (statements, closure), least recently run first, they are kept so their id can't be reused.
+    closures: OrderedDict = field(default_factory = OrderedDict)
+
+    def closure_for(self, _ast):
+        closures, key = self.closures, id(_ast)
+        if key in closures: closures.move_to_end(key)
+        else:
+            closures[key] = _ast, compile_node(_ast, self)
+            if len(closures) > max_closures: closures.popitem(last = False)
+        return closures[key][1]
+
+    def call(self, fn: tree.KolFn, args: List):
+        self.push_scope(fn.params, args)
+        ret = self.closure_for(fn.body)() if type(fn.body) is list else fn.body(self, args)
+        self.pop_scope()
+        return ret
+
+    def eval_ast(self, _ast):
+        if type(_ast) is list: return self.closure_for(_ast)()
+        elif type(_ast) is tree.KolFnCall and type(_ast.fn) is tree.KolFn and not _ast.params: return self.call(_ast.fn, []) # What kol.internal.if(else) evaluates.
+        return compile_node(_ast, self)()
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol.bench import make
+
+    i = make(ClosureInterpreter)
+
+    with open(argv[1]) as f:
+        ret, rem = i.eval_str(f.read())
+        print(ret)
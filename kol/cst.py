@@ -3,12 +3,13 @@ import kol.defs  as defs
 import kol.lexer as lex
 
 from dataclasses import dataclass, field
-from typing import List, Callable, Any
+from typing import List, Set, Dict, Callable, Any
 
 @dataclass
 class GeneratorWrapper:
     gen: Callable = None
     is_done: bool = False
+    stats: Any = None # A PredictionStats counting prepends, see parse.
 
     def next(self):
         try: 
@@ -24,37 +25,134 @@ class GeneratorWrapper:
     def prepend(self, el): self.prepend_many([el])
     def prepend_many(self, els):
         self.is_done = False
+        if self.stats is not None: self.stats.count_prepend(els)
         if type(self.gen) is list: self.gen = els + self.gen
         else: self.gen = els + [self.gen]
 
     def peek(self):
         n = self.next()
-        self.prepend(n)
+        if not self.is_done: self.prepend(n)
         return n
 
 @dataclass
+class TokenCursor:
+    "GeneratorWrapper look-alike over an already lexed token list, moves by index."
+    tokens: List = field(default_factory = lambda: [])
+    pos: int = 0
+    is_done: bool = False
+    stats: Any = None
+
+    def next(self):
+        if self.pos >= len(self.tokens):
+            self.is_done = True
+            return StopIteration()
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    # Only ever called with the tokens that were just consumed (see detector).
+    def prepend(self, el): self.prepend_many([el])
+    def prepend_many(self, els):
+        self.is_done = False
+        if self.stats is not None: self.stats.count_prepend(els)
+        self.pos -= len(els)
+
+    def seek(self, pos):
+        self.is_done = False
+        self.pos = pos
+
+    def peek(self):
+        n = self.next()
+        if not self.is_done: self.prepend(n)
+        return n
+
+# Children are kept once, in _fields, and read as attributes through
+# _fieldnames (name -> index), shared by every match with the same names.
 class UnwindableMatch:
-    _type: Any
-    _unwind_order: List[str] = field(default_factory = lambda: [])
-    _fieldnames: List[str] = field(default_factory = lambda: [])
-    _fields: List['UnwindableMatch'] = field(default_factory = lambda: [])
+    __slots__ = ('_type', '_fieldnames', '_fields')
+
+    def __init__(self, _type: Any, _fieldnames: Dict[str, int] | None = None, _fields: tuple = ()):
+        self._type, self._fieldnames, self._fields = _type, _fieldnames if _fieldnames is not None else {}, _fields
+
+    def __getattr__(self, name): # Only reached for names that aren't slots.
+        if name in UnwindableMatch.__slots__ or name.startswith('__'): raise AttributeError(name) # Unset slot, while unpickling.
+        if name in self._fieldnames: return self._fields[self._fieldnames[name]]
+        raise AttributeError(f'{self._type} match has no field {name!r}')
+
+    def __repr__(self):
+        if not self._fieldnames and self._fields: return f'UnwindableMatch(_type={self._type!r}, _fields={self._fields!r})' # See list_match.
+        return f'UnwindableMatch(_type={self._type!r}' + ''.join(f', {k}={self._fields[v]!r}' for k, v in self._fieldnames.items()) + ')'
 
     def unwind(self, g: GeneratorWrapper, r: List['Rule']):
-        for v in map(lambda att: getattr(self, att), self._unwind_order):
+        for v in reversed(self._fields):
             if type(v) is UnwindableMatch: v.unwind(g, r)
             else:                          g.prepend(v)
 
+@dataclass
+class First:
+    "The tokens a rule or branch can start with (its FIRST set)."
+    texts: Set[str] = field(default_factory = lambda: set())
+    any_text: bool = False # Any lex.Text token.
+    any: bool = False      # Unknown, so anything.
+    nullable: bool = False # May match without consuming a token.
+
+    def matches(self, tok) -> bool:
+        if self.any or self.nullable: return True
+        if self.any_text and type(tok) is lex.Text: return True
+        return getattr(tok, 'text', None) in self.texts
+
+    def union(self, other: 'First') -> bool:
+        "Adds other's tokens (but not its nullability) to self, returns whether anything changed."
+        before = (len(self.texts), self.any_text, self.any)
+        self.texts |= other.texts
+        self.any_text, self.any = self.any_text or other.any_text, self.any or other.any
+        return before != (len(self.texts), self.any_text, self.any)
+
+@dataclass
+class Repeat:
+    "item (separator item)*, and one more separator if trailing. Items must consume a token."
+    item: 'str | Rule'
+    separator: 'None | str | Rule' = None
+    trailing: bool = False
+
 @dataclass
 class Rule:
     name: str
     branches: None | List
     # In case you need more control than branch matching.
     detector: None | Callable[[GeneratorWrapper, List['Rule']], UnwindableMatch | None] = None
+    # Given by hand for detectors, computed for branches and repeats by compute_first_sets.
+    # Detectors without one are never predicted against.
+    first: None | First = None
+    # Matched in a loop, as one flat 'name:list' match (see list_match), instead of a chain of branches.
+    repeat: None | Repeat = None
 
 @dataclass
 class Branch:
     name: str
     arms: List
+    first: None | First = None
+
+@dataclass
+class PredictionStats:
+    "Branch attempts per 'rule:branch', how many of them FIRST sets ruled out, and the backtracking they cost."
+    attempted: Dict[str, int] = field(default_factory = lambda: {})
+    skipped: Dict[str, int]   = field(default_factory = lambda: {})
+    unwound: int   = 0 # Tokens given back by failed branches (unwound, or rewound by packrat).
+    prepends: int  = 0 # prepend_many calls, unwinding and detectors putting back a token.
+    prepended: int = 0 # Tokens they put back.
+
+    def count(self, counter: Dict[str, int], r: Rule, branch: Branch): counter[r.name + ':' + branch.name] = counter.get(r.name + ':' + branch.name, 0) + 1
+    def total_attempted(self) -> int: return sum(self.attempted.values())
+    def total_skipped(self) -> int:   return sum(self.skipped.values())
+
+    def attempted_per_rule(self) -> Dict[str, int]:
+        ret = {}
+        for k, n in self.attempted.items(): ret[k.split(':')[0]] = ret.get(k.split(':')[0], 0) + n
+        return ret
+
+    def count_prepend(self, els: List):
+        self.prepends += 1
+        self.prepended += len(els)
 
 @dataclass
 class Arm:
@@ -62,11 +160,13 @@ class Arm:
     value: str | Rule
 
 # Enclosers are special since they are 2 (different) symbols.
+# 'name *** item separator' rules repeat item, see Repeat. A trailing '?' on
+# the separator lets it end the list too.
 default_rules_str = """
-endstmts === multiple ==> endstmt endstmts ||| single ==> endstmt
+endstmts *** endstmt
 
 stmt  === block    ==> { stmts } endstmt   ||| empty-block ==> { }     ||| expr-stmt ==> expr
-stmts === multiple ==> stmt endstmts stmts ||| last2 ==> stmt endstmts ||| last ==> stmt
+stmts *** stmt endstmts?
 
 expr' === ifexpr ==> ifexpr ||| unop ==> unop expr:::expr' ||| fncall-noargs ==> ident ( ) ||| fncall ==> ident ( fncallargs ) ||| anon-fncall ==> ( fncallargs ) ||| anon-fncall-noargs ==> ( ) ||| fndef ==> fndef ||| ident ==> ident
 expr  === binop  ==> partial:::binopleftpartial rhs:::expr ||| simple-expr ==> expr:::expr'
@@ -77,23 +177,30 @@ binoprightpartial === partial  ==>             binop rhs:::expr
 binopleftpartial  === partial  ==> lhs:::expr' binop
 binopleftpartials === multiple ==> first:::binopleftpartial rest:::binopleftpartials ||| single ==> first:::binopleftpartial
 
-fncallargs === multiple  ==> first:::expr endstmt rest:::fncallargs ||| single ==> expr 
+fncallargs *** expr endstmt
 fndef      === with-args ==> [ fncallargs ] { stmts }               ||| without-args ==> [ ] { stmts } ||| minimal ==> { stmts }
 
 ifexpr     === regular  ==> if arms:::ifarms end           ||| rpartial-named ==> if expr => varname:::ident ... arms:::ifrparms end ||| lpartial-named ==> if binopleftpartials => varname:::ident ... arms:::iflparms end ||| rpartial ==> if expr ... arms:::ifrparms end ||| lpartial ==> if binopleftpartials ... arms:::iflparms end
 iflparm    === ellipsis ==> ... => { stmts }               ||| expr     ==> ... expr => { stmts } ||| rpartial ==> ... binoprightpartial => { stmts } ||| lp-expr ==> expr => { stmts }
 ifrparm    === ellipsis ==> ... => { stmts }               ||| expr     ==> ... expr => { stmts } ||| rpartial ==>     binoprightpartial => { stmts }
 ifarm      === ellipsis ==> ... => { stmts }               ||| expr     ==>     expr => { stmts }
-ifarms     === multiple ==> arm:::ifarm   rest:::ifarms    ||| single   ==> arm:::ifarm
-iflparms   === multiple ==> arm:::iflparm rest:::iflparms  ||| single   ==> arm:::iflparm
-ifrparms   === multiple ==> arm:::ifrparm rest:::ifrparms  ||| single   ==> arm:::ifrparm
+ifarms     *** ifarm
+iflparms   *** iflparm
+ifrparms   *** ifrparm
 """
 
 # Rules unexpressable using the above syntax.
 # Basically the most fundamental rules go here.
 extra_rules = []
 
+def repeat_rule_from_string(line: str) -> Rule:
+    rule_name, arms = line.split('***')
+    item, *separator = arms.split()
+    if not separator: return Rule(rule_name.strip(), None, repeat = Repeat(item))
+    return Rule(rule_name.strip(), None, repeat = Repeat(item, separator[0].rstrip('?'), separator[0].endswith('?')))
+
 def rule_from_string(line: str) -> Rule:
+    if '***' in line: return repeat_rule_from_string(line)
     rule_name, branches_str = line.split('===')
 
     branches = []
@@ -120,59 +227,113 @@ def create_rules(lines: str, extra_rules: List[Rule] = []) -> List[Rule]:
     rules = [*rules, *extra_rules]
 
     # Then resolve all the branches with the correct production rules.
+    by_name = {}
+    for rule in rules: by_name.setdefault(rule.name, rule) # The first rule with a name wins.
+
     for rule in rules:
+        if rule.repeat is not None:
+            rule.repeat.item = by_name.get(rule.repeat.item, rule.repeat.item)
+            if rule.repeat.separator is not None: rule.repeat.separator = by_name.get(rule.repeat.separator, rule.repeat.separator)
         if rule.branches is None: continue
 
         for branch in rule.branches:
             for arm in branch.arms:
-                r = list( filter(lambda x: x.name == arm.value, rules) )
-                if len(r): arm.value = r[0]
+                if arm.value in by_name: arm.value = by_name[arm.value]
                 # TODO: else error
+
+    compute_first_sets(rules)
     return rules
 
+def compute_first_sets(rules: List[Rule]):
+    "Fills in Rule.first and Branch.first for every branch (and repeat) rule, iterating until nothing changes."
+    for rule in rules:
+        if rule.repeat is not None: rule.first = First()
+        if rule.branches is None: continue
+        rule.first = First()
+        for branch in rule.branches: branch.first = First()
+
+    def rule_first(r):
+        if type(r) is not Rule or r.first is None: return First(any = True)
+        return r.first
+
+    def arm_first(arm): return rule_first(arm.value)
+
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            if rule.repeat is not None: # Starts like its item.
+                first = rule_first(rule.repeat.item)
+                changed |= rule.first.union(first)
+                if first.nullable and not rule.first.nullable: rule.first.nullable = changed = True
+            if rule.branches is None: continue
+
+            for branch in rule.branches:
+                nullable = True
+                for arm in branch.arms:
+                    first = arm_first(arm)
+                    changed |= branch.first.union(first)
+                    if not first.nullable:
+                        nullable = False
+                        break
+
+                if nullable and not branch.first.nullable: branch.first.nullable = changed = True
+                changed |= rule.first.union(branch.first)
+                if branch.first.nullable and not rule.first.nullable: rule.first.nullable = changed = True
+
 def detector(g, r, unwind_name, fieldname, cond):
     el = g.next()
     if g.is_done: return
 
-    if cond(el):
-        match = UnwindableMatch(unwind_name)
-        setattr(match, fieldname, el)
-        match._fieldnames.append(fieldname)
-        match._fields.append(el)
-        match._unwind_order = [fieldname]
-        return match
+    if cond(el): return make_match(unwind_name, [(fieldname, el)])
     else: g.prepend(el)
 
-def generic_single_detector(unwind_name, fieldname, cond):
-    return lambda g, r: detector(g, r, unwind_name, fieldname, cond)
+@dataclass
+class SingleDetector:
+    "Matches a single token, kept as data so kol.cstgen can inline it."
+    unwind_name: str
+    fieldname: str
+    cond: Callable[[Any], bool]
+
+    def __call__(self, g, r): return detector(g, r, self.unwind_name, self.fieldname, self.cond)
+
+def generic_single_detector(unwind_name, fieldname, cond): return SingleDetector(unwind_name, fieldname, cond)
+
+def texts(*t): return First(set(t))
 
 extra_rules += [
-    Rule('endstmt', None, generic_single_detector('endstmt', 'glyph', lambda o: o.text == defs.endstmt)),
-    Rule('unop',    None, generic_single_detector('unop',    'op',    lambda o: o.text in [o.symbol for o in ops.prefix_operators])),
-    Rule('binop',   None, generic_single_detector('binop',   'op',    lambda o: o.text in [o.symbol for o in ops.infix_operators])),
-    Rule('_ident',  None, generic_single_detector('ident',   'ident', lambda i: type(i) is lex.Text)),
+    Rule('endstmt', None, generic_single_detector('endstmt', 'glyph', lambda o: o.text == defs.endstmt),                             texts(defs.endstmt)),
+    Rule('unop',    None, generic_single_detector('unop',    'op',    lambda o: o.text in [o.symbol for o in ops.prefix_operators]), texts(*[o.symbol for o in ops.prefix_operators])),
+    Rule('binop',   None, generic_single_detector('binop',   'op',    lambda o: o.text in [o.symbol for o in ops.infix_operators]),  texts(*[o.symbol for o in ops.infix_operators])),
+    Rule('_ident',  None, generic_single_detector('ident',   'ident', lambda i: type(i) is lex.Text),                                First(any_text = True)),
 ]
 
 for o in ops.encloser_operators:
     if o.opening is not o: continue
 
     extra_rules += [
-        Rule(f'encloser-{o.name}-opener', None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.opening.symbol)),
-        Rule(o.opening.symbol,            None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.opening.symbol)),
-        Rule(f'encloser-{o.name}-closer', None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.closing.symbol)),
-        Rule(o.closing.symbol,            None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.closing.symbol)),
+        Rule(f'encloser-{o.name}-opener', None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.opening.symbol), texts(o.opening.symbol)),
+        Rule(o.opening.symbol,            None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.opening.symbol), texts(o.opening.symbol)),
+        Rule(f'encloser-{o.name}-closer', None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.closing.symbol), texts(o.closing.symbol)),
+        Rule(o.closing.symbol,            None, generic_single_detector('encloser', 'op', lambda _o, o=o: _o.text == o.closing.symbol), texts(o.closing.symbol)),
     ]
 
 extra_rules += [
-    Rule('...', None, generic_single_detector('ellipsis',  'op',  lambda _o: _o.text == '...')),
-    Rule('=>',  None, generic_single_detector('fat-arrow', 'op',  lambda _o: _o.text == '=>')),
-    Rule('if',  None, generic_single_detector('if',        'if',  lambda _o: _o.text == 'if')),
-    Rule('end', None, generic_single_detector('end',       'end', lambda _o: _o.text == 'end')),
+    Rule('...', None, generic_single_detector('ellipsis',  'op',  lambda _o: _o.text == '...'), texts('...')),
+    Rule('=>',  None, generic_single_detector('fat-arrow', 'op',  lambda _o: _o.text == '=>'),  texts('=>')),
+    Rule('if',  None, generic_single_detector('if',        'if',  lambda _o: _o.text == 'if'),  texts('if')),
+    Rule('end', None, generic_single_detector('end',       'end', lambda _o: _o.text == 'end'), texts('end')),
 ]
 
 default_rules = create_rules(default_rules_str, extra_rules)
 
-def parse_impl(g: GeneratorWrapper, rules: List[Rule], r: Rule, depth = 0, debug = False) -> UnwindableMatch | None:
+def predicts(r: Rule, branch: Branch, tok, predict: bool, stats: PredictionStats | None) -> bool:
+    "Whether branch can start with tok, branches without a FIRST set are always tried."
+    ok = not predict or branch.first is None or branch.first.matches(tok)
+    if stats is not None: stats.count(stats.attempted if ok else stats.skipped, r, branch)
+    return ok
+
+def parse_impl(g: GeneratorWrapper, rules: List[Rule], r: Rule, depth = 0, debug = False, predict = True, stats = None) -> UnwindableMatch | None:
     if g.is_done: return
 
     if r.detector is not None:
@@ -180,16 +341,30 @@ def parse_impl(g: GeneratorWrapper, rules: List[Rule], r: Rule, depth = 0, debug
         if debug: print(' ' * depth + r.name + '(detector)', match != None, g)
         return match
 
+    if r.repeat is not None:
+        def unwind(m):
+            m.unwind(g, rules)
+            if stats is not None: stats.unwound += match_size(m)
+
+        match = repeat_match(r, lambda sub: parse_impl(g, rules, sub, depth + 4, debug, predict, stats), unwind)
+        if debug: print(' ' * depth + r.name + '(repeat)', match != None, g)
+        return match
+
     if debug: print(' ' * depth + r.name, [branch.name for branch in r.branches], g)
+    tok = g.peek() if predict else None
 
     # Otherwise, match using the branches.
     for branch in r.branches:
+        if not predicts(r, branch, tok, predict, stats):
+            if debug: print(' ' * depth + r.name + ':' + branch.name + '(skipped)', g)
+            continue
+
         if debug: print(' ' * depth + r.name + ':' + branch.name + '(stepping in)', [a.name for a in branch.arms], g)
         arms = []
         success = True
 
         for a in branch.arms:
-            _a = parse_impl(g, rules, a.value, depth + 4, debug)
+            _a = parse_impl(g, rules, a.value, depth + 4, debug, predict, stats)
             if _a is None: # Cleanup if not matched
                 success = False
                 break
@@ -197,21 +372,119 @@ def parse_impl(g: GeneratorWrapper, rules: List[Rule], r: Rule, depth = 0, debug
 
         if success:
             if debug: print(' ' * depth + r.name + ':' + branch.name + '(success)', g)
-            match = UnwindableMatch(r.name + ':' + branch.name)
-            for a in arms:
-                setattr(match, a[0], a[1])
-                match._fieldnames.append(a[0])
-                match._fields.append(a[1])
-            match._unwind_order = list(reversed([a[0] for a in arms]))
-            return match
+            return branch_match(r, branch, arms)
         else:
             if debug: print(' ' * depth + r.name + ':' + branch.name + '(fail)', g)
             for (_, a) in reversed(arms): a.unwind(g, rules)
+            if stats is not None: stats.unwound += sum(match_size(a) for _, a in arms)
             arms = None
 
-def parse(text: str, rules: List[Rule] = default_rules, start_rule_name: str = 'stmts', debug = False):
-    g = GeneratorWrapper(lex.lex(text))
-    return parse_impl(g, rules, [r for r in rules if r.name == start_rule_name][0], debug = debug), g
+def match_size(m) -> int:
+    "Tokens in a match."
+    if type(m) is not UnwindableMatch: return 1
+    return sum(match_size(f) for f in m._fields)
+
+def branch_match(r: Rule, branch: Branch, arms: List) -> UnwindableMatch: return make_match(r.name + ':' + branch.name, arms)
+fieldnames: Dict[tuple, Dict[str, int]] = {} # Field names -> their UnwindableMatch._fieldnames.
+
+def make_match(_type: str, arms: List) -> UnwindableMatch:
+    names = tuple([a[0] for a in arms])
+    if names not in fieldnames: fieldnames[names] = {name: k for k, name in enumerate(names)} # Last one wins, like attributes.
+    return UnwindableMatch(_type, fieldnames[names], tuple([a[1] for a in arms]))
+
+# Repeats have no field names, their items (and separators, every other
+# field then) are read straight from _fields.
+def list_match(_type: str, fields: List) -> UnwindableMatch: return UnwindableMatch(_type, fieldnames[()], tuple(fields))
+fieldnames[()] = {}
+
+def repeat_match(r: Rule, parse_sub: Callable[[Rule], UnwindableMatch | None], unwind: Callable[[UnwindableMatch], None]) -> UnwindableMatch | None:
+    "Loops over r.repeat, parse_sub(rule) matches rule after the last match, unwind(m) gives the last one back."
+    rep = r.repeat
+    item = parse_sub(rep.item)
+    if item is None: return None
+
+    fields = [item]
+    while True:
+        sep = None
+        if rep.separator is not None:
+            sep = parse_sub(rep.separator)
+            if sep is None: break
+
+        item = parse_sub(rep.item)
+        if item is None:
+            if sep is not None and rep.trailing: fields.append(sep)
+            elif sep is not None:                unwind(sep)
+            break
+
+        if sep is not None: fields.append(sep)
+        fields.append(item)
+    return list_match(r.name + ':list', fields)
+
+# Same grammar semantics as parse_impl (the first matching branch wins), but every
+# (rule, token index) pair is only parsed once, so parsing is linear in the token count.
+# Failed branches rewind the cursor instead of unwinding their matches token by token.
+def parse_packrat_impl(g: TokenCursor, rules: List[Rule], r: Rule, memo: dict, depth = 0, debug = False, predict = True, stats = None) -> UnwindableMatch | None:
+    start = g.pos
+    if (r.name, start) in memo:
+        match, end = memo[(r.name, start)]
+        if debug: print(' ' * depth + r.name + '(memo)', match != None, start)
+        g.seek(end)
+        return match
+
+    if start >= len(g.tokens): match = None
+    elif r.detector is not None:
+        match = r.detector(g, rules)
+        if debug: print(' ' * depth + r.name + '(detector)', match != None, start)
+    elif r.repeat is not None:
+        def unwind(m):
+            if stats is not None: stats.unwound += match_size(m)
+            g.seek(g.pos - match_size(m))
+
+        match = repeat_match(r, lambda sub: parse_packrat_impl(g, rules, sub, memo, depth + 4, debug, predict, stats), unwind)
+        if debug: print(' ' * depth + r.name + '(repeat)', match != None, start)
+    else:
+        if debug: print(' ' * depth + r.name, [branch.name for branch in r.branches], start)
+        tok = g.tokens[start]
+        for branch in r.branches:
+            if not predicts(r, branch, tok, predict, stats):
+                if debug: print(' ' * depth + r.name + ':' + branch.name + '(skipped)', start)
+                continue
+
+            if stats is not None: stats.unwound += g.pos - start
+            g.seek(start)
+            arms = []
+            for a in branch.arms:
+                _a = parse_packrat_impl(g, rules, a.value, memo, depth + 4, debug, predict, stats)
+                if _a is None: break
+                arms.append((a.name, _a))
+            else:
+                if debug: print(' ' * depth + r.name + ':' + branch.name + '(success)', start, g.pos)
+                match = branch_match(r, branch, arms)
+                break
+        else: match = None
+
+    if match is None:
+        if stats is not None: stats.unwound += g.pos - start
+        g.seek(start)
+    memo[(r.name, start)] = match, g.pos
+    return match
+
+# predict skips branches whose FIRST set rules out the next token, stats (a PredictionStats) counts how often.
+def parse(text: str, rules: List[Rule] = default_rules, start_rule_name: str = 'stmts', debug = False, packrat = False, predict = True, stats = None):
+    if type(rules) is not list: return rules.parse(text, start_rule_name) # Compiled rules, see kol.cstgen.
+    return parse_tokens(lex.lex(text), rules, start_rule_name, debug, packrat, predict, stats)
+
+# Same as parse, for already lexed tokens.
+def parse_tokens(tokens, rules: List[Rule] = default_rules, start_rule_name: str = 'stmts', debug = False, packrat = False, predict = True, stats = None):
+    if type(rules) is not list: return rules.parse_tokens(list(tokens), start_rule_name)
+
+    start_rule = [r for r in rules if r.name == start_rule_name][0]
+    if packrat:
+        g = TokenCursor(list(tokens), stats = stats)
+        return parse_packrat_impl(g, rules, start_rule, {}, debug = debug, predict = predict, stats = stats), g
+
+    g = GeneratorWrapper(iter(tokens), stats = stats)
+    return parse_impl(g, rules, start_rule, debug = debug, predict = predict, stats = stats), g
 
 if __name__ == "__main__":
     from pprint import pprint
@@ -219,5 +492,5 @@ if __name__ == "__main__":
 
     print(default_rules_str)
     with open(argv[1]) as f:
-        res, g = parse(f.read(), debug = True)
+        res, g = parse(f.read(), debug = True, packrat = '--packrat' in argv)
         pprint(res, indent=4)
\ No newline at end of file
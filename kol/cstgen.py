@@ -0,0 +1,232 @@
+# Grammar compiler, turns cst rules into a specialised recursive descent module.
+#
+# Every branch rule becomes one function, memoized per token index like
+# cst.parse_packrat_impl, that checks the FIRST set of each branch before
+# matching its arms. Single token detectors (cst.SingleDetector) with a FIRST
+# set are inlined as a test of that set, so it must hold exactly the tokens
+# the detector accepts (true for cst.extra_rules). Other detectors are called
+# as usual through a cst.TokenCursor. Repeats (cst.Repeat) become a loop
+# building one cst.list_match.
+#
+# The generated source is cached on disk, keyed by a hash of the grammar, and
+# can be used anywhere a list of rules is expected:
+#     Interpreter(cst_rules = cstgen.load(), ...)
+
+from kol import cst, lexer as lex
+
+from dataclasses import dataclass
+from typing import List, Dict, Callable
+import hashlib, importlib.util, os, tempfile
+
+version = 2 # Bump whenever the generated code changes.
+
+def default_cache_dir() -> str:
+    if 'KOL_CACHE_DIR' in os.environ: return os.environ['KOL_CACHE_DIR']
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'kol')
+
+def describe_first(first: cst.First | None):
+    if first is None: return None
+    return sorted(first.texts), first.any_text, first.any, first.nullable
+
+def describe_rule(r: cst.Rule):
+    if type(r.detector) is cst.SingleDetector: kind = ('single', r.detector.unwind_name, r.detector.fieldname)
+    elif r.repeat is not None:                 kind = ('repeat', *[getattr(a, 'name', a) for a in (r.repeat.item, r.repeat.separator)], r.repeat.trailing)
+    else:                                      kind = (type(r.detector).__name__,)
+    return r.name, kind, describe_first(r.first)
+
+def fingerprint(rules_str: str, extra_rules: List[cst.Rule]) -> str:
+    h = hashlib.sha256(f'kol.cstgen {version}\n'.encode())
+    h.update(rules_str.encode())
+    for r in extra_rules: h.update(repr(describe_rule(r)).encode())
+    return h.hexdigest()
+
+class Generator:
+    def __init__(self, rules: List[cst.Rule]):
+        self.rules     = rules
+        self.index     = {id(r): i for i, r in enumerate(rules)}
+        self.lines     = []
+        self.constants = {} # Source of a constant -> its name.
+
+    def emit(self, depth: int, line: str): self.lines.append('    ' * depth + line)
+
+    def constant(self, prefix: str, src: str) -> str:
+        if src not in self.constants: self.constants[src] = f'{prefix}_{len(self.constants)}'
+        return self.constants[src]
+
+    def first_test(self, first: cst.First, tok: str) -> str:
+        "Python expression testing whether tok (never None) is in first."
+        if first.any or first.nullable: return 'True'
+        tests = []
+        if first.any_text: tests.append(f'type({tok}) is Text')
+        if first.texts:    tests.append(f'{tok}.text in ' + self.constant('first', f'frozenset({sorted(first.texts)!r})'))
+        return ' or '.join(tests) if tests else 'False'
+
+    def arms(self, depth: int, r: cst.Rule, branch: cst.Branch, k: int):
+        if k == len(branch.arms):
+            fields = ', '.join(f'({a.name!r}, m{i})' for i, a in enumerate(branch.arms))
+            self.emit(depth, f"memo[key] = ret = make_match({r.name + ':' + branch.name!r}, [{fields}]), p{k}")
+            self.emit(depth, 'return ret')
+            return
+
+        arm = branch.arms[k].value
+        if type(arm) is not cst.Rule: raise ValueError(f"kol.cstgen: rule {r.name!r} references unknown rule {arm!r}")
+
+        if arm.branches is not None or arm.repeat is not None:
+            self.emit(depth, f'r{k} = rule_{self.index[id(arm)]}(toks, p{k}, memo) # {arm.name}')
+            self.emit(depth, f'if r{k} is not None:')
+            self.emit(depth + 1, f'm{k}, p{k + 1} = r{k}')
+        elif type(arm.detector) is cst.SingleDetector:
+            if arm.first is None or arm.first.any: test = self.constant('detector', f'detectors[{arm.name!r}].detector') + f'.cond(toks[p{k}])'
+            else:                                  test = self.first_test(arm.first, f'toks[p{k}]')
+            self.emit(depth, f'if p{k} < n and ({test}): # {arm.name}')
+            self.emit(depth + 1, f'm{k}, p{k + 1} = make_match({arm.detector.unwind_name!r}, [({arm.detector.fieldname!r}, toks[p{k}])]), p{k} + 1')
+        else:
+            det = self.constant('detector', f'detectors[{arm.name!r}].detector')
+            self.emit(depth, f'g{k} = TokenCursor(toks, p{k})')
+            self.emit(depth, f'm{k} = {det}(g{k}, extra_rules) # {arm.name}')
+            self.emit(depth, f'if m{k} is not None:')
+            self.emit(depth + 1, f'p{k + 1} = g{k}.pos')
+        self.arms(depth + 1, r, branch, k + 1)
+
+    def attempt(self, r: cst.Rule, sub: cst.Rule | str, pos: str) -> str:
+        "Python expression matching sub at pos, (match, position after it) or None."
+        if type(sub) is not cst.Rule: raise ValueError(f"kol.cstgen: rule {r.name!r} references unknown rule {sub!r}")
+        if sub.branches is not None or sub.repeat is not None: return f'rule_{self.index[id(sub)]}(toks, {pos}, memo)'
+        if type(sub.detector) is cst.SingleDetector:
+            if sub.first is None or sub.first.any: test = self.constant('detector', f'detectors[{sub.name!r}].detector') + f'.cond(toks[{pos}])'
+            else:                                  test = self.first_test(sub.first, f'toks[{pos}]')
+            return f'(make_match({sub.detector.unwind_name!r}, [({sub.detector.fieldname!r}, toks[{pos}])]), {pos} + 1) if {pos} < n and ({test}) else None'
+        return f"detect({self.constant('detector', f'detectors[{sub.name!r}].detector')}, toks, {pos})"
+
+    def repeat(self, r: cst.Rule):
+        rep = r.repeat
+        self.emit(1, f'def rule_{self.index[id(r)]}(toks, pos, memo): # {r.name}')
+        self.emit(2, f'key = ({self.index[id(r)]}, pos)')
+        self.emit(2, 'if key in memo: return memo[key]')
+        self.emit(2, 'n = len(toks)')
+        self.emit(2, f'm = {self.attempt(r, rep.item, "pos")}')
+        self.emit(2, 'if m is None:')
+        self.emit(3, 'memo[key] = None')
+        self.emit(3, 'return None')
+        self.emit(2, 'fields, p = [m[0]], m[1]')
+        self.emit(2, 'while True:')
+        if rep.separator is None:
+            self.emit(3, f'm = {self.attempt(r, rep.item, "p")}')
+            self.emit(3, 'if m is None: break')
+            self.emit(3, 'fields.append(m[0])')
+            self.emit(3, 'p = m[1]')
+        else:
+            self.emit(3, f's = {self.attempt(r, rep.separator, "p")}')
+            self.emit(3, 'if s is None: break')
+            self.emit(3, f'm = {self.attempt(r, rep.item, "s[1]")}')
+            self.emit(3, 'if m is None:')
+            if rep.trailing:
+                self.emit(4, 'fields.append(s[0])')
+                self.emit(4, 'p = s[1]')
+            self.emit(4, 'break')
+            self.emit(3, 'fields += [s[0], m[0]]')
+            self.emit(3, 'p = m[1]')
+        self.emit(2, f'memo[key] = ret = list_match({r.name + ":list"!r}, fields), p')
+        self.emit(2, 'return ret')
+        self.emit(0, '')
+
+    def rule(self, r: cst.Rule):
+        self.emit(1, f'def rule_{self.index[id(r)]}(toks, pos, memo): # {r.name}')
+        self.emit(2, f'key = ({self.index[id(r)]}, pos)')
+        self.emit(2, 'if key in memo: return memo[key]')
+        self.emit(2, 'n = len(toks)')
+        if not r.first.nullable:
+            self.emit(2, 'if pos >= n:')
+            self.emit(3, 'memo[key] = None')
+            self.emit(3, 'return None')
+        self.emit(2, 'tok = toks[pos] if pos < n else None')
+        self.emit(2, 'p0 = pos')
+
+        for branch in r.branches:
+            test = self.first_test(branch.first, 'tok')
+            if r.first.nullable and test != 'True': test = f'tok is not None and ({test})'
+            self.emit(2, f'# {branch.name} ==> ' + ' '.join(a.name for a in branch.arms))
+            self.emit(2, f'if {test}:')
+            self.arms(3, r, branch, 0)
+
+        self.emit(2, 'memo[key] = None')
+        self.emit(2, 'return None')
+        self.emit(0, '')
+
+    def generate(self, key: str) -> str:
+        body = self.lines
+        for r in self.rules:
+            if   r.branches is not None: self.rule(r)
+            elif r.repeat is not None:   self.repeat(r)
+
+        self.lines = []
+        self.emit(0, '# Generated by kol.cstgen, do not edit.')
+        self.emit(0, f'# Grammar fingerprint: {key}')
+        self.emit(0, '')
+        self.emit(0, 'def make_parser(detectors, extra_rules, make_match, list_match, Text, TokenCursor):')
+        for src, name in self.constants.items(): self.emit(1, f'{name} = {src}')
+        self.emit(0, '')
+        self.emit(1, 'def detect(detector, toks, pos):')
+        self.emit(2, 'g = TokenCursor(toks, pos)')
+        self.emit(2, 'm = detector(g, extra_rules)')
+        self.emit(2, 'return None if m is None else (m, g.pos)')
+        self.emit(0, '')
+        self.lines += body
+
+        start_rules = ', '.join(f'{r.name!r}: rule_{self.index[id(r)]}' for r in reversed(self.rules) if r.branches is not None or r.repeat is not None)
+        self.emit(1, f'return {{{start_rules}}}') # Reversed so the first rule with a name wins.
+        return '\n'.join(self.lines) + '\n'
+
+def generate(rules_str: str = cst.default_rules_str, extra_rules: List[cst.Rule] = cst.extra_rules) -> str:
+    return Generator(cst.create_rules(rules_str, extra_rules)).generate(fingerprint(rules_str, extra_rules))
+
+@dataclass
+class CompiledRules:
+    "Stands in for a list of cst rules, cst.parse hands parsing over to it."
+    fingerprint: str
+    start_rules: Dict[str, Callable]
+
+    def parse(self, text: str, start_rule_name: str = 'stmts'): return self.parse_tokens(list(lex.lex(text)), start_rule_name)
+    def parse_tokens(self, toks: List, start_rule_name: str = 'stmts'):
+        res = self.start_rules[start_rule_name](toks, 0, {})
+        if res is None: return None, cst.TokenCursor(toks)
+        return res[0], cst.TokenCursor(toks, res[1])
+
+def write_atomic(path: str, data: str | bytes):
+    fd, tmp = tempfile.mkstemp(dir = os.path.dirname(path), suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if type(data) is bytes else 'w') as f: f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+loaded: Dict[str, CompiledRules] = {}
+
+def load(rules_str: str = cst.default_rules_str, extra_rules: List[cst.Rule] = cst.extra_rules, cache_dir: str | None = None) -> CompiledRules:
+    key = fingerprint(rules_str, extra_rules)
+    if key in loaded: return loaded[key]
+
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, f'grammar_{key[:32]}.py')
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok = True)
+        write_atomic(path, generate(rules_str, extra_rules))
+
+    spec   = importlib.util.spec_from_file_location(f'kol_grammar_{key[:32]}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    detectors = {}
+    for r in extra_rules: detectors.setdefault(r.name, r)
+
+    loaded[key] = CompiledRules(key, module.make_parser(detectors, extra_rules, cst.make_match, cst.list_match, lex.Text, cst.TokenCursor))
+    return loaded[key]
+
+if __name__ == "__main__":
+    from pprint import pprint
+    from sys import argv
+
+    if len(argv) < 2: print(generate())
+    else:
+        with open(argv[1]) as f: pprint(cst.parse(f.read(), load())[0], indent=4)
@@ -0,0 +1,178 @@
+# Incremental reparsing, for tools that parse the same buffer again on every
+# keystroke:
+#     doc = incremental.Document(text)
+#     change = doc.edit(offset, removed, inserted)
+#     program = doc.program(i) # Like i.compile_str(doc.text)[0].
+#
+# A Document keeps the text cut into top level statements (at the ';'s
+# outside of (), [] and {}, like kol.stream), each with its span in the text,
+# the line it starts on, its tokens and its own 'stmts:list' match. Spans tile
+# the text, a statement starts where the one before ends (just past its
+# ';'s), comments and whitespace go with the statement after them.
+#
+# An edit relexes and reparses from the statement before the edited one (the
+# first token after it decides where its ';'s end) until a statement ends
+# where one of the old ones did, past the edit. The statements after that
+# have the same text, they are kept as they are, match included, only their
+# spans move and, if lines or columns did, the pos of their tokens (in
+# place, matches from before see it too).
+#
+# Document.program only rewrites and converts the statements that changed
+# (or moved), folding needs the builtins the whole program (or the
+# interpreter, Interpreter.rebound) rebinds and Interpreter.tree_passes see
+# the whole program, so those run every time.
+
+from kol import ast, ast2interpast, cst, defs, lexer as lex, tokenizer as tok
+from kol.stream import openers, closers
+
+from dataclasses import dataclass
+from typing import Iterator, List, Set, Tuple
+import bisect
+
+# What ast.fold looks up in the names the program rebinds.
+folded = frozenset([*ast.fold_ops, 'kol.internal.identity', 'kol.internal.if', 'kol.internal.ifelse'])
+
+@dataclass(eq = False, slots = True)
+class Statement:
+    start: int # Offsets in Document.text, see above.
+    end: int   # The end of the text for the last one when it has no ';'.
+    line: int  # The one start is on.
+    tokens: List
+    match: cst.UnwindableMatch | None # None when it doesn't parse.
+    complete: bool # Whether match has all of tokens, the list ends there otherwise.
+    # Filled in by Document.program.
+    bound: Set[str] | None = None # Names in folded it binds.
+    folded_with: frozenset | None = None
+    tree: List | None = None
+
+@dataclass
+class Change:
+    "What Document.edit did: statements[first:first + added] replaced removed ones."
+    first: int
+    removed: int
+    added: int
+    moved: bool = False # Whether the pos of the tokens after them changed.
+    relexed: int = 0    # Tokens lexed again.
+
+def chunks(text: str, start: int = 0) -> Iterator[Tuple[int, int, List]]:
+    "(start, end, spans) of each top level statement in text from start on."
+    spans, depth, end = [], 0, None
+    for offset, t in tok.Scanner(text).spans(start):
+        if end is not None and t != defs.endstmt: # Past its ';'s.
+            yield start, end, spans
+            start, spans, depth, end = end, [], 0, None
+
+        spans.append((offset, t))
+        if   t == defs.endstmt and depth <= 0: end = offset + 1
+        elif t in openers: depth += 1
+        elif t in closers: depth -= 1
+
+    if   end is not None: yield start, end, spans
+    elif spans:           yield start, len(text), spans
+
+def column(text: str, offset: int) -> int: return offset - text.rfind('\n', 0, offset)
+
+class Document:
+    def __init__(self, text: str = '', rules = cst.default_rules):
+        self.text, self.rules = text, rules
+        self.statements: List[Statement] = list(self.scan(0, 1))
+        self.rebound: frozenset = frozenset()
+
+    def scan(self, start: int, line: int) -> Iterator[Statement]:
+        text = self.text
+        for start, end, spans in chunks(text, start):
+            tokens = list(lex.lex(text, spans, start, line))
+            match, remaining = cst.parse_tokens(tokens, self.rules, 'stmts')
+            yield Statement(start, end, line, tokens, match, match is not None and type(remaining.peek()) is StopIteration)
+            line += text.count('\n', start, end)
+
+    def edit(self, offset: int, removed: int, inserted: str) -> Change:
+        "Replaces removed characters at offset with inserted."
+        old, stmts = self.text, self.statements
+        if offset < 0 or removed < 0 or offset + removed > len(old): raise ValueError(f'kol.incremental: edit ({offset}, {removed}) out of the text ({len(old)})')
+        self.text = text = old[:offset] + inserted + old[offset + removed:]
+        delta = len(inserted) - removed
+
+        first = max(bisect.bisect_left(stmts, offset, key = lambda s: s.end) - 1, 0)
+        start, line = (stmts[first].start, stmts[first].line) if stmts else (0, 1)
+
+        added, kept = [], len(stmts) # Old statements from kept on stay.
+        for s in self.scan(start, line):
+            added.append(s)
+            end = s.end - delta # Where it would have ended before.
+            if end < offset + removed: continue
+            j = bisect.bisect_left(stmts, end, first, key = lambda s: s.end)
+            if j < len(stmts) and stmts[j].end == end:
+                kept = j + 1
+                break
+
+        change = Change(first, kept - first, len(added), relexed = sum(len(s.tokens) for s in added))
+        if kept < len(stmts):
+            last = added[-1]
+            line_delta = last.line + text.count('\n', last.start, last.end) - stmts[kept].line
+            col_delta  = column(text, last.end) - column(old, stmts[kept].start)
+            change.moved = move(stmts[kept:], delta, line_delta, stmts[kept].line, col_delta)
+
+        self.statements = stmts[:first] + added + stmts[kept:]
+        return change
+
+    def parsed(self) -> List[Statement]:
+        "The statements cst.parse of the text matches, up to the first one that doesn't parse or ends the list."
+        ret = []
+        for s in self.statements:
+            if s.match is None: break
+            ret.append(s)
+            if not s.complete or len(s.match._fields) % 2: break # No ';' after its last statement.
+        return ret
+
+    def errors(self) -> List[Statement]: return [s for s in self.statements if not s.complete]
+
+    def cst(self) -> cst.UnwindableMatch | None:
+        "The match cst.parse gives for the text, made of the statements' own."
+        stmts = self.parsed()
+        if not stmts: return None
+        return cst.list_match('stmts:list', [f for s in stmts for f in s.match._fields])
+
+    def program(self, i) -> List:
+        "Interpast of parsed() as i.compile_str makes it."
+        stmts, rebound = self.parsed(), frozenset(i.rebound())
+        for s in stmts:
+            if s.tree is None: self.convert(i, s, self.rebound | rebound)
+
+        self.rebound = frozenset(n for s in stmts for n in s.bound) | rebound
+        for s in stmts: # Again, when the program rebinds names they weren't folded with.
+            if s.folded_with != self.rebound: self.convert(i, s, self.rebound)
+
+        return i.run_passes([a for s in stmts for a in s.tree])
+
+    def convert(self, i, s: Statement, rebound: frozenset):
+        _ast = ast.parse_and_rewrite(s.match, i.ast_parsemap, ast.folding(rebound))
+        s.bound = ast.bound_names(_ast, set()) & folded # Folds keep what they replaced, see ast.Folded.
+        tree = ast2interpast.convert(_ast)
+        s.folded_with, s.tree = rebound | s.bound, tree if type(tree) is list else [tree]
+
+def move(stmts: List[Statement], delta: int, line_delta: int, line: int, col_delta: int) -> bool:
+    "Shifts stmts by delta characters, their tokens by line_delta lines and the ones on line by col_delta columns, whether any token moved."
+    for s in stmts: s.start, s.end, s.line = s.start + delta, s.end + delta, s.line + line_delta
+    if not line_delta and not col_delta: return False
+
+    moved = False
+    for s in stmts:
+        if not line_delta and s.tokens[0].pos[0] != line: break # Neither did the rest.
+        s.tree, moved = None, True # Trees keep positions, KolFn.pos.
+        for t in s.tokens:
+            l, c = t.pos
+            if   l == line:  t.pos = (l + line_delta, c + col_delta)
+            elif line_delta: t.pos = (l + line_delta, c)
+            else: break
+    return moved
+
+if __name__ == "__main__":
+    from sys import argv
+    from pprint import pprint
+
+    # python -m kol.incremental file offset removed inserted
+    with open(argv[1]) as f: doc = Document(f.read())
+    change = doc.edit(int(argv[2]), int(argv[3]), argv[4])
+    print(change)
+    pprint(doc.cst(), indent = 4)
@@ -0,0 +1,165 @@
+# Inlining for kol.interpast, runs before kol.resolve.
+#
+# Three kinds of calls are inlined:
+#  - a KolFnCall on a KolFn literal ({ ... } and partial ifs),
+#  - kol.internal.if(else) on KolFn literals, into a Cond running the arms in place,
+#  - calls of small named functions: assigned once, at the top level, to a
+#    KolFn, never used as a parameter and defined by an earlier statement
+#    than the call, so the name means nothing else while the program runs.
+#    Functions outlive it though and anything can assign the name later (a
+#    function from an earlier program, the next eval_str), so the inlined
+#    body runs only while the name is still bound to that function, a plain
+#    call happens otherwise (tree.BoundTo).
+# Scopes are dynamic, so a body sees the same names inlined or called and
+# only its own scope has to be kept, as a scoped Block. The scope is dropped
+# when nothing could tell the difference: the body assigns nothing in it and
+# the params are replaced by their arguments, which needs the arguments to be
+# literals or lookups and the body to call nothing that could look the params
+# up by name (no calls, no function values, no rebound operators).
+
+from kol import interpast as tree
+
+from dataclasses import replace
+from typing import List, Dict, Any
+
+max_size = 40 # Largest named function body that gets inlined, in nodes.
+
+literals = (tree.KolNil, tree.KolInt, tree.KolFloat)
+
+def walk(_ast):
+    "Every node in _ast, function bodies included."
+    if _ast is None: return
+    yield _ast
+    t = type(_ast)
+    if   t is list:
+        for a in _ast: yield from walk(a)
+    elif t is tree.KolFn:
+        if type(_ast.body) is list: yield from walk(_ast.body)
+    elif t in (tree.Assign, tree.SlotAssign): yield from walk(_ast.value)
+    elif t is tree.KolFnCall:
+        if type(_ast.fn) is tree.KolFn: yield from walk(_ast.fn)
+        yield from walk(_ast.params)
+    elif t is tree.PrimOp: yield from walk(_ast.params)
+    elif t is tree.Block:  yield from walk(_ast.args); yield from walk(_ast.body)
+    elif t is tree.Cond:   yield from walk(_ast.cond); yield from walk(_ast.true); yield from walk(_ast.false)
+
+def size(_ast) -> int: return sum(1 for a in walk(_ast) if type(a) is not list)
+
+def own_assigns(_ast) -> bool:
+    "Whether _ast can assign in the scope it runs in, not counting scopes it opens."
+    t = type(_ast)
+    if   t in (tree.Assign, tree.SlotAssign): return True
+    elif t is list:           return any(own_assigns(a) for a in _ast)
+    elif t is tree.KolFnCall: return any(own_assigns(a) for a in _ast.params)
+    elif t is tree.PrimOp:    return any(own_assigns(a) for a in _ast.params)
+    elif t is tree.Block:     return any(own_assigns(a) for a in _ast.args) or (not _ast.scoped and own_assigns(_ast.body))
+    elif t is tree.Cond:      return own_assigns(_ast.cond) or own_assigns(_ast.true) or own_assigns(_ast.false)
+    return False
+
+def substitute(_ast, mapping: Dict[str, Any]):
+    "_ast with lookups of mapping's names replaced, for bodies kol.inline.Inliner.substitutable accepts."
+    t = type(_ast)
+    if   t is list:        return [substitute(a, mapping) for a in _ast]
+    elif t is tree.Lookup: return mapping.get(_ast.name, _ast)
+    elif t is tree.PrimOp: return tree.PrimOp(_ast.name, substitute(_ast.params, mapping))
+    elif t is tree.Block:
+        inner = {k: v for k, v in mapping.items() if k not in _ast.params[:len(_ast.args)]} # Shadowed in there.
+        return tree.Block(substitute(_ast.body, inner), _ast.params, substitute(_ast.args, mapping), _ast.scoped)
+    elif t is tree.Cond: return tree.Cond(substitute(_ast.cond, mapping), substitute(_ast.true, mapping), substitute(_ast.false, mapping))
+    return _ast
+
+def splice(stmts: List):
+    if len(stmts) == 0: return tree.KolNil()
+    if len(stmts) == 1: return stmts[0]
+    return tree.Block(stmts, scoped = False)
+
+class Inliner:
+    def __init__(self, program: List, max_size: int):
+        self.max_size = max_size
+        self.site     = 0  # Top level statement being inlined into.
+        self.known    = {} # Inlinable function name -> (index of the statement defining it, its KolFn).
+
+        # Names the program binds, a name bound only once at the top level is a known function.
+        assigns, self.rebound = {}, set()
+        for a in walk(program):
+            if   type(a) is tree.Assign: assigns[a.name] = assigns.get(a.name, 0) + 1
+            elif type(a) is tree.KolFn:  self.rebound.update(a.params)
+            elif type(a) is tree.Block:  self.rebound.update(a.params)
+        self.candidates = {name for name, n in assigns.items() if n == 1 and name not in self.rebound}
+        self.rebound.update(assigns)
+
+    def substitutable(self, params: List[str], args: List, body) -> bool:
+        if any(type(a) not in literals and type(a) is not tree.Lookup for a in args): return False
+        shadowing = set()
+        for a in walk(body):
+            t = type(a)
+            if t in (tree.Assign, tree.SlotAssign, tree.KolFnCall, tree.KolFn, tree.SlotLookup): return False
+            if t is tree.PrimOp and a.name in self.rebound: return False
+            if t is tree.Block: shadowing.update(a.params)
+        return not any(type(a) is tree.Lookup and a.name in shadowing for a in args)
+
+    def block(self, params: List[str], args: List, body: List):
+        bound = params[:len(args)]
+        if not bound and not own_assigns(body): return splice([a for a in args if type(a) not in literals] + body)
+        if bound and self.substitutable(params, args, body):
+            mapping = dict(zip(params, args))
+            used    = {a.name for a in walk(body) if type(a) is tree.Lookup}
+            # Arguments are evaluated even when nothing reads them, lookups can fail.
+            lead = [a for i, a in enumerate(args) if type(a) is tree.Lookup and not (i < len(params) and mapping[params[i]] is a and params[i] in used)]
+            return splice(lead + substitute(body, mapping))
+        return tree.Block(body, params, args)
+
+    def arm(self, fn): return self.block(fn.params, [], self.inline(fn.body))
+
+    def inlinable(self, name: str) -> bool:
+        if name not in self.known: return False
+        index, fn = self.known[name]
+        if index >= self.site or size(fn.body) > self.max_size: return False
+        return not any((type(a) is tree.KolFnCall and a.fn == name) or (type(a) is tree.Lookup and a.name == name) for a in walk(fn.body)) # Recursive.
+
+    def inline_fn_call(self, _ast: tree.KolFnCall):
+        fn, params = _ast.fn, _ast.params
+        def is_arm(a): return type(a) is tree.KolFn and type(a.body) is list
+
+        if type(fn) is tree.KolFn and type(fn.body) is list: return self.block(fn.params, self.inline(params), self.inline(fn.body))
+        elif fn == 'kol.internal.if' and fn not in self.rebound and len(params) == 2 and is_arm(params[1]):
+            return tree.Cond(self.inline(params[0]), self.arm(params[1]), None)
+        elif fn == 'kol.internal.ifelse' and fn not in self.rebound and len(params) == 3 and is_arm(params[1]) and is_arm(params[2]):
+            return tree.Cond(self.inline(params[0]), self.arm(params[1]), self.arm(params[2]))
+        elif type(fn) is str and self.inlinable(fn):
+            callee, params = self.known[fn][1], self.inline(params)
+            return tree.Cond(tree.BoundTo(fn, callee.origin), self.block(callee.params, params, callee.body), tree.KolFnCall(fn, params))
+        return tree.KolFnCall(self.inline(fn) if type(fn) is tree.KolFn else fn, self.inline(params))
+
+    def inline(self, _ast):
+        t = type(_ast)
+        if   t is list:           return [self.inline(a) for a in _ast]
+        elif t is tree.KolFn:     return replace(_ast, body = self.inline(_ast.body)) if type(_ast.body) is list else _ast
+        elif t is tree.Assign:    return tree.Assign(_ast.name, self.inline(_ast.value))
+        elif t is tree.KolFnCall: return self.inline_fn_call(_ast)
+        elif t is tree.PrimOp:    return tree.PrimOp(_ast.name, self.inline(_ast.params))
+        elif t is tree.Block:     return tree.Block(self.inline(_ast.body), _ast.params, self.inline(_ast.args), _ast.scoped)
+        elif t is tree.Cond:      return tree.Cond(self.inline(_ast.cond), self.inline(_ast.true), self.inline(_ast.false))
+        return _ast
+
+    def program(self, program: List):
+        ret = []
+        for self.site, stmt in enumerate(program):
+            stmt = self.inline(stmt)
+            if type(stmt) is tree.Assign and stmt.name in self.candidates and type(stmt.value) is tree.KolFn and type(stmt.value.body) is list:
+                stmt = tree.Assign(stmt.name, replace(stmt.value, origin = object()))
+                self.known[stmt.name] = self.site, stmt.value
+            ret.append(stmt)
+        return ret
+
+def inline(_ast, limit: int | None = None):
+    if type(_ast) is not list: _ast = [_ast]
+    return Inliner(_ast, max_size if limit is None else limit).program(_ast)
+
+if __name__ == "__main__":
+    from pprint import pprint
+    from sys import argv
+    from kol import ast, ast2interpast, cst
+
+    with open(argv[1]) as f:
+        pprint(inline(ast2interpast.convert(ast.parse_and_rewrite(cst.parse(f.read())[0]))), indent=4)
@@ -1,29 +1,51 @@
-from kol import interpast as tree, operator, operators, ast2interpast, ast, cst
-from typing import List, Callable, Dict, Any
+from kol import interpast as tree, operator, operators, ast2interpast, arrays, ast, cst, inline, metrics, resolve, stream
+from typing import List, Callable, Dict, Set, Any
 from dataclasses import dataclass, field
 
+# How Interpreter.eval_ast evaluates each node type, the default for Interpreter.on.
+handlers = {
+    tree.KolNil:     lambda _, _ast: _ast,
+    tree.KolInt:     lambda _, _ast: _ast,
+    tree.KolFloat:   lambda _, _ast: _ast,
+    tree.KolArray:   lambda _, _ast: _ast,
+    tree.KolFn:      lambda _, _ast: _ast,
+    tree.Lookup:     lambda s, _ast: s.handle_lookup(_ast),
+    tree.Assign:     lambda s, _ast: s.handle_assign(_ast),
+    tree.SlotLookup: lambda s, _ast: s.handle_slot_lookup(_ast),
+    tree.SlotAssign: lambda s, _ast: s.handle_slot_assign(_ast),
+    tree.KolFnCall:  lambda s, _ast: s.handle_fn_call(_ast),
+    tree.PrimOp:     lambda s, _ast: s.handle_prim_op(_ast),
+    tree.Block:      lambda s, _ast: s.handle_block(_ast),
+    tree.Cond:       lambda s, _ast: s.handle_cond(_ast),
+    tree.BoundTo:    lambda s, _ast: s.handle_bound_to(_ast),
+}
+
 @dataclass
 class Interpreter:
     ## Parsing stuff.
     operators: List[operator.Operator]                                 = field(default_factory = lambda: [])
-    # The grammar.
+    # The grammar, either rules or a kol.cstgen.CompiledRules.
     cst_rules: List[cst.Rule]                                          = field(default_factory = lambda: [])
     # How to convert from the grammar to an IR.
     ast_parsemap: Dict[str, Callable[[cst.UnwindableMatch, str], Any]] = field(default_factory = lambda: [])
     # How to convert fom the IR to the interpretable format (self.on).
     ast_convertmap: Dict[type, Callable[['ast'], 'tree']]              = field(default_factory = lambda: [])
+    # Passes run in order over the interpretable format before evaluating it.
+    tree_passes: List[Callable[['tree'], 'tree']]                      = field(default_factory = lambda: [inline.inline, resolve.resolve])
+    # A kol.progcache.ProgramCache, compile_str then skips sources it has seen.
+    program_cache: Any                                                 = None
+    # Called with the kol.metrics.PipelineMetrics of every eval_str when set.
+    on_metrics: Callable[['metrics.PipelineMetrics'], Any] | None      = None
 
     ## Runtime stuff.
-    variable_scopes = [{}]
-    on = {
-        tree.KolNil:    lambda _, _ast: _ast,
-        tree.KolInt:    lambda _, _ast: _ast,
-        tree.KolFloat:  lambda _, _ast: _ast,
-        tree.KolFn:     lambda _, _ast: _ast,
-        tree.Lookup:    lambda s, _ast: s.handle_lookup(_ast),
-        tree.Assign:    lambda s, _ast: s.handle_assign(_ast),
-        tree.KolFnCall: lambda s, _ast: s.handle_fn_call(_ast),
-    }
+    # Operator name -> (builtin KolFn, the function on values it wraps), see tree.PrimOp.
+    primitives: Dict[str, Any] = field(default_factory = lambda: {})
+    # Name -> the KolFn add_builtins bound it to, see rebound.
+    builtins: Dict[str, Any] = field(default_factory = lambda: {})
+    # Innermost last, the first one is the global scope.
+    variable_scopes: List[Dict[str, Any]] = field(default_factory = lambda: [{}])
+    # Node type -> how to evaluate it, per instance so it can be extended.
+    on: Dict[type, Callable[['Interpreter', Any], Any]] = field(default_factory = lambda: dict(handlers))
 
     def lookup(self, s: str): return self.eval_ast(tree.Lookup(s)) # Shorthand.
     def handle_lookup(self, _ast: tree.Lookup):
@@ -34,6 +56,15 @@ class Interpreter:
         pprint(['InterpError: Name not in any scope', _ast.name, self.variable_scopes, _ast]) # TODO: throw resumable exception ?
         exit(1)
 
+    def binding(self, s: str): # Like lookup, None instead of an error when s is unbound.
+        for scope in reversed(self.variable_scopes):
+            if s in scope: return scope[s]
+        return None
+
+    def rebound(self) -> Set[str]:
+        "Builtins bound to something else now, compile_str doesn't fold them."
+        return {n for n, fn in self.builtins.items() if self.binding(n) is not fn}
+
     def assign(self, n: str, v): return self.eval_ast(tree.Assign(n, v)) # Shorthand.
     def handle_assign(self, _ast: tree.Assign):
         tgt_scope = self.variable_scopes[-1]
@@ -42,6 +73,17 @@ class Interpreter:
         tgt_scope[_ast.name] = self.eval_ast(_ast.value)
         return tgt_scope[_ast.name]
 
+    # The scope is known, only a missing argument sends these to the dynamic versions.
+    def handle_slot_lookup(self, _ast: tree.SlotLookup):
+        scope = self.variable_scopes[-1 - _ast.depth]
+        return scope[_ast.name] if _ast.name in scope else self.handle_lookup(_ast)
+
+    def handle_slot_assign(self, _ast: tree.SlotAssign):
+        scope = self.variable_scopes[-1 - _ast.depth]
+        if _ast.name not in scope: return self.handle_assign(_ast)
+        scope[_ast.name] = self.eval_ast(_ast.value)
+        return scope[_ast.name]
+
     def handle_fn_call(self, _ast: tree.KolFnCall):
         if   type(_ast.fn) is str:        fn = self.handle_lookup(tree.Lookup(_ast.fn))
         elif type(_ast.fn) is tree.KolFn: fn = _ast.fn
@@ -50,52 +92,140 @@ class Interpreter:
             pprint(['InterpError: ast.fn is not a recognized (callable or resolvable) type', _ast])
             exit(1)
 
-        args = list( map(lambda p: self.eval_ast(p), _ast.params) )
+        return self.call(fn, list( map(lambda p: self.eval_ast(p), _ast.params) ))
 
+    def call(self, fn: tree.KolFn, args: List):
         # TODO: check if param count matches and eventually their types.
         self.variable_scopes.append({ k: v for k, v in zip(fn.params, args) })
 
-        if type(fn.body) is list: ret = i.eval_ast(fn.body)
+        if type(fn.body) is list: ret = self.eval_ast(fn.body)
         else:                     ret = fn.body(self, args)
         
         self.variable_scopes.pop()
         return ret
 
+    def handle_prim_op(self, _ast: tree.PrimOp):
+        fn, op = self.primitives.get(_ast.name, (None, None))
+        if fn is None or self.handle_lookup(_ast) is not fn: return self.handle_fn_call(tree.KolFnCall(_ast.name, _ast.params)) # Rebound.
+        return op(*[self.eval_ast(p) for p in _ast.params])
+
+    def handle_block(self, _ast: tree.Block):
+        if not _ast.scoped: return self.eval_ast(_ast.body)
+        args = [self.eval_ast(a) for a in _ast.args]
+        self.variable_scopes.append({ k: v for k, v in zip(_ast.params, args) })
+        ret = self.eval_ast(_ast.body)
+        self.variable_scopes.pop()
+        return ret
+
+    def handle_cond(self, _ast: tree.Cond): # Like kol.internal.if(else).
+        cond = self.eval_ast(_ast.cond)
+        if type(cond) is tree.KolArray: return arrays.select(cond, self.eval_ast(_ast.true), self.eval_ast(_ast.false) if _ast.false is not None else tree.KolNil())
+        arm = _ast.true if cond.value == 1 else _ast.false
+        return self.eval_ast(arm) if arm is not None else tree.KolNil()
+
+    def handle_bound_to(self, _ast: tree.BoundTo):
+        fn = self.binding(_ast.name)
+        return true if type(fn) is tree.KolFn and fn.origin is _ast.origin else false
+
     def eval_ast(self, _ast):
         if type(_ast) is not list: _ast = [_ast]
+        v = tree.KolNil() # Empty bodies, like the vm.
         for a in _ast: v = self.on[type(a)](self, a)
         return v
 
+    # Each stage is timed into m when there is one, see kol.metrics.
+    def compile_str(self, text, cstrule = 'stmts', m: 'metrics.PipelineMetrics | None' = None):
+        timed = metrics.timer(m)
+        if self.program_cache is not None:
+            key = self.program_cache.key(self, text, cstrule)
+            program = timed('cache', self.program_cache.get, key)
+            if m is not None: m.stage('cache').counts['hit'] = int(program is not None)
+            if program is not None: return program, cst.TokenCursor() # Only whole programs are cached.
+
+        if m is None: _cst, remaining = cst.parse(text, self.cst_rules, cstrule) # TODO: check for remaining text.
+        else:         _cst, remaining = metrics.parse(m, text, self.cst_rules, cstrule)
+        _ast  = timed('rewrite', ast.parse_and_rewrite, _cst, self.ast_parsemap, ast.folding(self.rebound()), m.rewrites if m is not None else None)
+        if m is not None: metrics.count_rewrites(m)
+        _ast2 = timed('convert', ast2interpast.convert, _ast)
+        if m is not None: metrics.count_nodes(m, 'convert', _ast2)
+        _ast2 = timed('passes', self.run_passes, _ast2)
+        if m is not None: metrics.count_nodes(m, 'passes', _ast2)
+
+        if self.program_cache is not None and type(remaining.peek()) is StopIteration: self.program_cache.put(key, _ast2)
+        return _ast2, remaining
+
+    def run_passes(self, _ast):
+        # Builtins bound to something else are assigned first as far as the passes can tell, so they are not inlined.
+        history = [tree.Assign(name, tree.KolNil()) for name in sorted(self.rebound())]
+        if history: _ast = history + (_ast if type(_ast) is list else [_ast])
+        for p in self.tree_passes: _ast = p(_ast)
+        return _ast[len(history):] if history else _ast
+
     def eval_str(self, text, cstrule = 'stmts'):
-        _cst, remaining = cst.parse(text, self.cst_rules, cstrule) # TODO: check for remaining text.
-        _ast  = ast.parse_and_rewrite(_cst, self.ast_parsemap)
-        _ast2 = ast2interpast.convert(_ast)
-        return self.eval_ast(_ast2), remaining
+        m = metrics.PipelineMetrics() if self.on_metrics is not None else None
+        program, remaining = self.compile_str(text, cstrule, m)
+        ret = metrics.timer(m)('eval', self.eval_ast, program)
+        if m is not None: self.on_metrics(m)
+        return ret, remaining
+
+    # Values of f's top level statements, each evaluated as soon as it has been read, see kol.stream.
+    def eval_stream(self, f, chunk_size = 1 << 16): return stream.eval_stream(self, f, chunk_size)
+
+# Comparisons give one of these, Kol values are never changed in place.
+true, false = tree.KolInt(1), tree.KolInt(0)
+
+operator_builtins = {
+    'minus': lambda lhs, rhs: tree.KolInt(lhs.value - rhs.value),
+    'plus':  lambda lhs, rhs: tree.KolInt(lhs.value + rhs.value),
+    'mul':   lambda lhs, rhs: tree.KolInt(lhs.value * rhs.value),
+    'div':   lambda lhs, rhs: tree.KolInt(int(lhs.value / rhs.value)),
+    'eq':    lambda lhs, rhs: true if lhs.value == rhs.value else false,
+    'ne':    lambda lhs, rhs: true if lhs.value != rhs.value else false,
+    'gt':    lambda lhs, rhs: true if lhs.value >  rhs.value else false,
+    'gte':   lambda lhs, rhs: true if lhs.value >= rhs.value else false,
+    'lt':    lambda lhs, rhs: true if lhs.value <  rhs.value else false,
+    'lte':   lambda lhs, rhs: true if lhs.value <= rhs.value else false,
+}
+
+# The same on the raw numbers, operator_builtins[name](l, r).value == raw_operators[name](l.value, r.value).
+raw_operators = {
+    'minus': lambda lhs, rhs: lhs - rhs,
+    'plus':  lambda lhs, rhs: lhs + rhs,
+    'mul':   lambda lhs, rhs: lhs * rhs,
+    'div':   lambda lhs, rhs: int(lhs / rhs),
+    'eq':    lambda lhs, rhs: 1 if lhs == rhs else 0,
+    'ne':    lambda lhs, rhs: 1 if lhs != rhs else 0,
+    'gt':    lambda lhs, rhs: 1 if lhs >  rhs else 0,
+    'gte':   lambda lhs, rhs: 1 if lhs >= rhs else 0,
+    'lt':    lambda lhs, rhs: 1 if lhs <  rhs else 0,
+    'lte':   lambda lhs, rhs: 1 if lhs <= rhs else 0,
+}
+
+def add_builtins(i: Interpreter):
+    i.builtins['kol.internal.identity'] = tree.KolFn([], lambda i, ps: ps[0] if len(ps) == 1 else ps)
+    i.builtins['kol.internal.if']       = tree.KolFn([], lambda i, ps: i.eval_ast(tree.KolFnCall(ps[1], []) if ps[0].value == 1 else tree.KolNil()))
+    i.builtins['kol.internal.ifelse']   = tree.KolFn([], lambda i, ps: i.eval_ast(tree.KolFnCall(ps[1       if ps[0].value == 1 else 2], [])))
+
+    for name, op in operator_builtins.items():
+        fn = tree.KolFn(['lhs', 'rhs'], lambda i, _, op = op: op(i.lookup('lhs'), i.lookup('rhs')))
+        i.primitives[name] = fn, op
+        i.builtins[name] = fn
+
+    for name, fn in i.builtins.items():
+        fn.origin = tree.builtin_origin(name)
+        i.assign(name, fn)
+    return i
 
 if __name__ == "__main__":
     from sys import argv
-    from kol import ast, cst
+    from kol import ast, cst, cstgen
 
-    i = Interpreter(
+    i = add_builtins(Interpreter(
         operators = operators.operators,
-        cst_rules = cst.default_rules,
+        cst_rules = cstgen.load() if '--compiled-grammar' in argv else cst.default_rules,
         ast_parsemap = ast.parsemap,
         ast_convertmap = ast2interpast.convertmap
-    )
-    i.assign('kol.internal.identity', tree.KolFn([], lambda i, ps: ps[0] if len(ps) == 1 else ps))
-    i.assign('kol.internal.if',       tree.KolFn([], lambda i, ps: i.eval_ast(tree.KolFnCall(ps[1], []) if ps[0].value == 1 else tree.KolNil())))
-    i.assign('kol.internal.ifelse',   tree.KolFn([], lambda i, ps: i.eval_ast(tree.KolFnCall(ps[1       if ps[0].value == 1 else 2], []))))
-
-    i.assign('minus',        tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(i.lookup('lhs').value - i.lookup('rhs').value)))
-    i.assign('plus',         tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(i.lookup('lhs').value + i.lookup('rhs').value)))
-    i.assign('mul',          tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(i.lookup('lhs').value * i.lookup('rhs').value)))
-    i.assign('div',          tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(int(i.lookup('lhs').value / i.lookup('rhs').value))))
-    i.assign('eq',           tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value == i.lookup('rhs').value else 0)))
-    i.assign('ne',           tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value != i.lookup('rhs').value else 0)))
-    i.assign('gt',           tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value >  i.lookup('rhs').value else 0)))
-    i.assign('gte',          tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value >= i.lookup('rhs').value else 0)))
-    i.assign('lt',           tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value <  i.lookup('rhs').value else 0)))
-    i.assign('lte',          tree.KolFn(['lhs', 'rhs'], lambda i, _: tree.KolInt(1 if i.lookup('lhs').value <= i.lookup('rhs').value else 0)))
+    ))
 
     with open(argv[1]) as f: 
         ret, rem = i.eval_str( f.read() )
@@ -1,42 +1,121 @@
 # The ast used by the interpreter, this one is final.
 
-from typing import List, Callable, Any
-from dataclasses import dataclass
+from typing import List, Callable, Any, Dict
+from dataclasses import dataclass, field
 
 # Value types.
 
-@dataclass
+@dataclass(slots = True)
 class KolNil: pass
 
-@dataclass
+@dataclass(slots = True)
 class KolInt:
     value: int
 
-@dataclass
+@dataclass(slots = True)
 class KolFloat:
     value: float
 
-@dataclass
+# A whole column at once, value is a numpy.ndarray, see kol.arrays.
+@dataclass(eq = False, slots = True) # Comparing ndarrays gives an array, not a bool.
+class KolArray:
+    value: Any
+
+@dataclass(slots = True)
 class KolFn:
     params: List[str] 
     # if body is Callable, the params are passed as list to callable aswell.
     body: Callable['interp', 'paramlist'] | List # List of statements.
+    pos: Any = field(default = None, compare = False) # (line, column) of its source, see kol.lexer.
+    # For kol.lazy: True or the names of the params evaluated before the call,
+    # the others may be bound to a Lazy (forced by lookup). Kol functions get
+    # () from kol.lazy.mark when they are pure.
+    strict: Any = field(default = True, compare = False)
+    # Set by kol.inline on functions it inlines calls of, passes rebuilding a
+    # function keep it (dataclasses.replace), see BoundTo.
+    origin: Any = field(default = None, compare = False, repr = False)
 
 # Instructions.
 
-# TODO: investigate adding a Lazy wrapper that only evaluates
-# when needed (on handle_fn_call).
+# An argument kol.lazy hasn't evaluated yet, expr runs the first time the
+# param bound to it is looked up, in the scopes[:depth] of the call.
+@dataclass(eq = False, slots = True)
+class Lazy:
+    expr: Any
+    scopes: Any
+    depth: int
+    value: Any = None
+    forced: bool = False
 
-@dataclass
+@dataclass(slots = True)
 class Lookup:
     name: str
 
-@dataclass
+@dataclass(slots = True)
 class Assign:
     name: str
     value: Any
 
-@dataclass
+@dataclass(slots = True)
 class KolFnCall:
     fn: str | KolFn
     params: List
+
+# Call of a builtin operator (Interpreter.primitives) by name, evaluated
+# straight on the values of params unless name was rebound to something else.
+@dataclass(slots = True)
+class PrimOp:
+    name: str
+    params: List
+
+# Lookup/Assign of a name kol.resolve found the scope of, depth scopes up from
+# the innermost one. Scopes are dicts, the name still finds it in there.
+
+@dataclass(slots = True)
+class SlotLookup:
+    name: str
+    depth: int
+
+@dataclass(slots = True)
+class SlotAssign:
+    name: str
+    depth: int
+    value: Any
+
+# Inlined calls, see kol.inline.
+
+# body run right where it is, in a new scope binding params to args like a
+# call would, or in the current one when scoped is False (then there are no params).
+@dataclass(slots = True)
+class Block:
+    body: List
+    params: List[str] = field(default_factory = lambda: [])
+    args: List = field(default_factory = lambda: [])
+    scoped: bool = True
+
+# kol.internal.if(else) with the arms inlined, false is None without an else.
+@dataclass(slots = True)
+class Cond:
+    cond: Any
+    true: Any
+    false: Any
+
+# Whether name is bound to a KolFn with this origin (1 or 0), an inlined call
+# of a named function runs as Cond(BoundTo(name, origin), inlined, call).
+@dataclass(slots = True)
+class BoundTo:
+    name: str
+    origin: Any = field(repr = False, compare = False)
+
+# Origin of the stock builtins, the same for every interpreter and whichever
+# of kol.interp or kol.arrays made them. Folded constants check it, see
+# kol.ast.Folded. Unpickles as the same one, for kol.progcache.
+class BuiltinOrigin:
+    def __init__(self, name: str): self.name = name
+    def __reduce__(self): return builtin_origin, (self.name,)
+
+builtin_origins: Dict[str, BuiltinOrigin] = {}
+
+def builtin_origin(name: str) -> BuiltinOrigin:
+    if name not in builtin_origins: builtin_origins[name] = BuiltinOrigin(name)
+    return builtin_origins[name]
@@ -0,0 +1,122 @@
+# Call-by-need for Interpreter.eval_ast, the tree walking engine, opt-in:
+#     lazy.enable(i) # Also adds mark to i.tree_passes.
+#
+# Arguments of pure Kol functions (see kol.memo, mark sets their KolFn.strict
+# to none of the params) are bound to a tree.Lazy instead of their value,
+# evaluated by the first lookup of the param and replaced by the value in its
+# scope. Arguments never looked up are never evaluated, errors included.
+# Literals and function values are passed as they are, they cost nothing to
+# evaluate.
+#
+# Scopes are dynamic, so a Lazy runs in the scopes of the call that made it,
+# the ones below the callee's, and has to give what it would have given
+# before the call. Only arguments that can't change anything are delayed:
+# lookups, literals, operators and calls of pure functions on those (what
+# effect_free accepts), and only into pure functions, which assign nothing
+# but their own params and call nothing but pure functions, so the scopes
+# below don't change while they run. Everything else is evaluated before the
+# call, like without kol.lazy. Forcing takes the scopes above them off for a
+# moment, which is fine as long as the Lazy is forced during that call, and
+# Lazy values can't outlive it: lookups, hence assignments and return values,
+# only see forced values. Like kol.memo, mark assumes the operators and the
+# functions a pure one calls stay bound to what they were when it ran.
+#
+# Builtins get values for the params in KolFn.strict (all of them by
+# default) and may get a Lazy for the others, looking them up by name forces
+# them. Operators always evaluate their operands, arithmetic costs the same.
+# Calls kol.inline turned into blocks evaluate their arguments first, leave
+# it out of tree_passes ([resolve.resolve, lazy.mark]) for arguments to stay
+# lazy through small functions.
+
+from kol import interpast as tree, memo, vm
+
+from dataclasses import replace
+from typing import List
+
+values = (tree.KolNil, tree.KolInt, tree.KolFloat, tree.KolArray, tree.KolFn)
+
+def mark(_ast):
+    "_ast with the pure functions it defines taking their arguments lazily, a pass for Interpreter.tree_passes."
+    if type(_ast) is not list: _ast = [_ast]
+    pure = memo.Purity(_ast).pure
+    return [tree.Assign(s.name, replace(s.value, strict = ())) if type(s) is tree.Assign and s.name in pure else s for s in _ast]
+
+def effect_free(i, _ast) -> bool:
+    "Whether evaluating _ast assigns nothing and calls nothing but functions mark found pure."
+    t = type(_ast)
+    if   t in values or t in (tree.Lookup, tree.SlotLookup, tree.BoundTo): return True
+    elif t is tree.PrimOp: return all(effect_free(i, p) for p in _ast.params)
+    elif t is tree.Cond:   return effect_free(i, _ast.cond) and effect_free(i, _ast.true) and (_ast.false is None or effect_free(i, _ast.false))
+    elif t is tree.Block:  return all(effect_free(i, a) for a in _ast.args) and all(effect_free(i, a) for a in _ast.body)
+    elif t is tree.KolFnCall:
+        fn = _ast.fn if type(_ast.fn) is tree.KolFn else i.binding(_ast.fn) # A Lazy for params, not a KolFn.
+        return type(fn) is tree.KolFn and type(fn.body) is list and fn.strict == () and all(effect_free(i, p) for p in _ast.params)
+    return False
+
+def delay(i, _ast):
+    if type(_ast) in values: return _ast
+    return tree.Lazy(_ast, i.variable_scopes, len(i.variable_scopes))
+
+def force(i, v: tree.Lazy):
+    if not v.forced:
+        scopes, depth = v.scopes, v.depth
+        above = scopes[depth:]
+        del scopes[depth:]
+        try:     v.value = i.eval_ast(v.expr)
+        finally: scopes.extend(above)
+        v.forced, v.expr, v.scopes = True, None, None
+    return v.value
+
+def arguments(i, fn: tree.KolFn, params: List) -> List:
+    if fn.strict is True: return [i.eval_ast(p) for p in params]
+    return [i.eval_ast(p) if (k < len(fn.params) and fn.params[k] in fn.strict) or not effect_free(i, p) else delay(i, p) for k, p in enumerate(params)]
+
+def lookup(i, _ast):
+    for scope in reversed(i.variable_scopes):
+        if _ast.name in scope:
+            v = scope[_ast.name]
+            if type(v) is tree.Lazy: v = scope[_ast.name] = force(i, v)
+            return v
+    return i.handle_lookup(_ast) # Reports the error.
+
+def slot_lookup(i, _ast: tree.SlotLookup):
+    scope = i.variable_scopes[-1 - _ast.depth]
+    if _ast.name not in scope: return lookup(i, _ast)
+    v = scope[_ast.name]
+    if type(v) is tree.Lazy: v = scope[_ast.name] = force(i, v)
+    return v
+
+def fn_call(i, _ast: tree.KolFnCall):
+    if   type(_ast.fn) is str:        fn = lookup(i, tree.Lookup(_ast.fn))
+    elif type(_ast.fn) is tree.KolFn: fn = _ast.fn
+    else: return i.handle_fn_call(_ast) # Reports the error.
+    return i.call(fn, arguments(i, fn, _ast.params))
+
+def prim_op(i, _ast: tree.PrimOp):
+    fn, op = i.primitives.get(_ast.name, (None, None))
+    if fn is None or lookup(i, _ast) is not fn: return fn_call(i, tree.KolFnCall(_ast.name, _ast.params)) # Rebound.
+    return op(*[i.eval_ast(p) for p in _ast.params])
+
+handlers = {
+    tree.Lookup:     lookup,
+    tree.SlotLookup: slot_lookup,
+    tree.KolFnCall:  fn_call,
+    tree.PrimOp:     prim_op,
+}
+
+def enable(i):
+    if isinstance(i, vm.VM): raise ValueError(f'kol.lazy: {type(i).__name__} does not evaluate through Interpreter.on, use kol.interp.Interpreter')
+    i.on.update(handlers)
+    if mark not in i.tree_passes: i.tree_passes = i.tree_passes + [mark]
+    return i
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol import resolve
+    from kol.bench import make
+
+    i = enable(make(tree_passes = [resolve.resolve])) # Then mark.
+
+    with open(argv[1]) as f:
+        ret, rem = i.eval_str(f.read())
+        print(ret)
@@ -1,24 +1,33 @@
 import kol.tokenizer as tok
 import kol.defs      as defs
 
+# pos is the (line, column) the token starts at, both from 1, None for made up ones.
 class Glyph:
-    def __init__(self, text): self.text = text
+    __slots__ = ('text', 'pos')
+    def __init__(self, text, pos = None): self.text, self.pos = text, pos
     def __repr__(self): return self.text
 class Text:
-    def __init__(self, text): self.text = text.strip()
+    __slots__ = ('text', 'pos')
+    def __init__(self, text, pos = None): self.text, self.pos = text.strip(), pos
     def __repr__(self): return f"t\"{self.text}\""
 
-def lex(text):
-    text_stack = []
-    for t in tok.tokenize(text):
+# spans are the (offset, token) pairs of text, tokenized here when not given.
+# They may start further in, at offset start (on line), see kol.incremental.
+def lex(text, spans = None, start = 0, line = 1):
+    text_stack, line_start, last = [], text.rfind('\n', 0, start) + 1, start
+    for offset, t in spans if spans is not None else tok.Scanner(text).spans(start):
+        newlines = text.count('\n', last, offset)
+        if newlines: line, line_start = line + newlines, text.rfind('\n', last, offset) + 1
+        pos, last = (line, offset - line_start + 1), offset
+
         if t in defs.glyphs:
             if len(text_stack):
-                for _t in text_stack: yield Text(_t)
+                for _pos, _t in text_stack: yield Text(_t, _pos)
                 text_stack = []
-            yield Glyph(t)
-        else: text_stack.append(t)
+            yield Glyph(t, pos)
+        else: text_stack.append((pos, t))
 
-    if len(text_stack): yield Text(" ".join(text_stack))
+    if len(text_stack): yield Text(" ".join(t for _, t in text_stack), text_stack[0][0])
 
 if __name__ == "__main__":
     from sys import argv
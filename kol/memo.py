@@ -0,0 +1,190 @@
+# Memoization of pure Kol functions, a pass for Interpreter.tree_passes that
+# goes after kol.inline and kol.resolve:
+#     i.tree_passes = [inline.inline, resolve.resolve, memo.memoize]
+#     print(memo.report(program)) # Hits and misses of every cache.
+#
+# A function is pure when its result depends on its arguments only: its body
+# reads and assigns only its own params (and those of the blocks and if arms
+# in it), and calls only operators and pure functions. Scopes are dynamic, so
+# reading any other name would read whatever the caller has bound. The
+# functions considered are the ones kol.inline can inline by name: assigned
+# once, at the top level, to a KolFn and never used as a parameter, so a call
+# by that name always reaches them. Purity is then found for all of them at
+# once (mutual recursion), starting from all pure and dropping the ones that
+# call anything else until nothing changes. Operators are pure unless the
+# program rebinds them. Anything running later can still rebind an operator or
+# one of the functions, so a cache is only used while every name the function
+# relies on, those its callees rely on included, is bound to what it was.
+#
+# Pure functions making at least min_calls calls of pure functions get their
+# body wrapped in a Memoized builtin, the interpreter binds the params as for
+# any builtin and the body runs in that scope on a miss. Results are kept in a
+# bounded LRU cache per function, keyed by the argument values; calls with
+# other values (functions, arrays) or another argument count than the params
+# aren't cached. Functions making fewer calls gain little, the lookup costs
+# about what the call does, and kol.vm can still tail call them.
+
+from kol import interpast as tree, inline
+
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Set, Tuple, Any
+
+max_entries = 1024 # Per function.
+min_calls   = 2
+
+scalars = (tree.KolNil, tree.KolInt, tree.KolFloat)
+
+def arg_key(args: List):
+    if any(type(a) not in scalars for a in args): return None
+    return tuple((type(a), getattr(a, 'value', None)) for a in args)
+
+@dataclass
+class LRUCache:
+    max_entries: int = max_entries
+    entries: OrderedDict = field(default_factory = OrderedDict, repr = False)
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+    def clear(self): self.entries.clear()
+
+@dataclass(eq = False)
+class Memoized:
+    "Builtin body of a pure function, runs body (a list of statements) on a miss."
+    name: str
+    body: List
+    arity: int
+    cache: LRUCache
+    guards: List[Tuple[str, Any]] = field(default_factory = lambda: []) # (name, origin of the KolFn it has to be bound to), see tree.BoundTo.
+
+    def bound(self, i) -> bool:
+        for name, origin in self.guards:
+            fn = i.binding(name)
+            if type(fn) is not tree.KolFn or fn.origin is not origin: return False
+        return True
+
+    def __call__(self, i, args: List):
+        key = arg_key(args) if len(args) == self.arity and self.bound(i) else None
+        if key is None: return i.eval_ast(self.body)
+        ret = self.cache.get(key)
+        if ret is None:
+            ret = i.eval_ast(self.body)
+            self.cache.put(key, ret)
+        return ret
+
+    def __getstate__(self): # kol.progcache stores programs, not what they computed.
+        return {**self.__dict__, 'cache': LRUCache(self.cache.max_entries)}
+
+class Purity:
+    def __init__(self, program: List):
+        inliner       = inline.Inliner(program, inline.max_size) # Same candidates, see kol.inline.
+        self.rebound  = inliner.rebound
+        self.known    = {s.name: s.value for s in program if type(s) is tree.Assign and s.name in inliner.candidates and type(s.value) is tree.KolFn and type(s.value.body) is list}
+        self.pure     = set(self.known)
+
+        changed = True
+        while changed:
+            changed = False
+            for name in sorted(self.pure):
+                fn = self.known[name]
+                if not self.is_pure(fn.body, set(fn.params)):
+                    self.pure.discard(name)
+                    changed = True
+
+    def arm(self, a, bound: Set[str]) -> bool:
+        "An if arm, a KolFn called with no arguments."
+        return type(a) is tree.KolFn and type(a.body) is list and self.is_pure(a.body, bound)
+
+    def is_pure(self, _ast, bound: Set[str]) -> bool:
+        "Whether _ast, run where bound are the only names, depends on them only."
+        t = type(_ast)
+        if   t is list:                               return all(self.is_pure(a, bound) for a in _ast)
+        elif t in scalars or t is tree.KolArray:      return True
+        elif t in (tree.Lookup, tree.SlotLookup):     return _ast.name in bound
+        elif t in (tree.Assign, tree.SlotAssign):     return _ast.name in bound and self.is_pure(_ast.value, bound)
+        elif t is tree.PrimOp:                        return _ast.name not in self.rebound and self.is_pure(_ast.params, bound)
+        elif t is tree.Block:
+            inner = bound | set(_ast.params[:len(_ast.args)]) if _ast.scoped else bound
+            return self.is_pure(_ast.args, bound) and self.is_pure(_ast.body, inner)
+        elif t is tree.Cond:
+            return self.is_pure(_ast.cond, bound) and self.is_pure(_ast.true, bound) and (_ast.false is None or self.is_pure(_ast.false, bound))
+        elif t is tree.BoundTo:                       # Guards an inlined call of it, or a folded constant.
+            return _ast.name in self.pure or (type(_ast.origin) is tree.BuiltinOrigin and _ast.name not in self.rebound)
+        elif t is tree.KolFnCall:
+            fn, params = _ast.fn, _ast.params
+            if fn in ('kol.internal.if', 'kol.internal.ifelse') and fn not in self.rebound: # Not inlined, the arms are KolFns.
+                return len(params) >= 2 and self.is_pure(params[0], bound) and all(self.arm(a, bound) for a in params[1:])
+            if fn == 'kol.internal.identity' and fn not in self.rebound: return self.is_pure(params, bound) # Parenthesis.
+            if not self.is_pure(params, bound): return False
+            if type(fn) is tree.KolFn: return type(fn.body) is list and self.is_pure(fn.body, bound | set(fn.params[:len(params)]))
+            return fn in self.pure
+        return False # Function values and anything unknown.
+
+    def calls(self, fn: tree.KolFn) -> int:
+        return sum(1 for a in inline.walk(fn.body) if type(a) is tree.KolFnCall and a.fn in self.pure)
+
+    def relies_on(self, name: str) -> Set[str]:
+        "The builtins and pure functions the pure function name calls, directly or not."
+        names, todo = set(), [name]
+        while todo:
+            for a in inline.walk(self.known[todo.pop()].body):
+                t = type(a)
+                if   t is tree.PrimOp:                          n = a.name
+                elif t is tree.KolFnCall and type(a.fn) is str: n = a.fn
+                elif t is tree.BoundTo:                         n = a.name
+                else: continue
+                if n not in names:
+                    names.add(n)
+                    if n in self.pure: todo.append(n)
+        return names
+
+def memoize(_ast, limit: int | None = None):
+    "_ast with the bodies of its pure functions that are worth it memoized."
+    if type(_ast) is not list: _ast = [_ast]
+    purity, ret = Purity(_ast), []
+    origins = {name: fn.origin if fn.origin is not None else object() for name, fn in purity.known.items() if name in purity.pure}
+    for stmt in _ast:
+        if type(stmt) is tree.Assign and stmt.name in purity.pure:
+            fn = replace(stmt.value, origin = origins[stmt.name])
+            if purity.calls(fn) >= min_calls:
+                guards = [(n, origins[n] if n in origins else tree.builtin_origin(n)) for n in sorted(purity.relies_on(stmt.name))]
+                fn = replace(fn, body = Memoized(stmt.name, fn.body, len(fn.params), LRUCache(max_entries if limit is None else limit), guards))
+            stmt = tree.Assign(stmt.name, fn)
+        ret.append(stmt)
+    return ret
+
+def caches(program: List) -> Dict[str, LRUCache]:
+    "Name -> cache of every function memoize wrapped in program."
+    return {s.name: s.value.body.cache for s in program if type(s) is tree.Assign and type(s.value) is tree.KolFn and type(s.value.body) is Memoized}
+
+def report(program: List) -> str:
+    lines = [f"{'function':<24} {'hits':>10} {'misses':>10} {'entries':>8} {'evicted':>8}"]
+    for name, c in caches(program).items(): lines.append(f'{name:<24} {c.hits:>10} {c.misses:>10} {len(c.entries):>8} {c.evictions:>8}')
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol import resolve
+    from kol.bench import make
+
+    i = make(tree_passes = [inline.inline, resolve.resolve, memoize])
+
+    with open(argv[1]) as f: program, rem = i.compile_str(f.read())
+    print(i.eval_ast(program))
+    print(report(program))
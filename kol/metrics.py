@@ -0,0 +1,97 @@
+# What every stage of Interpreter.eval_str costs:
+#     i.on_metrics = lambda m: print(m.report()) # Every eval_str.
+#     ret, rem, m = metrics.measure(i, text)      # Once.
+#
+# Interpreter.compile_str times each stage into the PipelineMetrics it is
+# given, running them one after the other instead of lazily pulling tokens
+# through the parser, so each can be timed on its own:
+#   tokenize  kol.tokenizer, tokens made,
+#   lex       kol.lexer on those tokens, lexemes made,
+#   parse     cst.parse_tokens, lexemes consumed, branch attempts and the
+#             backtracking they cost (see cst.PredictionStats),
+#   rewrite   ast.parse_and_rewrite, nodes after each rewrite and what the
+#             rewrites did, the operator precedence passes included
+#             (binop:compare/push/reduce),
+#   convert   ast2interpast.convert, interpast nodes made,
+#   passes    Interpreter.tree_passes, interpast nodes left,
+#   eval      Interpreter.eval_ast.
+# With a program cache, a hit replaces everything before eval with a cache
+# stage. Parser counters are only there for lists of rules, a
+# kol.cstgen.CompiledRules keeps none.
+
+from kol import ast, ast2interpast, cst, inline, lexer as lex, tokenizer as tok
+
+from dataclasses import dataclass, field, asdict
+from time import perf_counter
+from typing import List, Dict, Any
+
+@dataclass
+class Stage:
+    name: str
+    seconds: float = 0
+    counts: Dict[str, int] = field(default_factory = lambda: {})
+
+@dataclass
+class PipelineMetrics:
+    stages: List[Stage] = field(default_factory = lambda: [])
+    parser: cst.PredictionStats = field(default_factory = cst.PredictionStats)
+    rewrites: ast.RewriteStats = field(default_factory = ast.RewriteStats)
+
+    def stage(self, name: str) -> Stage | None: return next((s for s in self.stages if s.name == name), None)
+    def total(self) -> float: return sum(s.seconds for s in self.stages)
+
+    def timed(self, name: str, f, *args):
+        stage, start = Stage(name), perf_counter()
+        ret = f(*args)
+        stage.seconds = perf_counter() - start
+        self.stages.append(stage)
+        return stage, ret
+
+    def as_dict(self) -> Dict[str, Any]: return asdict(self) # JSON friendly.
+
+    def report(self) -> str:
+        lines = [f"{'stage':<10} {'ms':>10}  counts"]
+        for s in self.stages: lines.append(f"{s.name:<10} {s.seconds * 1e3:>10.3f}  " + ', '.join(f'{k} {v}' for k, v in s.counts.items()))
+        lines.append(f"{'total':<10} {self.total() * 1e3:>10.3f}")
+        return '\n'.join(lines)
+
+def timer(m: PipelineMetrics | None):
+    "timed(name, f, *args) giving f(*args), timed as a stage of m when there is one."
+    if m is None: return lambda name, f, *args: f(*args)
+    return lambda name, f, *args: m.timed(name, f, *args)[1]
+
+def parse(m: PipelineMetrics, text: str, rules, cstrule: str):
+    "cst.parse(text, rules, cstrule) as the tokenize, lex and parse stages of m."
+    stage, spans = m.timed('tokenize', lambda: list(tok.Scanner(text).spans()))
+    stage.counts['tokens'] = len(spans)
+    stage, lexemes = m.timed('lex', lambda: list(lex.lex(text, spans)))
+    stage.counts['lexemes'] = len(lexemes)
+
+    stage, (_cst, remaining) = m.timed('parse', cst.parse_tokens, lexemes, rules, cstrule, False, False, True, m.parser)
+    stage.counts['lexemes'] = cst.match_size(_cst) if _cst is not None else 0
+    if type(rules) is list:
+        stage.counts.update(attempts = m.parser.total_attempted(), skipped = m.parser.total_skipped(),
+                            unwound = m.parser.unwound, prepends = m.parser.prepends, prepended = m.parser.prepended)
+    return _cst, remaining
+
+def count_rewrites(m: PipelineMetrics):
+    m.stage('rewrite').counts.update({f'nodes:{k}': v[1] for k, v in m.rewrites.nodes.items()})
+    m.stage('rewrite').counts.update(m.rewrites.events)
+
+def count_nodes(m: PipelineMetrics, name: str, program): m.stage(name).counts['nodes'] = inline.size(program)
+
+def measure(i, text: str, cstrule: str = 'stmts'):
+    "i.eval_str(text, cstrule) stage by stage, returns (value, remaining, PipelineMetrics)."
+    m = PipelineMetrics()
+    program, remaining = i.compile_str(text, cstrule, m)
+    return m.timed('eval', i.eval_ast, program)[1], remaining, m
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol.bench import make
+
+    i = make()
+
+    with open(argv[1]) as f: ret, rem, m = measure(i, f.read())
+    print(ret)
+    print(m.report())
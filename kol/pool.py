@@ -0,0 +1,70 @@
+# Runs many scripts, or many evaluations of scripts with different inputs, on
+# a pool of worker processes:
+#     with pool.Pool(engine = 'closures') as p:
+#         p.eval_files(['a.kol', 'b.kol'])
+#         p.eval_strs(['price * qty'] * 3, [{'price': 2, 'qty': q} for q in range(3)])
+#
+# Every worker imports kol and builds its interpreter settings (grammar,
+# engine, program cache) once when it starts. Each job then gets a fresh
+# interpreter with the builtins, so nothing a script assigns is seen by the
+# next one, binds its inputs (see kol.batch.box) and returns the value of its
+# last statement, like eval_str. Interpreters don't share state, so a worker
+# only ever waits on its own jobs and throughput grows with the processes.
+# A shared kol.progcache.ProgramCache directory saves parsing a script in
+# every worker.
+
+from kol import arrays, batch, bench, cst, cstgen
+from kol.bench import engines
+
+from typing import List, Dict, Any, Sequence
+import multiprocessing
+
+def make_interpreter(engine: str = 'closures', compiled_grammar: bool = False, program_cache = None, with_arrays: bool = False):
+    i = bench.make(engines[engine], cst_rules = cstgen.load() if compiled_grammar else cst.default_rules, program_cache = program_cache)
+    return arrays.add_builtins(i) if with_arrays else i
+
+# The settings of this worker process, see init_worker.
+settings: Dict[str, Any] = {}
+
+def init_worker(options: Dict[str, Any]):
+    settings.update(options)
+    make_interpreter(**settings) # Loads the grammar, and the compiled one from disk if asked for.
+
+def run_job(job):
+    text, bindings = job
+    i = make_interpreter(**settings)
+    for name, v in (bindings or {}).items(): i.assign(name, batch.box(v))
+    try: ret, _ = i.eval_str(text)
+    except SystemExit: raise RuntimeError('kol.pool: the script failed, see the worker output') from None # The worker would be gone and its job never done.
+    return ret
+
+def read(path: str) -> str:
+    with open(path) as f: return f.read()
+
+class Pool:
+    def __init__(self, processes: int | None = None, engine: str = 'closures', compiled_grammar: bool = False, program_cache = None, with_arrays: bool = False):
+        if engine not in engines: raise ValueError(f'kol.pool: unknown engine {engine!r}, expected one of {list(engines)}')
+        options = dict(engine = engine, compiled_grammar = compiled_grammar, program_cache = program_cache, with_arrays = with_arrays)
+        self.pool = multiprocessing.Pool(processes, initializer = init_worker, initargs = (options,))
+
+    def eval_strs(self, texts: Sequence[str], bindings: Sequence[Dict[str, Any]] | None = None, chunksize: int = 1) -> List[Any]:
+        "Value of every text, evaluated with the inputs at the same index of bindings."
+        if bindings is not None and len(bindings) != len(texts): raise ValueError(f'kol.pool: {len(texts)} texts but {len(bindings)} bindings')
+        return self.pool.map(run_job, list(zip(texts, bindings if bindings is not None else [None] * len(texts))), chunksize)
+
+    def eval_files(self, paths: Sequence[str], chunksize: int = 1) -> List[Any]:
+        return self.eval_strs([read(p) for p in paths], chunksize = chunksize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self): return self
+    def __exit__(self, *_): self.close()
+
+if __name__ == "__main__":
+    from sys import argv
+
+    # python -m kol.pool a.kol b.kol ..., prints the value of each script.
+    with Pool() as p:
+        for path, ret in zip(argv[1:], p.eval_files(argv[1:])): print(path, ret)
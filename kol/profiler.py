@@ -0,0 +1,129 @@
+# Per function profiler for Interpreter.eval_ast, the tree walking engine:
+#     p = profiler.Profiler()
+#     with p.attached(i): i.eval_ast(program)
+#     print(p.report())
+#     with open('kol.folded', 'w') as f: f.write(p.collapsed()) # flamegraph.pl kol.folded > kol.svg
+#
+# attached() swaps the instance's handlers (Interpreter.on) for calls,
+# operators and blocks with counting ones and puts them back afterwards, an
+# interpreter that isn't being profiled runs exactly the code it always did.
+# kol.vm.VM and kol.closures.ClosureInterpreter don't go through
+# Interpreter.on, profile with the tree walker.
+#
+# Functions are named after the name they were called through. Anonymous ones
+# (blocks and if arms, or any function called right where it is defined) are
+# named after where their source starts, <fn line:column>, and everything
+# outside a Kol call is <program>. Calls kol.inline inlined belong to their
+# caller, profile with tree_passes = [resolve.resolve] to see them.
+#
+# Per function:
+#  - calls,
+#  - inclusive time, a recursive function counts only its outermost calls,
+#  - exclusive time, without the time spent in its callees,
+#  - allocations, the scopes (calls and scoped blocks) and the operator
+#    results (tree.PrimOp) it made itself.
+
+from kol import interpast as tree, vm
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter
+from typing import List, Dict, Tuple, Any
+
+@dataclass
+class FnStats:
+    calls: int = 0
+    inclusive: float = 0
+    exclusive: float = 0
+    allocations: int = 0
+
+def anonymous(fn: tree.KolFn) -> str:
+    return '<fn>' if fn.pos is None else f'<fn {fn.pos[0]}:{fn.pos[1]}>'
+
+class Profiler:
+    def __init__(self, clock = perf_counter):
+        self.clock  = clock
+        self.stats: Dict[str, FnStats] = {}
+        self.stacks: Dict[Tuple[str, ...], float] = {} # Call stack -> exclusive time, for collapsed().
+        self.frames: List[List[Any]] = []               # [name, start, time in callees, allocations], innermost last.
+        self.open:   Dict[str, int] = {}                # Name -> how many of its frames there are.
+
+    def enter(self, name: str):
+        self.frames.append([name, self.clock(), 0.0, 0])
+        self.open[name] = self.open.get(name, 0) + 1
+
+    def leave(self):
+        name, start, callees, allocations = self.frames.pop()
+        elapsed = self.clock() - start
+        self.open[name] -= 1
+
+        s = self.stats.setdefault(name, FnStats())
+        s.calls       += 1
+        s.exclusive   += elapsed - callees
+        s.allocations += allocations
+        if not self.open[name]: s.inclusive += elapsed
+
+        stack = tuple(f[0] for f in self.frames) + (name,)
+        self.stacks[stack] = self.stacks.get(stack, 0) + elapsed - callees
+        if self.frames: self.frames[-1][2] += elapsed
+
+    def fn_call(self, i, _ast: tree.KolFnCall):
+        if   type(_ast.fn) is str:        fn, name = i.handle_lookup(tree.Lookup(_ast.fn)), _ast.fn
+        elif type(_ast.fn) is tree.KolFn: fn, name = _ast.fn, anonymous(_ast.fn)
+        else: return i.handle_fn_call(_ast) # Reports the error.
+
+        args = [i.eval_ast(p) for p in _ast.params] # In the caller.
+        self.enter(name)
+        self.frames[-1][3] += 1 # The scope.
+        try:     return i.call(fn, args)
+        finally: self.leave()
+
+    def prim_op(self, i, _ast: tree.PrimOp):
+        self.frames[-1][3] += 1
+        return i.handle_prim_op(_ast)
+
+    def block(self, i, _ast: tree.Block):
+        if _ast.scoped: self.frames[-1][3] += 1
+        return i.handle_block(_ast)
+
+    @contextmanager
+    def attached(self, i):
+        if isinstance(i, vm.VM): raise ValueError(f'kol.profiler: {type(i).__name__} does not evaluate through Interpreter.on, profile with kol.interp.Interpreter')
+        saved = {t: i.on[t] for t in (tree.KolFnCall, tree.PrimOp, tree.Block)}
+        i.on.update({
+            tree.KolFnCall: lambda s, _ast: self.fn_call(s, _ast),
+            tree.PrimOp:    lambda s, _ast: self.prim_op(s, _ast),
+            tree.Block:     lambda s, _ast: self.block(s, _ast),
+        })
+        self.enter('<program>')
+        try: yield self
+        finally:
+            self.leave()
+            i.on.update(saved)
+
+    def report(self, sort: str = 'exclusive', limit: int | None = None) -> str:
+        rows  = sorted(self.stats.items(), key = lambda kv: getattr(kv[1], sort), reverse = True)[:limit]
+        width = max([len('function')] + [len(name) for name, _ in rows])
+        lines = [f"{'function':<{width}} {'calls':>8} {'incl ms':>10} {'excl ms':>10} {'allocs':>8}"]
+        for name, s in rows: lines.append(f'{name:<{width}} {s.calls:>8} {s.inclusive * 1e3:>10.3f} {s.exclusive * 1e3:>10.3f} {s.allocations:>8}')
+        return '\n'.join(lines)
+
+    def collapsed(self) -> str:
+        "Exclusive microseconds per call stack, in the format of flamegraph.pl and speedscope."
+        return ''.join(f"{';'.join(stack)} {round(t * 1e6)}\n" for stack, t in self.stacks.items() if round(t * 1e6) > 0)
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol import resolve
+    from kol.bench import make
+
+    # python -m kol.profiler file.kol [--no-inline] [--collapsed out.folded]
+    i = make()
+    if '--no-inline' in argv: i.tree_passes = [resolve.resolve]
+
+    with open(argv[1]) as f: program, rem = i.compile_str(f.read())
+    p = Profiler()
+    with p.attached(i): print(i.eval_ast(program))
+    print(p.report())
+    if '--collapsed' in argv:
+        with open(argv[argv.index('--collapsed') + 1], 'w') as f: f.write(p.collapsed())
@@ -0,0 +1,92 @@
+# On-disk cache of converted programs, so sources seen before skip the lexer,
+# the parser and every pass:
+#     Interpreter(..., program_cache = progcache.ProgramCache())
+#
+# Entries are the final interpast (after Interpreter.tree_passes), pickled,
+# one file per program named after a hash of the source and of everything
+# that shapes the result: the grammar, the operator table, the passes and the
+# builtins the interpreter rebound. Files are written with
+# cstgen.write_atomic so readers never see half of one, which makes it safe to
+# share a directory between processes. Anything unreadable is treated as a
+# miss, and the least recently used entries are removed once there are more
+# than max_entries.
+
+from kol import ast, ast2interpast, cst, cstgen, inline, memo, operators
+
+from dataclasses import dataclass, field
+from typing import List, Dict, Any
+import hashlib, os, pickle
+
+version = 7 # Bump whenever the pipeline output changes.
+
+def describe_operator(o) -> tuple:
+    return o.name, o.symbol, o.category.name, o.assoc.name, sorted(p.name for p in o.eq_prec), sorted(p.name for p in o.gt_prec)
+
+def describe_rules(rules) -> tuple:
+    if type(rules) is cstgen.CompiledRules: return ('compiled', rules.fingerprint)
+    return tuple(
+        (cstgen.describe_rule(r), [(b.name, [(a.name, a.value.name if type(a.value) is cst.Rule else a.value) for a in b.arms]) for b in r.branches or []])
+        for r in rules
+    )
+
+def describe_fns(fns: List) -> List[str]: return [f'{f.__module__}.{f.__qualname__}' for f in fns]
+
+# The rules lists are big and long lived, their descriptions are kept.
+described_rules: Dict[int, Any] = {}
+
+def pipeline_fingerprint(i) -> str:
+    "Everything besides the source that goes into i.compile_str."
+    if id(i.cst_rules) not in described_rules: described_rules[id(i.cst_rules)] = i.cst_rules, describe_rules(i.cst_rules)
+    h = hashlib.sha256(f'kol.progcache {version}\n'.encode())
+    for part in (
+        described_rules[id(i.cst_rules)][1],
+        [describe_operator(o) for o in operators.operators],
+        describe_fns(ast.rewrites), describe_fns(i.tree_passes),
+        ast.binop_engine, ast2interpast.primitive_ops, inline.max_size, memo.max_entries, memo.min_calls,
+    ): h.update(repr(part).encode() + b'\n')
+    return h.hexdigest()
+
+@dataclass
+class ProgramCache:
+    directory: str = field(default_factory = lambda: os.path.join(cstgen.default_cache_dir(), 'programs'))
+    max_entries: int = 1024
+
+    def key(self, i, text: str, cstrule: str) -> str:
+        h = hashlib.sha256(pipeline_fingerprint(i).encode())
+        h.update(cstrule.encode() + b'\n')
+        h.update(repr(sorted(i.rebound())).encode() + b'\n') # Not folded.
+        h.update(text.encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> str: return os.path.join(self.directory, f'{key[:40]}.pickle')
+
+    def get(self, key: str):
+        try:
+            with open(self.path(key), 'rb') as f: program = pickle.load(f)
+            os.utime(self.path(key)) # Recently used.
+            return program
+        except Exception: return None # Missing, being evicted or unreadable.
+
+    def put(self, key: str, program):
+        try:    data = pickle.dumps(program, protocol = pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError): return # Holds a builtin, those are made at runtime.
+        os.makedirs(self.directory, exist_ok = True)
+        cstgen.write_atomic(self.path(key), data)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pickle'): continue
+            try:    entries.append((os.stat(os.path.join(self.directory, name)).st_mtime, name))
+            except FileNotFoundError: pass # Evicted by someone else.
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            try:    os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError: pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory): return
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle') or name.endswith('.tmp'):
+                try:    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError: pass
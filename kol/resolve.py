@@ -0,0 +1,81 @@
+# Lexical addressing for kol.interpast.
+#
+# Kol scopes are dynamic: a name is looked up through every scope on the call
+# stack, so a function can't know statically where the names it doesn't bind
+# itself (plus, fib, ...) will come from. Two kinds of names are still fixed
+# at compile time:
+#  - a function's own parameters, always in the innermost scope,
+#  - parameters of the functions around a block that is called right where it
+#    is defined ({ ... } and if partials, a KolFnCall on a KolFn), such a
+#    block runs exactly one scope above whatever encloses it. The same goes
+#    for the scoped tree.Block kol.inline makes.
+# resolve() rewrites Lookup/Assign of those into SlotLookup/SlotAssign, with
+# the number of scopes to go up. Everything
+# else keeps its dynamic Lookup/Assign. An addressed scope can still lack the
+# name at runtime (a call with fewer arguments than parameters), engines
+# then fall back to the dynamic lookup.
+
+from kol import interpast as tree
+
+from dataclasses import replace
+from typing import List, Set
+
+def frame(params: List[str]) -> Set[str]: return set(params)
+
+def address(name: str, env: List[Set[str]]) -> int | None:
+    for depth, f in enumerate(reversed(env)):
+        if name in f: return depth
+    return None
+
+def resolve_lookup(_ast: tree.Lookup, env):
+    depth = address(_ast.name, env)
+    return _ast if depth is None else tree.SlotLookup(_ast.name, depth)
+
+def resolve_assign(_ast: tree.Assign, env):
+    depth, value = address(_ast.name, env), resolve_node(_ast.value, env)
+    return tree.Assign(_ast.name, value) if depth is None else tree.SlotAssign(_ast.name, depth, value)
+
+# A function used as a value can be called from anywhere, its body only knows its own scope.
+def resolve_fn(_ast: tree.KolFn, env, outer = []):
+    if type(_ast.body) is not list: return _ast # Builtin.
+    return replace(_ast, body = resolve_node(_ast.body, outer + [frame(_ast.params)]))
+
+def resolve_fn_call(_ast: tree.KolFnCall, env):
+    fn = resolve_fn(_ast.fn, env, env) if type(_ast.fn) is tree.KolFn else _ast.fn
+    return tree.KolFnCall(fn, [resolve_node(p, env) for p in _ast.params])
+
+def resolve_block(_ast: tree.Block, env):
+    inner = env + [frame(_ast.params)] if _ast.scoped else env
+    return tree.Block(resolve_node(_ast.body, inner), _ast.params, [resolve_node(a, env) for a in _ast.args], _ast.scoped)
+
+def resolve_cond(_ast: tree.Cond, env):
+    return tree.Cond(resolve_node(_ast.cond, env), resolve_node(_ast.true, env), resolve_node(_ast.false, env) if _ast.false is not None else None)
+
+resolvemap = {
+    tree.KolNil:     lambda _ast, _: _ast,
+    tree.KolInt:     lambda _ast, _: _ast,
+    tree.KolFloat:   lambda _ast, _: _ast,
+    tree.KolArray:   lambda _ast, _: _ast,
+    tree.KolFn:      resolve_fn,
+    tree.Lookup:     resolve_lookup,
+    tree.Assign:     resolve_assign,
+    tree.SlotLookup: lambda _ast, _: _ast,
+    tree.SlotAssign: lambda _ast, _: _ast,
+    tree.KolFnCall:  resolve_fn_call,
+    tree.PrimOp:     lambda _ast, env: tree.PrimOp(_ast.name, [resolve_node(p, env) for p in _ast.params]),
+    tree.Block:      resolve_block,
+    tree.Cond:       resolve_cond,
+    tree.BoundTo:    lambda _ast, _: _ast,
+    list:            lambda _ast, env: [resolve_node(a, env) for a in _ast],
+}
+
+def resolve_node(_ast, env, resolvemap = resolvemap): return resolvemap[type(_ast)](_ast, env)
+def resolve(_ast): return resolve_node(_ast, [])
+
+if __name__ == "__main__":
+    from pprint import pprint
+    from sys import argv
+    from kol import ast, ast2interpast, cst
+
+    with open(argv[1]) as f:
+        pprint(resolve(ast2interpast.convert(ast.parse_and_rewrite(cst.parse(f.read())[0]))), indent=4)
@@ -0,0 +1,115 @@
+# Statement by statement evaluation of a file object (or stdin), for piped
+# input and long generated scripts:
+#     for value in i.eval_stream(sys.stdin): print(value)
+#
+# Input is read a line (at most chunk_size characters) at a time and cut at
+# every ';' outside of (), [] and {}, the end of a top level statement.
+# Each statement is parsed, rewritten, converted and run through
+# Interpreter.tree_passes on its own as soon as its ';' has been read, then
+# evaluated, and its value yielded. Nothing but the unfinished statement is
+# kept between them, memory doesn't grow with the script, and it is scanned
+# once: each chunk picks up at the last token of the one before, which may go
+# on in it. A statement that doesn't parse raises StreamError, the ones
+# before it have been evaluated.
+#
+# Passes over a statement only see the ones read so far. Operators and
+# kol.internal builtins bound to something else by then (Interpreter.rebound)
+# are neither folded nor inlined, like with Interpreter.compile_str.
+# A function compiled before one of them is rebound keeps the if arms
+# kol.inline put in place though, stream such scripts with tree_passes =
+# [resolve.resolve].
+
+from kol import ast, ast2interpast, cst, defs, interpast as tree, lexer as lex, tokenizer as tok
+
+from typing import Iterator, List, Tuple
+
+openers, closers = ('(', '[', '{'), (')', ']', '}')
+
+class StreamError(ValueError):
+    "A statement that doesn't parse, its text and the (line, column) it starts and ends at."
+    def __init__(self, text: str, start: Tuple[int, int], end: Tuple[int, int]):
+        super().__init__(f'kol.stream: statement at {start[0]}:{start[1]} to {end[0]}:{end[1]} does not parse: {text!r}')
+        self.text, self.start, self.end = text, start, end
+
+def boundaries(text: str) -> Iterator[Tuple[int, int]]:
+    "(start, end) of each top level statement of text, its first token and just past its ';'."
+    depth, start = 0, None
+    for offset, t in tok.Scanner(text).spans():
+        if t == defs.endstmt and depth <= 0:
+            if start is not None: yield start, offset + 1 # ';;' is one end.
+            start, depth = None, 0 # Unbalanced closers don't carry over, like kol.incremental.
+            continue
+        if start is None: start = offset
+        if   t in openers: depth += 1
+        elif t in closers: depth -= 1
+
+def advance(pos: Tuple[int, int], text: str, start: int, end: int) -> Tuple[int, int]:
+    "(line, column) pos moved over text[start:end]."
+    newlines = text.count('\n', start, end)
+    if not newlines: return pos[0], pos[1] + end - start
+    return pos[0] + newlines, end - text.rfind('\n', start, end)
+
+def statements(f, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    "(text with its ';', (line, column) it starts at) of each top level statement of f, as soon as it has been read."
+    text, pos = '', (1, 1) # pos is where text starts.
+    scanned, depth, start = 0, 0, None # Like in boundaries, up to scanned.
+    for chunk in iter(lambda: f.readline(chunk_size), ''):
+        text += chunk
+        if defs.endstmt not in chunk: continue
+        consumed, resume = 0, (scanned, depth, start)
+        for offset, t in tok.Scanner(text).spans(scanned):
+            if t == defs.endstmt and depth <= 0:
+                if start is not None:
+                    pos = advance(pos, text, consumed, start)
+                    yield text[start:offset + 1], pos
+                    pos, consumed = advance(pos, text, start, offset + 1), offset + 1
+                start, depth, resume = None, 0, (offset + 1, 0, None)
+                continue
+            resume = offset, depth, start # Before the token, more text may make it longer.
+            if start is None: start = offset
+            if   t in openers: depth += 1
+            elif t in closers: depth -= 1
+        scanned, depth, start = resume
+        text, scanned, start = text[consumed:], scanned - consumed, None if start is None else start - consumed
+
+    # The last one, maybe without its ';'.
+    start = next((offset for offset, t in tok.Scanner(text).spans() if t != defs.endstmt), None)
+    if start is not None: yield text[start:] + defs.endstmt, advance(pos, text, 0, start)
+
+class Stream:
+    def __init__(self, i):
+        self.i = i
+
+    def compile(self, text: str, pos: Tuple[int, int] = (1, 1)) -> List:
+        i, lexemes = self.i, list(lex.lex(text))
+        for t in lexemes: # Where they are in the whole input.
+            if t.pos is not None: t.pos = (t.pos[0] + pos[0] - 1, t.pos[1] + pos[1] - 1 if t.pos[0] == 1 else t.pos[1])
+        _cst, remaining = cst.parse_tokens(lexemes, i.cst_rules, 'stmts')
+        if _cst is None or type(remaining.peek()) is not StopIteration: raise StreamError(text, pos, advance(pos, text, 0, len(text)))
+
+        _ast = ast.parse_and_rewrite(_cst, i.ast_parsemap, ast.folding(i.rebound()))
+        program = i.run_passes(ast2interpast.convert(_ast))
+        return program if type(program) is list else [program]
+
+    def eval(self, text: str, pos: Tuple[int, int] = (1, 1)):
+        v = tree.KolNil()
+        for stmt in self.compile(text, pos): v = self.i.eval_ast(stmt) # One at a time, engines cache whole lists.
+        return v
+
+def eval_stream(i, f, chunk_size: int = 1 << 16) -> Iterator:
+    s = Stream(i)
+    for text, pos in statements(f, chunk_size): yield s.eval(text, pos)
+
+if __name__ == "__main__":
+    from sys import argv, stdin
+    from kol.bench import make
+
+    # python -m kol.stream [file], stdin without one.
+    i = make()
+
+    f = open(argv[1]) if len(argv) > 1 else stdin
+    try:
+        for value in eval_stream(i, f): print(value, flush = True)
+    except StreamError as e:
+        print(e)
+        exit(1)
@@ -1,5 +1,7 @@
 import kol.defs as defs
 
+import re
+
 def ysplit(pred, it, post = lambda x: x, acceptor = lambda x: True, _split = 0, _offset = 0):
     "(Kind of) a yielding version of str.split"
 
@@ -47,7 +49,89 @@ def post_backtracker(s):
     else: return len(s.strip()) - len(s), [s.strip()]
 
 def should_accept(s): return not s.startswith('//') and not s in defs.whitespace
-def tokenize(data): yield from ysplit(should_split, data, post_backtracker, should_accept)
+def tokenize_backtracking(data): yield from ysplit(should_split, data, post_backtracker, should_accept)
+
+# Single pass version of the above, yields the exact same tokens.
+#
+# ysplit grows every candidate token one character at a time and slices the
+# remaining input after each one, which is quadratic. Once a chunk is longer
+# than the longest glyph should_split no longer depends on where the chunk
+# started, so from there on the chunk end can be found with a regex.
+# Glyph runs share the same end, so that one is cached across chunks.
+glyph_chars = ''.join(sorted({g[-1] for g in defs.glyphs if g != '...'}))
+glyph_maxlen = max(map(len, defs.glyphs))
+
+text_end_re  = re.compile('[' + re.escape(glyph_chars + ''.join(defs.whitespace)) + ']|' + re.escape('...'))
+glyph_run_re = re.compile('(?:[' + re.escape(glyph_chars) + ']|(?<=' + re.escape('..') + ')' + re.escape('.') + ')*')
+
+# Glyphs that can end a text chunk, longest first.
+text_tails = tuple(sorted({g for g in defs.glyphs if g == '...' or g[:-1] not in defs.glyphs and g[-1] in glyph_chars}, key=len, reverse=True))
+
+def first_glyph(s, glyphs = list(sorted(defs.glyphs, key=len, reverse=True))):
+    "glyphsplit(s)[0] if it is a glyph, None otherwise"
+    for g in glyphs:
+        idx = s.find(g)
+        if   idx == 0: return g
+        elif idx > 0:  s = s[:idx]
+    return None
+
+class Scanner:
+    def __init__(self, data):
+        self.data = data
+        self.run_start, self.run_end = -1, -1
+
+    def chunk_end(self, pos):
+        data, end = self.data, len(self.data)
+
+        # Short prefixes decide the mode (comment, glyph or text).
+        for i in range(pos + 1, min(pos + glyph_maxlen, end) + 1):
+            if should_split(data[pos:i]): return i
+        if pos + glyph_maxlen >= end: return end
+
+        head = data[pos:pos + glyph_maxlen]
+        if head.startswith('//'):
+            nl = data.find('\n', pos + glyph_maxlen)
+            return end if nl == -1 else nl + 1
+        elif head.startswith(defs.glyphs):
+            start = pos + glyph_maxlen
+            if not (self.run_start <= start <= self.run_end):
+                self.run_start, self.run_end = start, glyph_run_re.match(data, start).end()
+            return min(self.run_end + 1, end)
+        else:
+            m = text_end_re.search(data, pos + 1) # A trailing '...' may start inside the head.
+            return end if m is None else (m.end() if m.group() == '...' else m.start() + 1)
+
+    def post(self, chunk):
+        if chunk in defs.glyphs: return len(chunk), chunk
+        elif chunk.startswith(defs.glyphs):
+            # The first part only depends on the glyphs that can overlap it.
+            first = first_glyph(chunk[:2 * glyph_maxlen])
+            if first is not None: return len(first), first
+        elif chunk.endswith(defs.whitespace): return len(chunk), chunk
+        else:
+            # A text chunk is a run without glyphs, optionally followed by the glyph that ended it.
+            tail = next((g for g in text_tails if chunk.endswith(g)), None)
+            if tail is None: return len(chunk), chunk
+            return len(chunk) - len(tail), chunk[:-len(tail)]
+
+        offset, toks = post_backtracker(chunk)
+        return len(chunk) + offset, toks[0]
+
+    def spans(self, start = 0):
+        "(offset, token) pairs, from offset start on, which must be where a token starts or the one before it ends."
+        pos, end = start, len(self.data)
+        while pos < end:
+            split = self.chunk_end(pos)
+            chunk = self.data[pos:split]
+            if should_accept(chunk):
+                consumed, tok = self.post(chunk)
+                yield pos + len(chunk) - len(chunk.lstrip()), tok
+                pos += consumed
+            else: pos = split
+
+    def __iter__(self): return (tok for _, tok in self.spans())
+
+def tokenize(data): yield from Scanner(data)
 
 if __name__ == "__main__":
     from sys import argv
@@ -0,0 +1,358 @@
+# Bytecode compiler and stack VM for kol.interpast.
+#
+# compile() flattens an interpast tree into Code, a list of
+# (opcode, argument) pairs plus a constant pool. VM runs it in one dispatch
+# loop, calls to Kol functions push a frame instead of recursing in Python.
+# Scoping and the builtin contract are the same as Interpreter.eval_ast:
+# builtins get (interpreter, args) and can lookup their params by name.
+#
+# Scopes are shallow bound: instead of a stack of dicts searched from the top,
+# every name maps to the stack of its bindings, innermost last, and each scope
+# remembers which names it bound so leaving it pops them. Reading a variable is
+# then one dict probe however deep the call stack is. The binding a
+# kol.resolve address points to is always the innermost one of its name, so
+# SlotLookup/SlotAssign compile to the same LOOKUP/ASSIGN.
+#
+# A CALL in tail position, right before the RETURN of its code maybe through
+# JUMPs and LEAVEs, becomes a TAILCALL reusing the frame. It drops the scopes
+# of the frame before entering the callee, which only the callee could notice
+# (scoping is dynamic), so that is done only when the callee binds every name
+# in them again, a plain CALL happens otherwise. Loops written as recursion
+# then run in constant space.
+
+from kol import interpast as tree, arrays, interp
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Tuple, Dict, Any
+
+# Opcodes.
+CONST, LOOKUP, ASSIGN, CALL, POP, RETURN, PRIM, ENTER, LEAVE, BRANCH, JUMP, TAILCALL, BOUNDTO, PRIMFN, PRIMLC, PRIMLL, PRIMCL, PRIMFC, PRIMFL, GUARD = range(20)
+opnames = ['CONST', 'LOOKUP', 'ASSIGN', 'CALL', 'POP', 'RETURN', 'PRIM', 'ENTER', 'LEAVE', 'BRANCH', 'JUMP', 'TAILCALL', 'BOUNDTO', 'PRIMFN', 'PRIMLC', 'PRIMLL', 'PRIMCL', 'PRIMFC', 'PRIMFL', 'GUARD']
+
+@dataclass
+class Code:
+    ops: List[Tuple[int, int]] = field(default_factory = lambda: []) # (opcode, argument) pairs.
+    consts: List[Any] = field(default_factory = lambda: [])
+    # pc of a BRANCH -> its tree.Cond, for conditions on arrays (see kol.arrays).
+    selects: Dict[int, Any] = field(default_factory = lambda: {}, repr = False)
+    # Names are shared by value, everything else by identity.
+    const_index: Dict[Any, int] = field(default_factory = lambda: {}, repr = False)
+
+    def emit(self, op: int, arg: int = 0):
+        self.ops.append((op, arg))
+
+    def const(self, v) -> int:
+        key = v if type(v) is str else id(v)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(v)
+        return self.const_index[key]
+
+    def dis(self) -> str:
+        return '\n'.join(f'{pc:>4} {opnames[op]:<8} {arg:>4}' + (f'  ({self.consts[arg]})' if op in (CONST, LOOKUP, ASSIGN, PRIM, ENTER, BOUNDTO, PRIMFN, PRIMLC, PRIMLL, PRIMCL, PRIMFC, PRIMFL) else '') for pc, (op, arg) in enumerate(self.ops))
+
+def compile_const(_ast, code: Code):  code.emit(CONST, code.const(_ast))
+def compile_lookup(_ast, code: Code): code.emit(LOOKUP, code.const(_ast.name)) # Also SlotLookup.
+
+def compile_assign(_ast, code: Code): # Also SlotAssign.
+    compile_node(_ast.value, code)
+    code.emit(ASSIGN, code.const(_ast.name))
+
+def compile_fn_call(_ast, code: Code):
+    if   type(_ast.fn) is str:        code.emit(LOOKUP, code.const(_ast.fn))
+    elif type(_ast.fn) is tree.KolFn: code.emit(CONST, code.const(_ast.fn))
+    else:
+        from pprint import pprint
+        pprint(['InterpError: ast.fn is not a recognized (callable or resolvable) type', _ast])
+        exit(1)
+
+    for p in _ast.params: compile_node(p, code)
+    code.emit(CALL, len(_ast.params))
+
+# Operators are binary, PRIM takes the two topmost values and looks the name
+# up then. Like CALL, the operator is the one bound before the operands run,
+# which only operands that can run code (calls, assignments, operators that
+# may be rebound) could tell apart: those LOOKUP it first and PRIMFN applies
+# that value below them. Operands that are a variable or a constant are
+# fetched by the operator itself, one dispatch instead of up to three:
+# PRIMLC/PRIMLL/PRIMCL take a (name, lhs, rhs) constant, the L ones naming a
+# variable, and PRIMFC/PRIMFL a (name, rhs) one, their lhs on the stack.
+variables, constants = (tree.Lookup, tree.SlotLookup), (tree.KolNil, tree.KolInt, tree.KolFloat, tree.KolArray)
+fused = {(True, False): PRIMLC, (True, True): PRIMLL, (False, True): PRIMCL}
+
+def operand(p): return p.name if type(p) in variables else p
+
+def compile_prim_op(_ast, code: Code):
+    lhs, rhs = _ast.params
+    var    = type(lhs) in variables, type(rhs) in variables
+    simple = var[0] or type(lhs) in constants, var[1] or type(rhs) in constants
+    if all(simple):
+        if var in fused: return code.emit(fused[var], code.const((_ast.name, operand(lhs), operand(rhs))))
+        compile_node(lhs, code)
+        compile_node(rhs, code)
+        return code.emit(PRIM, code.const(_ast.name))
+    code.emit(LOOKUP, code.const(_ast.name))
+    compile_node(lhs, code)
+    if simple[1]: return code.emit(PRIMFL if var[1] else PRIMFC, code.const((_ast.name, operand(rhs))))
+    compile_node(rhs, code)
+    code.emit(PRIMFN, code.const((_ast.name, None)))
+
+def compile_block(_ast, code: Code):
+    if not _ast.scoped: return compile_stmts(_ast.body, code)
+    for a in _ast.args: compile_node(a, code)
+    code.emit(ENTER, code.const((_ast.params, len(_ast.args))))
+    compile_stmts(_ast.body, code)
+    code.emit(LEAVE)
+
+# Conds on a BoundTo, the guards of kol.inline and folding, branch on it with
+# GUARD instead of a BOUNDTO then a BRANCH.
+def compile_cond(_ast, code: Code):
+    branch = GUARD if type(_ast.cond) is tree.BoundTo else BRANCH
+    if branch == BRANCH: compile_node(_ast.cond, code)
+    at = len(code.ops)
+    code.selects[at] = _ast
+    code.emit(branch)
+    compile_node(_ast.true, code)
+    jump = len(code.ops)
+    code.emit(JUMP)
+    code.ops[at] = branch, len(code.ops)
+    if _ast.false is not None: compile_node(_ast.false, code)
+    else:                      code.emit(CONST, code.const(tree.KolNil()))
+    code.ops[jump] = JUMP, len(code.ops)
+
+def compile_bound_to(_ast, code: Code): code.emit(BOUNDTO, code.const(_ast))
+
+def compile_stmts(_ast, code: Code):
+    if len(_ast) == 0: return code.emit(CONST, code.const(tree.KolNil()))
+    for idx, a in enumerate(_ast):
+        if idx: code.emit(POP)
+        compile_node(a, code)
+
+compilemap = {
+    tree.KolNil:     compile_const,
+    tree.KolInt:     compile_const,
+    tree.KolFloat:   compile_const,
+    tree.KolArray:   compile_const,
+    tree.KolFn:      compile_const,
+    tree.Lookup:     compile_lookup,
+    tree.Assign:     compile_assign,
+    tree.SlotLookup: compile_lookup,
+    tree.SlotAssign: compile_assign,
+    tree.KolFnCall:  compile_fn_call,
+    tree.PrimOp:     compile_prim_op,
+    tree.Block:      compile_block,
+    tree.Cond:       compile_cond,
+    tree.BoundTo:    compile_bound_to,
+    list:            compile_stmts,
+}
+
+def is_tail(code: Code, pc: int) -> bool:
+    while code.ops[pc][0] in (JUMP, LEAVE): pc = code.ops[pc][1] if code.ops[pc][0] == JUMP else pc + 1
+    return code.ops[pc][0] == RETURN
+
+def compile_node(_ast, code: Code, compilemap = compilemap): compilemap[type(_ast)](_ast, code)
+def compile(_ast, tail_calls: bool = True) -> Code:
+    code = Code()
+    compile_node(_ast, code)
+    code.emit(RETURN)
+    if tail_calls:
+        for pc, (op, arg) in enumerate(code.ops):
+            if op == CALL and is_tail(code, pc + 1): code.ops[pc] = TAILCALL, arg
+    return code
+
+identity = tree.builtin_origin('kol.internal.identity')
+max_codes = 1024 # Compiled function bodies and programs a VM keeps.
+
+@dataclass
+class VM(interp.Interpreter):
+    # id(fn.body) -> (fn.body, Code), least recently run first, the body is kept so its id can't be reused.
+    codes: OrderedDict = field(default_factory = OrderedDict)
+    # name -> its values, innermost last. Names without a binding are removed.
+    bindings: Dict[str, List[Any]] = field(default_factory = lambda: {})
+    # The names each scope bound, innermost last, the first one is the global scope.
+    bound: List[List[str]] = field(default_factory = lambda: [[]])
+    tail_calls: bool = True
+
+    def code_for(self, body: List) -> Code:
+        codes, key = self.codes, id(body)
+        if key in codes: codes.move_to_end(key)
+        else:
+            codes[key] = body, compile(body, self.tail_calls)
+            if len(codes) > max_codes: codes.popitem(last = False)
+        return codes[key][1]
+
+    def lookup(self, s: str):
+        if s in self.bindings: return self.bindings[s][-1]
+        return self.lookup_error(s)
+
+    def binding(self, s: str): return self.bindings[s][-1] if s in self.bindings else None
+
+    def assign(self, n: str, v): # Like ASSIGN, compiling a tree.Assign would cost more than the assignment.
+        if n in self.bindings: self.bindings[n][-1] = v
+        else:
+            self.bindings[n] = [v]
+            self.bound[-1].append(n)
+        return v
+
+    def lookup_error(self, s: str):
+        from pprint import pprint
+        pprint(['InterpError: Name not in any scope', s, {k: v[-1] for k, v in self.bindings.items()}]) # TODO: throw resumable exception ?
+        exit(1)
+
+    def push_scope(self, params: List[str], args: List):
+        bindings = self.bindings
+        for k, v in zip(params, args):
+            if k in bindings: bindings[k].append(v)
+            else:             bindings[k] = [v]
+        self.bound.append(params[:len(args)])
+
+    def pop_scope(self):
+        bindings = self.bindings
+        for k in self.bound.pop():
+            values = bindings[k]
+            if len(values) == 1: del bindings[k]
+            else:                values.pop()
+
+    def call(self, fn: tree.KolFn, args: List):
+        self.push_scope(fn.params, args)
+        ret = self.run(self.code_for(fn.body)) if type(fn.body) is list else fn.body(self, args)
+        self.pop_scope()
+        return ret
+
+    def eval_ast(self, _ast):
+        if type(_ast) is list: return self.run(self.code_for(_ast))
+        elif type(_ast) is tree.KolFnCall and type(_ast.fn) is tree.KolFn and not _ast.params: return self.call(_ast.fn, []) # What kol.internal.if(else) evaluates.
+        return self.run(compile(_ast, self.tail_calls))
+
+    def run(self, code: Code):
+        bindings, primitives, bound, frames, codes = self.bindings, self.primitives, self.bound, [], self.codes
+        # base is how many scopes there were when the frame started, returning drops the rest.
+        ops, consts, pc, stack, base = code.ops, code.consts, 0, [], len(bound)
+
+        # Most frequent first, the chain below is the dispatch.
+        while True:
+            op, arg = ops[pc]
+            pc += 1
+
+            if op == LOOKUP:
+                try:             stack.append(bindings[consts[arg]][-1])
+                except KeyError: self.lookup_error(consts[arg])
+            elif op == CONST: stack.append(consts[arg])
+            elif op == PRIMLC or op == PRIMLL or op == PRIMCL:
+                name, lhs, rhs = consts[arg]
+                try:
+                    if op != PRIMCL: lhs = bindings[lhs][-1]
+                    if op != PRIMLC: rhs = bindings[rhs][-1]
+                    fn = bindings[name][-1]
+                except KeyError as e: self.lookup_error(e.args[0])
+                prim = primitives.get(name)
+                if prim is not None and prim[0] is fn: stack.append(prim[1](lhs, rhs))
+                else:                                  stack.append(self.call(fn, [lhs, rhs]))
+            elif op == PRIM:
+                name = consts[arg]
+                if name not in bindings: self.lookup_error(name)
+                fn, prim = bindings[name][-1], primitives.get(name)
+                rhs = stack.pop()
+                if prim is not None and prim[0] is fn: stack[-1] = prim[1](stack[-1], rhs)
+                else:                                  stack[-1] = self.call(fn, [stack[-1], rhs]) # Rebound, call whatever it is now.
+            elif op == PRIMFN or op == PRIMFC or op == PRIMFL:
+                name, rhs = consts[arg]
+                if op == PRIMFN: rhs = stack.pop()
+                elif op == PRIMFL:
+                    try:             rhs = bindings[rhs][-1]
+                    except KeyError: self.lookup_error(rhs)
+                prim, lhs, fn = primitives.get(name), stack.pop(), stack[-1]
+                if prim is not None and prim[0] is fn: stack[-1] = prim[1](lhs, rhs)
+                else:                                  stack[-1] = self.call(fn, [lhs, rhs])
+            elif op == CALL or op == TAILCALL:
+                split = len(stack) - arg
+                args, fn = stack[split:], stack[split - 1]
+                del stack[split - 1:]
+
+                # TODO: check if param count matches and eventually their types.
+                body = fn.body
+                if type(body) is not list:
+                    if fn.origin is identity: stack.append(args[0] if arg == 1 else args) # Parentheses, needs no scope.
+                    else:
+                        self.push_scope(fn.params, args)
+                        stack.append(body(self, args))
+                        self.pop_scope()
+                    continue
+
+                if op == TAILCALL and all(k in fn.params[:len(args)] for scope in bound[base:] for k in scope):
+                    while len(bound) > base: self.pop_scope()
+                else:
+                    frames.append((code, pc, stack, base))
+                    base = len(bound)
+                params = fn.params # push_scope
+                for k, v in zip(params, args):
+                    if k in bindings: bindings[k].append(v)
+                    else:             bindings[k] = [v]
+                bound.append(params[:len(args)])
+                entry = codes.get(id(body)) # code_for
+                if entry is None: code = self.code_for(body)
+                else:
+                    codes.move_to_end(id(body))
+                    code = entry[1]
+                ops, consts, pc, stack = code.ops, code.consts, 0, []
+            elif op == RETURN:
+                ret = stack[-1]
+                while len(bound) > base: # pop_scope
+                    for k in bound.pop():
+                        values = bindings[k]
+                        if len(values) == 1: del bindings[k]
+                        else:                values.pop()
+                if not frames: return ret
+                code, pc, stack, base = frames.pop()
+                ops, consts = code.ops, code.consts
+                stack.append(ret)
+            elif op == BRANCH: # Like kol.internal.if(else), anything but 1 is false.
+                cond = stack.pop()
+                if type(cond) is tree.KolArray: # Masked select, the arms run on their own and the JUMP before arg ends the Cond.
+                    _ast = code.selects[pc - 1]
+                    stack.append(arrays.select(cond, self.eval_ast(_ast.true), self.eval_ast(_ast.false) if _ast.false is not None else tree.KolNil()))
+                    pc = ops[arg - 1][1]
+                elif cond.value != 1: pc = arg
+            elif op == JUMP: pc = arg
+            elif op == GUARD:
+                cond = code.selects[pc - 1].cond
+                fn = bindings[cond.name][-1] if cond.name in bindings else None
+                if type(fn) is not tree.KolFn or fn.origin is not cond.origin: pc = arg
+            elif op == POP: stack.pop()
+            elif op == ENTER:
+                params, argc = consts[arg]
+                split = len(stack) - argc
+                for k, v in zip(params, stack[split:]): # push_scope
+                    if k in bindings: bindings[k].append(v)
+                    else:             bindings[k] = [v]
+                bound.append(params[:argc])
+                del stack[split:]
+            elif op == LEAVE:
+                for k in bound.pop(): # pop_scope
+                    values = bindings[k]
+                    if len(values) == 1: del bindings[k]
+                    else:                values.pop()
+            elif op == BOUNDTO:
+                name, origin = consts[arg].name, consts[arg].origin
+                fn = bindings[name][-1] if name in bindings else None
+                stack.append(interp.true if type(fn) is tree.KolFn and fn.origin is origin else interp.false)
+            elif op == ASSIGN:
+                name = consts[arg]
+                if name in bindings: bindings[name][-1] = stack[-1]
+                else:
+                    bindings[name] = [stack[-1]]
+                    self.bound[-1].append(name)
+
+if __name__ == "__main__":
+    from sys import argv
+    from kol import ast, ast2interpast, cst, resolve
+    from kol.bench import make
+
+    i = make(VM)
+
+    with open(argv[1]) as f:
+        text = f.read()
+        if '--dis' in argv: print(compile(resolve.resolve(ast2interpast.convert(ast.parse_and_rewrite(cst.parse(text)[0])))).dis())
+        ret, rem = i.eval_str(text)
+        print(ret)